@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark of the CLI entry point.
+
+For every CLI mode a fresh interpreter imports `src.main` plus the modules
+that the mode loads, and the wall time and the `-X importtime` cost of the
+heaviest imports are reported. With `--check` the benchmark fails if a mode
+loads a heavy dependency it does not need.
+
+Usage: PYTHONPATH=. python benchmarks/startup.py [--repeat N] [--check]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+
+# Mode -> modules imported on its code path (see src/main.py).
+MODES = {
+    "save-to-file": [],
+    "no-collect": ["src.tg"],
+    "collect": ["src.ssh", "src.tg"],
+    "daemon": ["src.daemon", "src.ssh", "src.tg"],
+}
+
+HEAVY_MODULES = {"paramiko", "scp", "cryptography", "requests"}
+
+# Heavy dependencies each mode is allowed to load.
+ALLOWED_HEAVY_MODULES = {
+    "save-to-file": set(),
+    "no-collect": {"requests"},
+    "collect": HEAVY_MODULES,
+    "daemon": HEAVY_MODULES,
+}
+
+SNIPPET = """
+import sys
+import src.main
+for module in {modules!r}:
+    __import__(module)
+print(",".join(sorted(set(sys.modules) & {heavy!r})))
+"""
+
+
+def _run(mode: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += [
+        "-c",
+        SNIPPET.format(modules=MODES[mode], heavy=HEAVY_MODULES),
+    ]
+    env = dict(os.environ, PYTHONPATH=str(BASE_DIR))
+    return subprocess.run(
+        command,
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=BASE_DIR,
+        env=env,
+    )
+
+
+def _top_imports(stderr: str, count: int = 5) -> list[tuple[int, str]]:
+    """Parses `-X importtime` output into the top (cumulative us, name)."""
+    costs = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):  # top-level imports only
+            costs.append((int(cumulative), name.strip()))
+    return sorted(costs, reverse=True)[:count]
+
+
+def main() -> int:
+    """Runs the benchmark and prints the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    failed = False
+    for mode in MODES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = _run(mode)
+            timings.append(time.perf_counter() - start)
+        loaded = set(filter(None, result.stdout.strip().split(",")))
+        top = _top_imports(_run(mode, importtime=True).stderr)
+
+        print(
+            f"{mode}: median {statistics.median(timings) * 1000:.1f} ms, "
+            f"min {min(timings) * 1000:.1f} ms, "
+            f"heavy modules: {', '.join(sorted(loaded)) or 'none'}"
+        )
+        for cumulative, name in top:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+        unexpected = loaded - ALLOWED_HEAVY_MODULES[mode]
+        if args.check and unexpected:
+            print(f"    unexpected imports: {', '.join(sorted(unexpected))}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Hierarchical aggregation of the traffic of the systems.
+
+The systems are tagged (e.g. with their region and datacenter) and the
+report totals are rolled up the levels of the tags. A mid-tier aggregator
+forwards a single pre-aggregated snapshot of its systems to the upper tier
+instead of the snapshots of every system.
+"""
+
+import functools
+from datetime import date
+from itertools import zip_longest
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from src import exceptions as exc
+from src import settings
+from src.log import log
+from src.vnstat import VnStatData
+
+if TYPE_CHECKING:
+    from src.forecast import Forecast
+
+# Group of the systems without the tag of a level.
+UNTAGGED = "untagged"
+# Group of all the systems.
+TOTAL = ()
+
+
+class Rollup(NamedTuple):
+    """Traffic totals of a group of systems."""
+
+    # Tag values of the group, one per level (empty for the total).
+    group: tuple[str, ...]
+    systems: int
+    day_traffic: int
+    month_traffic: int
+    # Forecast of the systems that have one, month traffic of the others.
+    forecast_traffic: int
+    failed: tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        """Gets the path of the group (`eu/fra1`)."""
+        return "/".join(self.group)
+
+    def to_dict(self) -> dict:
+        """Gets the JSON-compatible dict of the rollup."""
+        return {
+            "group": list(self.group),
+            "systems": self.systems,
+            "day_traffic": self.day_traffic,
+            "month_traffic": self.month_traffic,
+            "forecast_traffic": self.forecast_traffic,
+            "failed": list(self.failed),
+        }
+
+
+@functools.lru_cache(maxsize=8)
+def parse_tags(tags_spec: str) -> dict[str, dict[str, str]]:
+    """
+    Parses the tags of the systems.
+
+    The tags are specified as comma-separated `system=key:value;key:value`
+    entries, e.g. `edge1=region:eu;dc:fra1,edge2=region:us;dc:nyc1`.
+    """
+    tags = {}
+    for entry in tags_spec.split(","):
+        if not entry.strip():
+            continue
+        system_name, separator, system_tags = entry.partition("=")
+        if not separator or not system_name.strip():
+            raise exc.AggregationError(f"Invalid system tags: '{entry}'")
+        parsed = {}
+        for tag in system_tags.split(";"):
+            key, separator, value = tag.partition(":")
+            if not separator or not key.strip() or not value.strip():
+                raise exc.AggregationError(f"Invalid system tags: '{entry}'")
+            parsed[key.strip()] = value.strip()
+        tags[system_name.strip()] = parsed
+    return tags
+
+
+@log
+def aggregate(
+    *vnstat_objects: VnStatData,
+    forecasts: Optional[dict[str, Optional["Forecast"]]] = None,
+    levels: Optional[list[str]] = None,
+    tags: Optional[dict[str, dict[str, str]]] = None,
+) -> dict[tuple[str, ...], Rollup]:
+    """
+    Rolls the traffic of the systems up the levels of the tags.
+
+    Every system counts in the total (the `TOTAL` group) and in its group of
+    every level: with the levels `region,dc`, a system tagged
+    `region:eu;dc:fra1` counts in `("eu",)` and in `("eu", "fra1")`. The
+    groups are sorted, so every group is followed by its subgroups.
+    """
+    forecasts = forecasts or {}
+    levels = settings.AGGREGATION_LEVELS if levels is None else levels
+    tags = parse_tags(settings.SYSTEM_TAGS) if tags is None else tags
+
+    # group -> [systems, day, month, forecast, failed]
+    totals: dict[tuple[str, ...], list] = {TOTAL: [0, 0, 0, 0, []]}
+    for vn_obj in vnstat_objects:
+        system_tags = tags.get(vn_obj.system_name, {})
+        path = tuple(system_tags.get(level, UNTAGGED) for level in levels)
+        service_forecast = forecasts.get(vn_obj.system_name)
+        forecast_traffic = (
+            service_forecast.month_traffic
+            if service_forecast is not None
+            else vn_obj.month_traffic or 0
+        )
+        for depth in range(len(path) + 1):
+            if (total := totals.get(path[:depth])) is None:
+                total = totals[path[:depth]] = [0, 0, 0, 0, []]
+            total[0] += 1
+            total[1] += vn_obj.day_traffic or 0
+            total[2] += vn_obj.month_traffic or 0
+            total[3] += forecast_traffic
+            if vn_obj.error:
+                total[4].append(vn_obj.system_name)
+    return {
+        group: Rollup(group, systems, day, month, forecast, tuple(failed))
+        for group, (systems, day, month, forecast, failed) in sorted(
+            totals.items()
+        )
+    }
+
+
+def _sum_traffic(values) -> Optional[int]:
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
+
+
+@log
+def get_partial(
+    *vnstat_objects: VnStatData,
+    system_name: Optional[str] = None,
+    stat_date: Optional[date] = None,
+) -> VnStatData:
+    """
+    Pre-aggregates the snapshots of the systems into a single snapshot.
+
+    The traffic (including the daily traffic, so the upper tier can still
+    forecast it) is summed, the failed systems are listed in the service
+    status. The snapshot is only failed if all the systems failed. It is
+    named after PARTIAL_SYSTEM_NAME by default, which is the system the
+    upper tier tags.
+    """
+    vnstat_objects = [
+        vn_obj for vn_obj in vnstat_objects if vn_obj is not None
+    ]
+    if not vnstat_objects and stat_date is None:
+        raise exc.AggregationError("Nothing to aggregate")
+    system_name = system_name or settings.PARTIAL_SYSTEM_NAME
+    stat_date = stat_date or max(vn_obj.stat_date for vn_obj in vnstat_objects)
+    failed = [vn_obj.system_name for vn_obj in vnstat_objects if vn_obj.error]
+    collected = [vn_obj for vn_obj in vnstat_objects if not vn_obj.error]
+
+    daily_series = [
+        vn_obj.daily_traffic for vn_obj in collected if vn_obj.daily_traffic
+    ]
+    status = f"Aggregated from {len(vnstat_objects)} systems"
+    if failed:
+        status += f" (failed: {', '.join(failed)})"
+    return VnStatData(
+        system_name=system_name,
+        service_status=status,
+        stat_date=stat_date,
+        day_traffic=_sum_traffic(vn_obj.day_traffic for vn_obj in collected),
+        month_traffic=_sum_traffic(
+            vn_obj.month_traffic for vn_obj in collected
+        ),
+        error=None if collected else "All the aggregated systems failed",
+        daily_traffic=(
+            [_sum_traffic(days) for days in zip_longest(*daily_series)]
+            if daily_series
+            else None
+        ),
+    )
@@ -0,0 +1,140 @@
+import atexit
+import hashlib
+import html
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from src import settings, utils
+from src.log import configure_logging
+
+logger = configure_logging(__name__)
+
+
+class AlertAggregator:
+    """
+    Collects the exception alerts and sends them as a single digest.
+
+    The exceptions are fingerprinted by their type and message (with the
+    numbers masked out), so repeats are counted instead of being sent one by
+    one. A fingerprint that was already sent within the suppression window
+    (tracked in the state file across runs) is only counted as suppressed.
+    """
+
+    def __init__(
+        self,
+        window: Optional[float] = None,
+        state_file: Union[str, Path, None] = None,
+    ) -> None:
+        self.window = (
+            settings.ALERT_SUPPRESS_WINDOW if window is None else window
+        )
+        self.state_file = Path(state_file or settings.ALERT_STATE_FILE)
+        # fingerprint -> [first message, count]
+        self._alerts: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(exception: Exception) -> str:
+        """Gets the fingerprint of the exception."""
+        normalized = re.sub(r"\d+", "#", str(exception))
+        key = f"{type(exception).__name__}: {normalized}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+    def add(self, exception: Exception) -> None:
+        """Adds the exception to the next digest."""
+        fingerprint = self.fingerprint(exception)
+        with self._lock:
+            alert = self._alerts.setdefault(
+                fingerprint, [f"{type(exception).__name__}: {exception}", 0]
+            )
+            alert[1] += 1
+
+    def _load_state(self) -> dict[str, float]:
+        return utils.load_json_state(self.state_file)
+
+    def _save_state(self, state: dict[str, float]) -> None:
+        try:
+            utils.save_json_state(self.state_file, state)
+        except OSError as e:
+            logger.error("Failed to save the alert state: %s", e)
+
+    def get_digest(self) -> tuple[Optional[str], list[str]]:
+        """
+        Builds the digest of the collected alerts and resets them.
+
+        Returns the digest with the fingerprints it reports, which are only
+        suppressed once they are marked as sent. The digest is None if all the
+        alerts are suppressed (or there are none).
+        """
+        with self._lock:
+            alerts = self._alerts
+            self._alerts = {}
+        if not alerts:
+            return None, []
+
+        now = time.time()
+        state = {
+            fingerprint: sent_at
+            for fingerprint, sent_at in self._load_state().items()
+            if now - sent_at < self.window
+        }
+        new = {f: a for f, a in alerts.items() if f not in state}
+        suppressed = sum(
+            count for f, (_, count) in alerts.items() if f in state
+        )
+        if not new:
+            logger.info("%s repeated alerts suppressed", suppressed)
+            self._save_state(state)
+            return None, []
+
+        total = sum(count for _, count in new.values())
+        lines = [
+            f"<b>Exceptions raised in your vnstat monitor</b> ({total}):",
+            *(
+                f"• {count}× {html.escape(message)}"
+                for message, count in new.values()
+            ),
+        ]
+        if suppressed:
+            lines.append(
+                f"\n{suppressed} repeated alert(s) suppressed "
+                f"(already reported within {int(self.window // 60)} min)."
+            )
+        return "\n".join(lines), list(new)
+
+    def mark_sent(self, fingerprints: list[str]) -> None:
+        """Suppresses the repeats of the sent alerts within the window."""
+        now = time.time()
+        state = self._load_state()
+        state.update({fingerprint: now for fingerprint in fingerprints})
+        self._save_state(state)
+
+    def flush(self, send: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Sends the digest of the collected alerts (if any).
+
+        The alerts are only marked as sent once the digest is delivered, so
+        the alerts of a failed delivery are not suppressed next time.
+        """
+        digest, fingerprints = self.get_digest()
+        if digest is None:
+            return
+        if send is None:
+            from src.tg import send_telegram_message as send
+        try:
+            send(digest)
+        except Exception as e:
+            logger.error("Failed to send the alert digest: %s", e)
+            return
+        self.mark_sent(fingerprints)
+
+
+aggregator = AlertAggregator()
+
+
+@atexit.register
+def _flush_aggregator() -> None:
+    aggregator.flush()
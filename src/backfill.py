@@ -0,0 +1,121 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Union
+
+from src import render, settings, vnstat
+from src.log import configure_logging, log
+from src.vnstat import VnStatData
+
+logger = configure_logging(__name__)
+
+
+@log
+def get_report_dates(
+    start_date: date, end_date: date, monthly: bool = False
+) -> list[date]:
+    """
+    Gets the dates to report on.
+
+    Every date of the range, or with `monthly` the last date of every month
+    in the range (its objects hold the cumulative traffic of the month).
+    """
+    dates = vnstat.get_date_range(start_date, end_date)
+    if not monthly:
+        return dates
+    return [
+        target_date
+        for target_date in dates
+        if target_date == end_date
+        or (target_date + timedelta(days=1)).month != target_date.month
+    ]
+
+
+@log
+def collect(
+    start_date: date, end_date: date, no_collect: bool = False
+) -> dict[date, list[VnStatData]]:
+    """
+    Collects the VnStat data of all the systems for every date of the range.
+
+    The local data comes from a single vnstat call, and every remote is
+    queried with a single vnstat call over SSH. The remotes are queried
+    concurrently, while the local data is collected.
+    """
+    remotes = []
+    if no_collect:
+        local = vnstat.get_traffic_data_range(
+            settings.LOCAL_SYSTEM_NAME, start_date, end_date
+        )
+    else:
+        from src import ssh
+
+        with ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="remote"
+        ) as executor:
+            remotes_future = executor.submit(
+                ssh.get_all_remote_vnstat_data_range, start_date, end_date
+            )
+            local = vnstat.get_traffic_data_range(
+                settings.LOCAL_SYSTEM_NAME, start_date, end_date
+            )
+            remotes = remotes_future.result()
+    return {
+        vn_obj.stat_date: [vn_obj, *(remote[index] for remote in remotes)]
+        for index, vn_obj in enumerate(local)
+    }
+
+
+@log
+def get_message(
+    data: dict[date, list[VnStatData]], dates: list[date], monthly: bool
+) -> str:
+    """
+    Gets one consolidated message with the reports of all the dates.
+
+    In the JSON format the message is an object with the summary of every
+    date (by its ISO date).
+    """
+    from src import tg
+
+    output_format = render.get_format()
+    parts = []
+    summaries = {}
+    for target_date in dates:
+        title = target_date.strftime("%B %Y" if monthly else "%d %B %Y")
+        # The month-end forecast makes no sense for the past dates.
+        vnstat_objects = [
+            vn_obj.replace(daily_traffic=None) for vn_obj in data[target_date]
+        ]
+        if output_format.name == "json":
+            summaries[target_date.isoformat()] = render.get_summary_dict(
+                render.summarize(*vnstat_objects), day_label=None
+            )
+            continue
+        parts.append(render.render_title(f"REPORT FOR {title.upper()}"))
+        parts.append(tg.get_final_msg(*vnstat_objects, day_label=None))
+    if output_format.name == "json":
+        return json.dumps(summaries)
+    return "".join(parts)
+
+
+@log
+def save_to_files(
+    data: dict[date, list[VnStatData]],
+    dates: list[date],
+    output_dir: Union[str, Path],
+) -> list[Path]:
+    """Saves the VnStat data of every system and date to a JSON file."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for target_date in dates:
+        for vn_obj in data[target_date]:
+            path = output_dir / (
+                f"{vn_obj.system_name}_{target_date.isoformat()}.json"
+            )
+            path.write_text(vn_obj.to_json(), encoding="utf-8")
+            paths.append(path)
+    logger.info("Saved %s backfilled snapshots to %s", len(paths), output_dir)
+    return paths
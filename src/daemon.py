@@ -0,0 +1,242 @@
+import importlib
+import signal
+import threading
+from datetime import datetime, time, timedelta
+from typing import Callable, Optional
+
+from src import exceptions as exc
+from src import settings, ssh
+from src.log import configure_logging
+
+logger = configure_logging(__name__)
+
+
+class Job:
+    """Scheduled job that runs either every `interval` or daily `at`."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], None],
+        *,
+        interval: Optional[timedelta] = None,
+        at: Optional[time] = None,
+        profile: bool = False,
+    ) -> None:
+        if (interval is None) == (at is None):
+            raise ValueError("Exactly one of interval or at must be set")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.at = at
+        self.profile = profile
+        self.next_run = self.get_next_run(datetime.now())
+
+    def get_next_run(self, now: datetime) -> datetime:
+        """Gets the next run time after `now`."""
+        if self.interval is not None:
+            return now + self.interval
+        if (next_run := datetime.combine(now.date(), self.at)) <= now:
+            next_run += timedelta(days=1)
+        return next_run
+
+    def run(self) -> None:
+        """Runs the job, logging (but not propagating) its failures."""
+        logger.info("Running job %s", self.name)
+        try:
+            if self.profile:
+                from src import profiling
+
+                with profiling.profile_run(self.name):
+                    self.func()
+            else:
+                self.func()
+        except Exception as e:
+            exc.handle_exception(e, re_raise=False, send_tg=False)
+        self.next_run = self.get_next_run(datetime.now())
+
+    def __repr__(self) -> str:
+        return f"<Job(name='{self.name}', next_run={self.next_run})>"
+
+
+class Scheduler:
+    """In-process scheduler with graceful shutdown and reload support."""
+
+    def __init__(self) -> None:
+        self.jobs: list[Job] = []
+        self._wakeup = threading.Event()
+        self._stop_requested = False
+        self._reload_requested = False
+
+    def add(self, job: Job) -> Job:
+        """Adds the job to the schedule."""
+        self.jobs.append(job)
+        return job
+
+    def clear(self) -> None:
+        """Removes all the jobs."""
+        self.jobs.clear()
+
+    def stop(self, *_args) -> None:
+        """Asks the scheduler to stop after the running job finishes."""
+        self._stop_requested = True
+        self._wakeup.set()
+
+    def reload(self, *_args) -> None:
+        """Asks the scheduler to reload the configuration."""
+        self._reload_requested = True
+        self._wakeup.set()
+
+    def run_pending(self) -> None:
+        """Runs all the jobs that are due."""
+        now = datetime.now()
+        for job in self.jobs:
+            if self._stop_requested:
+                return
+            if job.next_run <= now:
+                job.run()
+
+    def run(self, on_reload: Optional[Callable[[], None]] = None) -> None:
+        """Runs the jobs until `stop` is called."""
+        while not self._stop_requested:
+            if self._reload_requested:
+                self._reload_requested = False
+                if on_reload is not None:
+                    on_reload()
+            self.run_pending()
+            if not self.jobs:
+                timeout = None
+            else:
+                next_run = min(job.next_run for job in self.jobs)
+                timeout = max(0, (next_run - datetime.now()).total_seconds())
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+
+def report_job(no_collect: bool = False) -> None:
+    """Collects the data and sends the daily report."""
+    from src import main
+
+    main.run_report(no_collect=no_collect)
+
+
+def snapshot_job() -> None:
+    """Collects the local data and saves it to the file."""
+    from src import main
+
+    main.run_report(save_to_file=True)
+
+
+def quota_job(no_collect: bool = False) -> None:
+    """Checks today's traffic against the quota rules."""
+    from src import main
+
+    main.run_quota_check(no_collect=no_collect)
+
+
+def schedule_jobs(
+    scheduler: Scheduler, no_collect: bool = False, profile: bool = False
+) -> None:
+    """(Re)creates the jobs from the current settings."""
+    scheduler.clear()
+    scheduler.add(
+        Job(
+            "daily report",
+            lambda: report_job(no_collect),
+            at=time.fromisoformat(settings.DAEMON_REPORT_TIME),
+            profile=profile,
+        )
+    )
+    if settings.DAEMON_SNAPSHOT_INTERVAL:
+        scheduler.add(
+            Job(
+                "snapshot",
+                snapshot_job,
+                interval=timedelta(seconds=settings.DAEMON_SNAPSHOT_INTERVAL),
+                profile=profile,
+            )
+        )
+    if settings.QUOTA_RULES and settings.DAEMON_QUOTA_INTERVAL:
+        scheduler.add(
+            Job(
+                "quota check",
+                lambda: quota_job(no_collect),
+                interval=timedelta(seconds=settings.DAEMON_QUOTA_INTERVAL),
+                profile=profile,
+            )
+        )
+    logger.info("Scheduled jobs: %s", scheduler.jobs)
+
+
+def _reset_state() -> None:
+    """Recreates the long-lived objects so that they use the new settings."""
+    from src import alerts, delivery, quota, render
+
+    alerts.aggregator.flush()
+    alerts.aggregator = alerts.AlertAggregator()
+    quota.tracker = quota.QuotaTracker()
+    render.renderer = render.Renderer()
+    render.render = render.renderer.render
+    delivery.get_delivery.cache_clear()
+
+    ssh.pool.close_all()
+    ssh.pool = ssh.SSHConnectionPool()
+    ssh.sync_cache = ssh.RemoteSyncCache()
+    ssh._load_private_key.cache_clear()
+
+
+def reload_settings(
+    scheduler: Scheduler, no_collect: bool = False, profile: bool = False
+) -> None:
+    """
+    Re-reads the .env file and reschedules the jobs.
+
+    The settings are read at call time, so the modules pick up the new values
+    once the SSH connections, the cached keys and the module-wide singletons
+    (alerts, quota state, renderer, Telegram delivery) are recreated.
+    """
+    logger.info("Reloading the configuration")
+    importlib.reload(settings)
+    _reset_state()
+    schedule_jobs(scheduler, no_collect, profile)
+
+
+def run(no_collect: bool = False, profile: bool = False) -> None:
+    """
+    Runs the daemon until SIGTERM or SIGINT.
+
+    SIGHUP re-reads the .env file and reschedules the jobs. The imports, the
+    SSH connections and the parsed configuration stay warm between the runs.
+    With REMOTE_COLLECTION=push the snapshot receiver runs alongside, and
+    with METRICS_LISTEN_PORT the `/metrics` endpoint. With `profile` the
+    stages of every job run are summarized in the log.
+    """
+    scheduler = Scheduler()
+    schedule_jobs(scheduler, no_collect, profile)
+
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    signal.signal(signal.SIGHUP, scheduler.reload)
+
+    receiver = None
+    if settings.REMOTE_COLLECTION == "push":
+        from src import push
+
+        receiver = push.start_receiver()
+
+    metrics_server = None
+    if settings.METRICS_LISTEN_PORT:
+        from src import metrics
+
+        metrics_server = metrics.start_server()
+
+    logger.info("Daemon started")
+    try:
+        scheduler.run(lambda: reload_settings(scheduler, no_collect, profile))
+    finally:
+        if receiver is not None:
+            receiver.shutdown()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        ssh.pool.close_all()
+        logger.info("Daemon stopped")
@@ -0,0 +1,397 @@
+import functools
+import json
+import re
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from pathlib import Path
+from typing import Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src import exceptions as exc
+from src import metrics, settings, utils
+from src.log import configure_logging, log
+
+logger = configure_logging(__name__)
+
+MESSAGE_LIMIT = 4096
+# Preferred split points, from the section boundary down to a single line.
+SEPARATORS = ("====================\n\n", "\n\n", "\n")
+# A tag, an entity or a single character of an HTML message.
+HTML_TOKEN = re.compile(r"<(/?)([\w-]+)[^>]*>|&#?\w+;|.", re.DOTALL)
+HTML_TAG = re.compile(r"<(/?)([\w-]+)[^>]*>")
+
+
+def _split_keeping_separator(message: str, separator: str) -> list[str]:
+    parts = message.split(separator)
+    return [part + separator for part in parts[:-1]] + (
+        [parts[-1]] if parts[-1] else []
+    )
+
+
+def _slice_html(text: str, limit: int) -> list[str]:
+    """
+    Slices the HTML text into chunks of up to `limit` characters.
+
+    The text is never cut inside a tag or an entity. The tags that are open
+    at a cut are closed at the end of the chunk and reopened at the start of
+    the next one.
+    """
+    chunks = []
+    current = ""
+    has_text = False
+    # (name, opening tag) of the open tags, innermost last.
+    open_tags: list[tuple[str, str]] = []
+    # Where the opening tags at the end of `current` start (moved on a cut).
+    opening_start = 0
+    for match in HTML_TOKEN.finditer(text):
+        token, closing, name = match.group(0), match.group(1), match.group(2)
+        tags = open_tags
+        if name and not closing:
+            tags = [*open_tags, (name, token)]
+        elif name and open_tags and open_tags[-1][0] == name:
+            tags = open_tags[:-1]
+        closing_length = sum(len(f"</{tag}>") for tag, _ in tags)
+        if has_text and len(current) + len(token) + closing_length > limit:
+            moved = len(HTML_TOKEN.findall(current[opening_start:]))
+            chunks.append(
+                current[:opening_start]
+                + "".join(
+                    f"</{tag}>"
+                    for tag, _ in reversed(open_tags[: len(open_tags) - moved])
+                )
+            )
+            current = "".join(opening for _, opening in open_tags)
+            opening_start = len(current)
+            has_text = False
+        if not name or closing:
+            opening_start = len(current) + len(token)
+        current += token
+        has_text = has_text or not name
+        open_tags = tags
+    if has_text:
+        chunks.append(current)
+    return chunks
+
+
+# The open tags of an HTML chunk, None for the plain text.
+OpenTags = Optional[tuple[tuple[str, str], ...]]
+
+
+def _get_open_tags(text: str, open_tags: OpenTags) -> OpenTags:
+    """Gets the tags (name, opening tag) still open after the HTML text."""
+    if open_tags is None:
+        return None
+    tags = list(open_tags)
+    for match in HTML_TAG.finditer(text):
+        closing, name = match.group(1), match.group(2)
+        if not closing:
+            tags.append((name, match.group(0)))
+        elif tags and tags[-1][0] == name:
+            tags.pop()
+    return tuple(tags)
+
+
+def _wrap_html(text: str, open_tags: OpenTags) -> str:
+    """
+    Reopens the tags open at the start of the chunk and closes the tags that
+    are still open at its end.
+    """
+    if open_tags is None:
+        return text
+    return (
+        "".join(opening for _, opening in open_tags)
+        + text
+        + "".join(
+            f"</{name}>"
+            for name, _ in reversed(_get_open_tags(text, open_tags))
+        )
+    )
+
+
+def _split(
+    message: str,
+    limit: int,
+    separators: tuple[str, ...],
+    open_tags: OpenTags,
+) -> list[tuple[str, OpenTags]]:
+    """
+    Splits the message into (chunk, tags open at its start) pairs.
+
+    The length of a chunk is checked with its tags reopened and closed.
+    """
+    if not separators:
+        if open_tags is not None:
+            # The reopened tags become a part of the sliced text.
+            reopened = "".join(opening for _, opening in open_tags)
+            return [
+                (chunk, ()) for chunk in _slice_html(reopened + message, limit)
+            ]
+        return [
+            (message[start : start + limit], None)
+            for start in range(0, len(message), limit)
+        ]
+
+    chunks = []
+    current, current_tags = "", open_tags
+    for part in _split_keeping_separator(message, separators[0]):
+        if len(_wrap_html(current + part, current_tags)) <= limit:
+            current += part
+            continue
+        if current:
+            chunks.append((current, current_tags))
+            current_tags = _get_open_tags(current, current_tags)
+        if len(_wrap_html(part, current_tags)) <= limit:
+            current = part
+        else:
+            *complete, (current, current_tags) = _split(
+                part, limit, separators[1:], current_tags
+            )
+            chunks.extend(complete)
+    if current:
+        chunks.append((current, current_tags))
+    return chunks
+
+
+@log
+def split_message(
+    message: str,
+    limit: int = MESSAGE_LIMIT,
+    separators: tuple[str, ...] = SEPARATORS,
+    parse_mode: Optional[str] = None,
+) -> list[str]:
+    """
+    Splits the message into chunks that fit into a Telegram message.
+
+    The message is split at the section boundaries first. A section that is
+    still too long is split at the blank lines, then at the line breaks, and
+    only as a last resort in the middle of a line (with the `HTML` parse mode
+    outside the tags and the entities, see `_slice_html`). With the `HTML`
+    parse mode the tags that are open at a split (e.g. a multi-line `<pre>`)
+    are closed at the end of the chunk and reopened at the start of the next.
+    """
+    if len(message) <= limit:
+        return [message]
+    open_tags = () if (parse_mode or "").upper() == "HTML" else None
+    return [
+        _wrap_html(chunk, tags)
+        for chunk, tags in _split(message, limit, separators, open_tags)
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def get_session() -> requests.Session:
+    """Gets the HTTP session shared by all the deliveries (keep-alive)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class TelegramDelivery:
+    """
+    Delivers messages to one or more Telegram chats.
+
+    Long messages are split into chunks, the Telegram rate limits (including
+    the `retry_after` of a 429 response) are respected and the failed requests
+    are retried with an exponential backoff. Messages that still could not be
+    delivered are spooled to disk and replayed before the next delivery.
+    """
+
+    def __init__(
+        self,
+        bot_token: str,
+        chat_ids: list[str],
+        *,
+        api_url: Optional[str] = None,
+        spool_dir: Union[str, Path, None] = None,
+        max_retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        timeout: Optional[float] = None,
+        chat_interval: Optional[float] = None,
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        api_url = (api_url or settings.TELEGRAM_API_URL).rstrip("/")
+        self.url = f"{api_url}/bot{bot_token}/sendMessage"
+        self.chat_ids = chat_ids
+        self.spool_dir = Path(spool_dir or settings.TELEGRAM_SPOOL_DIR)
+        self.max_retries = (
+            settings.TELEGRAM_MAX_RETRIES
+            if max_retries is None
+            else max_retries
+        )
+        self.backoff = (
+            settings.TELEGRAM_BACKOFF if backoff is None else backoff
+        )
+        self.timeout = (
+            settings.TELEGRAM_TIMEOUT if timeout is None else timeout
+        )
+        self.chat_interval = (
+            settings.TELEGRAM_CHAT_INTERVAL
+            if chat_interval is None
+            else chat_interval
+        )
+        self.session = session or get_session()
+        self._last_sent: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _wait_for_slot(self, chat_id: str) -> None:
+        with self._lock:
+            if (last_sent := self._last_sent.get(chat_id)) is not None:
+                if (
+                    delay := last_sent + self.chat_interval - time.monotonic()
+                ) > 0:
+                    time.sleep(delay)
+            self._last_sent[chat_id] = time.monotonic()
+
+    def _get_retry_delay(
+        self, attempt: int, response: Optional[requests.Response] = None
+    ) -> float:
+        """
+        Gets the delay before the next attempt.
+
+        The `retry_after` of a 429 response is respected, otherwise the delay
+        grows exponentially with the attempts.
+        """
+        if (
+            response is not None
+            and response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        ):
+            try:
+                return response.json()["parameters"]["retry_after"]
+            except (ValueError, KeyError, TypeError):
+                pass
+        return self.backoff * 2**attempt
+
+    def _post_once(self, chat_id: str, payload: dict) -> requests.Response:
+        self._wait_for_slot(chat_id)
+        with metrics.timer("telegram"):
+            return self.session.post(
+                self.url, json=payload, timeout=self.timeout
+            )
+
+    def _post(
+        self, chat_id: str, text: str, parse_mode: Optional[str]
+    ) -> None:
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                logger.warning(
+                    "Retrying Telegram message to %s (attempt %s): %s",
+                    chat_id,
+                    attempt,
+                    error,
+                )
+            try:
+                response = self._post_once(chat_id, payload)
+            except requests.RequestException as e:
+                error = e
+                if attempt < self.max_retries:
+                    time.sleep(self._get_retry_delay(attempt))
+                continue
+
+            if response.status_code == HTTPStatus.OK:
+                logger.info("Message sent successfully to %s.", chat_id)
+                return
+            error = f"status code {response.status_code}: {response.text}"
+            if (
+                response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR
+                and response.status_code != HTTPStatus.TOO_MANY_REQUESTS
+            ):
+                raise exc.TelegramRejectedError(
+                    f"Telegram rejected the message to {chat_id}: {error}"
+                )
+            if attempt < self.max_retries:
+                time.sleep(self._get_retry_delay(attempt, response))
+
+        raise exc.TelegramError(
+            f"Error sending Telegram message to {chat_id}: {error}"
+        )
+
+    def _spool(self, chat_id: str, text: str, parse_mode: Optional[str]):
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spool_dir / f"{time.time_ns()}-{uuid.uuid4().hex}.json"
+        # Written atomically, so that a crash never leaves a truncated file.
+        utils.save_json_state(
+            path, {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+        )
+        logger.warning("Telegram message to %s spooled to %s", chat_id, path)
+
+    @log
+    def replay_spool(self) -> int:
+        """
+        Sends the spooled messages in order and returns how many were sent.
+
+        Stops at the first message that still cannot be delivered, so that the
+        order of the messages is kept. Unreadable spool files are moved aside
+        with the `.bad` suffix and skipped.
+        """
+        if not self.spool_dir.is_dir():
+            return 0
+        sent = 0
+        for path in sorted(self.spool_dir.glob("*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    spooled = json.load(file)
+                chat_id, text = spooled["chat_id"], spooled["text"]
+                parse_mode = spooled.get("parse_mode")
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.error(
+                    "Skipping the corrupted spool file %s: %s", path, e
+                )
+                path.replace(path.with_suffix(".bad"))
+                continue
+            try:
+                self._post(chat_id, text, parse_mode)
+            except exc.TelegramRejectedError as e:
+                logger.error("Dropping spooled message %s: %s", path, e)
+            except exc.TelegramError:
+                return sent
+            else:
+                sent += 1
+            path.unlink()
+        return sent
+
+    @log
+    def send(self, message: str, parse_mode: Optional[str] = "HTML") -> None:
+        """Sends the message to all the chats."""
+        try:
+            self.replay_spool()
+        except exc.TelegramError as e:
+            logger.error("Failed to replay the spooled messages: %s", e)
+
+        errors = []
+        chunks = split_message(message, parse_mode=parse_mode)
+        for chat_id in self.chat_ids:
+            for index, chunk in enumerate(chunks):
+                try:
+                    self._post(chat_id, chunk, parse_mode)
+                except exc.TelegramRejectedError as e:
+                    errors.append(e)
+                    break
+                except exc.TelegramError as e:
+                    errors.append(e)
+                    # Keep the rest of the message for the replay, in order.
+                    for remaining in chunks[index:]:
+                        self._spool(chat_id, remaining, parse_mode)
+                    break
+        if errors:
+            raise exc.TelegramError("; ".join(str(e) for e in errors))
+
+
+@functools.lru_cache(maxsize=None)
+def get_delivery(
+    bot_token: str,
+    chat_ids: tuple[str, ...],
+    api_url: Optional[str] = None,
+) -> TelegramDelivery:
+    """Gets the delivery for the bot and the chats (shared rate limits)."""
+    return TelegramDelivery(bot_token, list(chat_ids), api_url=api_url)
@@ -15,6 +15,30 @@ class FetchError(InternalError):
     """Raised when the output from the system command cannot be parsed."""
 
 
+class DatabaseError(InternalError):
+    """Raised when the vnstat database cannot be read."""
+
+
+class PushError(InternalError):
+    """Raised when the snapshot cannot be pushed or received."""
+
+
+class HistoryError(InternalError):
+    """Raised when the history store cannot be read or written."""
+
+
+class QuotaRuleError(InternalError):
+    """Raised when a quota rule cannot be parsed."""
+
+
+class AggregationError(InternalError):
+    """Raised when the systems cannot be aggregated (e.g. invalid tags)."""
+
+
+class ReportFormatError(InternalError):
+    """Raised when the report format is not supported."""
+
+
 class MissingTargetDateError(InternalError):
     """Raised when the target date is missing in the Vnstat data."""
 
@@ -31,6 +55,10 @@ class TelegramError(InternalError):
     """Raised when the Telegram message cannot be sent."""
 
 
+class TelegramRejectedError(TelegramError):
+    """Raised when Telegram rejects the message (retrying will not help)."""
+
+
 class SSHError(InternalError):
     """Raised when the SSH connection cannot be established."""
 
@@ -39,18 +67,25 @@ class SCPError(InternalError):
     """Raised when the SSH connection cannot be established."""
 
 
+class SFTPError(InternalError):
+    """Raised when the remote file cannot be read over SFTP."""
+
+
 @log
 def handle_exception(
     exception: Exception, re_raise: bool = True, send_tg: bool = True
 ) -> None:
     """
-    Log the exception, (optionally) send Telegram message and re-raise."""
-    from src.tg import send_telegram_message
+    Log the exception, (optionally) alert via Telegram and re-raise.
+
+    The alerts are not sent right away: they are collected by the alert
+    aggregator and sent as one digest when it is flushed (at the end of the
+    run at the latest).
+    """
+    from src.alerts import aggregator
 
     logger.exception(exception)
     if send_tg:
-        send_telegram_message(
-            f"An exception was raised in your vnstat monitor: {str(exception)}"
-        )
+        aggregator.add(exception)
     if re_raise:
         raise exception
@@ -0,0 +1,134 @@
+import calendar
+import math
+from datetime import date
+from itertools import accumulate
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from src import settings
+from src.log import log
+
+if TYPE_CHECKING:
+    from src.vnstat import VnStatData
+
+# Days before the anomaly detection starts (the deviation is meaningless on
+# fewer points).
+MIN_ANOMALY_HISTORY = 3
+# Lower bound of the deviation relative to the mean, so that a spike after
+# perfectly flat days is still flagged and small jitter is not.
+MIN_RELATIVE_DEVIATION = 0.1
+
+
+class Forecast(NamedTuple):
+    """End-of-month forecast of a system."""
+
+    system_name: str
+    month_traffic: int
+    daily_average: int
+    anomalous_days: tuple[date, ...]
+
+
+def _fit_trend(values: list[int]) -> tuple[float, float]:
+    """Gets the mean and the least-squares slope of the values."""
+    count = len(values)
+    mean = sum(values) / count
+    center = (count - 1) / 2
+    if not (variance := sum((x - center) ** 2 for x in range(count))):
+        return mean, 0.0
+    covariance = sum((x - center) * (v - mean) for x, v in enumerate(values))
+    return mean, covariance / variance
+
+
+def _get_anomalous_days(
+    days: list[tuple[int, int]], window: int, threshold: float
+) -> list[int]:
+    """
+    Gets the days deviating from the preceding `window` days.
+
+    The moving mean and deviation are computed from the running sums, so the
+    whole month is processed in one pass.
+    """
+    values = [value for _, value in days]
+    sums = [0, *accumulate(values)]
+    squares = [0, *accumulate(value * value for value in values)]
+    anomalous = []
+    for index in range(MIN_ANOMALY_HISTORY, len(days)):
+        start = max(0, index - window)
+        count = index - start
+        mean = (sums[index] - sums[start]) / count
+        variance = (squares[index] - squares[start]) / count - mean * mean
+        deviation = max(
+            math.sqrt(max(variance, 0)), mean * MIN_RELATIVE_DEVIATION
+        )
+        if deviation and abs(values[index] - mean) > threshold * deviation:
+            anomalous.append(days[index][0])
+    return anomalous
+
+
+@log
+def get_forecast(
+    vn_obj: "VnStatData",
+    window: Optional[int] = None,
+    threshold: Optional[float] = None,
+    today: Optional[date] = None,
+) -> Optional[Forecast]:
+    """
+    Projects the month-end traffic of the system from its daily traffic.
+
+    The trend (mean and slope) is fitted on the latest `window` complete days
+    that are not anomalous and extended over the days still to come. A day
+    that is not over yet (the snapshot of today) is one of the days to come:
+    its partial traffic is left out of both the fit and the total. Returns
+    None if the object has no daily traffic.
+    """
+    window = window or settings.FORECAST_WINDOW
+    threshold = threshold or settings.FORECAST_ANOMALY_THRESHOLD
+    if vn_obj is None or not vn_obj.daily_traffic or vn_obj.error:
+        return None
+    stat_date = vn_obj.stat_date
+    last_complete_day = stat_date.day
+    if stat_date >= (today or date.today()):
+        last_complete_day -= 1
+    days = [
+        (day, traffic)
+        for day, traffic in enumerate(vn_obj.daily_traffic, start=1)
+        if traffic is not None and day <= last_complete_day
+    ]
+    if not days:
+        return None
+    month_traffic = sum(traffic for _, traffic in days)
+    if vn_obj.month_traffic is not None:
+        # The month total also counts the days missing from the series.
+        month_traffic = vn_obj.month_traffic
+        if last_complete_day < stat_date.day:
+            month_traffic -= vn_obj.day_traffic or 0
+
+    anomalous_days = _get_anomalous_days(days, window, threshold)
+    normal = [traffic for day, traffic in days if day not in anomalous_days]
+    recent = normal[-window:]
+    mean, slope = _fit_trend(recent)
+    center = (len(recent) - 1) / 2
+    days_in_month = calendar.monthrange(stat_date.year, stat_date.month)[1]
+    remaining = sum(
+        max(0.0, mean + slope * (len(recent) - 1 - center + offset))
+        for offset in range(1, days_in_month - last_complete_day + 1)
+    )
+    return Forecast(
+        system_name=vn_obj.system_name,
+        month_traffic=int(month_traffic + remaining),
+        daily_average=int(mean),
+        anomalous_days=tuple(
+            stat_date.replace(day=day) for day in anomalous_days
+        ),
+    )
+
+
+@log
+def get_forecasts(
+    *vnstat_objects: "VnStatData",
+) -> dict[str, Optional[Forecast]]:
+    """Gets the forecasts of all the systems by the system name."""
+    return {
+        vn_obj.system_name: get_forecast(vn_obj)
+        for vn_obj in vnstat_objects
+        if vn_obj is not None
+    }
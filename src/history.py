@@ -0,0 +1,257 @@
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional, Union
+
+from src import exceptions as exc
+from src import settings
+from src.log import log
+from src.vnstat import VnStatData
+
+# Interface name of the rows holding the totals of a snapshot.
+TOTAL_INTERFACE = "*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    system_name TEXT NOT NULL,
+    interface TEXT NOT NULL,
+    stat_date TEXT NOT NULL,
+    collected_at TEXT NOT NULL,
+    day_traffic INTEGER,
+    month_traffic INTEGER,
+    service_status TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_key
+    ON snapshots (system_name, interface, stat_date, id);
+CREATE INDEX IF NOT EXISTS snapshots_date
+    ON snapshots (stat_date, interface, system_name, id);
+"""
+
+# The latest snapshot without an error wins, the latest one with an error is
+# only used when there is no other.
+LATEST_ID = "COALESCE(MAX(CASE WHEN error IS NULL THEN id END), MAX(id))"
+
+LATEST_TOTALS_QUERY = f"""
+SELECT system_name, stat_date, collected_at, day_traffic, month_traffic,
+       service_status, error
+FROM snapshots
+WHERE id IN (
+    SELECT {LATEST_ID} FROM snapshots
+    WHERE stat_date = ? AND interface = '{TOTAL_INTERFACE}'
+    GROUP BY system_name
+)
+ORDER BY id
+"""
+
+SNAPSHOT_INTERFACES_QUERY = f"""
+SELECT interface, day_traffic, month_traffic
+FROM snapshots
+WHERE system_name = ? AND stat_date = ? AND collected_at = ?
+    AND interface != '{TOTAL_INTERFACE}'
+ORDER BY id
+"""
+
+DAILY_SERIES_QUERY = f"""
+SELECT stat_date, day_traffic, month_traffic
+FROM snapshots
+WHERE id IN (
+    SELECT {LATEST_ID} FROM snapshots
+    WHERE system_name = ? AND interface = ? AND stat_date BETWEEN ? AND ?
+    GROUP BY stat_date
+)
+ORDER BY stat_date
+"""
+
+
+DAILY_TRAFFIC_QUERY = f"""
+SELECT stat_date, day_traffic
+FROM snapshots
+WHERE id IN (
+    SELECT {LATEST_ID} FROM snapshots
+    WHERE system_name = ? AND interface = '{TOTAL_INTERFACE}'
+        AND stat_date BETWEEN ? AND ?
+    GROUP BY stat_date
+)
+"""
+
+
+# The databases whose schema was already set up by this process.
+_initialized: set[str] = set()
+_initialized_lock = threading.Lock()
+
+
+def _connect(db_path: Union[str, Path, None]) -> sqlite3.Connection:
+    db_path = db_path or settings.HISTORY_DB_PATH
+    connection = sqlite3.connect(db_path, timeout=30)
+    with _initialized_lock:
+        if (key := str(Path(db_path).resolve())) not in _initialized:
+            # WAL lets the readers (reports) work while a collector is
+            # writing. The mode is persistent, so it is only set once.
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            _initialized.add(key)
+    return connection
+
+
+@log
+def record(
+    *vnstat_objects: VnStatData,
+    db_path: Union[str, Path, None] = None,
+) -> None:
+    """
+    Appends the snapshots to the history store.
+
+    Every snapshot is stored as a row with the totals (interface `*`) plus a
+    row per interface. Rows are never updated: the latest row wins on read,
+    unless it holds an error and an earlier row of the date does not.
+    """
+    collected_at = datetime.now().isoformat()
+    rows = []
+    for vn_obj in vnstat_objects:
+        stat_date = vn_obj.stat_date.isoformat()
+        rows.append(
+            (
+                vn_obj.system_name,
+                TOTAL_INTERFACE,
+                stat_date,
+                collected_at,
+                vn_obj.day_traffic,
+                vn_obj.month_traffic,
+                vn_obj.service_status,
+                vn_obj.error,
+            )
+        )
+        for interface, traffic in (vn_obj.interfaces or {}).items():
+            rows.append(
+                (
+                    vn_obj.system_name,
+                    interface,
+                    stat_date,
+                    collected_at,
+                    traffic["day_traffic"],
+                    traffic["month_traffic"],
+                    None,
+                    None,
+                )
+            )
+    try:
+        with closing(_connect(db_path)) as connection:
+            # The connection context commits the transaction (or rolls it
+            # back on an error).
+            with connection:
+                connection.executemany(
+                    "INSERT INTO snapshots (system_name, interface, "
+                    "stat_date, collected_at, day_traffic, month_traffic, "
+                    "service_status, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+    except sqlite3.Error as e:
+        raise exc.HistoryError(f"Failed to record the snapshots: {e}")
+
+
+@log
+def get_snapshots(
+    stat_date: date,
+    db_path: Union[str, Path, None] = None,
+) -> list[VnStatData]:
+    """
+    Gets the latest stored snapshot of every system for the date.
+
+    The daily traffic of the snapshots is rebuilt from the stored days of the
+    month.
+    """
+    try:
+        with closing(_connect(db_path)) as connection:
+            totals = connection.execute(
+                LATEST_TOTALS_QUERY, (stat_date.isoformat(),)
+            ).fetchall()
+            snapshots = []
+            for (
+                system_name,
+                row_date,
+                collected_at,
+                day_traffic,
+                month_traffic,
+                service_status,
+                error,
+            ) in totals:
+                interfaces = {
+                    interface: {
+                        "day_traffic": interface_day,
+                        "month_traffic": interface_month,
+                    }
+                    for interface, interface_day, interface_month in (
+                        connection.execute(
+                            SNAPSHOT_INTERFACES_QUERY,
+                            (system_name, row_date, collected_at),
+                        )
+                    )
+                }
+                stat_date_obj = date.fromisoformat(row_date)
+                daily_traffic = dict(
+                    connection.execute(
+                        DAILY_TRAFFIC_QUERY,
+                        (
+                            system_name,
+                            stat_date_obj.replace(day=1).isoformat(),
+                            row_date,
+                        ),
+                    )
+                )
+                snapshots.append(
+                    VnStatData(
+                        system_name=system_name,
+                        service_status=service_status,
+                        stat_date=stat_date_obj,
+                        day_traffic=day_traffic,
+                        month_traffic=month_traffic,
+                        error=error,
+                        interfaces=interfaces or None,
+                        daily_traffic=[
+                            daily_traffic.get(
+                                stat_date_obj.replace(day=day).isoformat()
+                            )
+                            for day in range(1, stat_date_obj.day + 1)
+                        ],
+                    )
+                )
+    except sqlite3.Error as e:
+        raise exc.HistoryError(f"Failed to read the snapshots: {e}")
+    return snapshots
+
+
+@log
+def get_daily_series(
+    system_name: str,
+    start_date: date,
+    end_date: date,
+    interface: str = TOTAL_INTERFACE,
+    db_path: Union[str, Path, None] = None,
+) -> list[tuple[date, Optional[int], Optional[int]]]:
+    """
+    Gets the (date, day traffic, month traffic) series of a system.
+
+    Only the latest snapshot of every date is used. The totals of the system
+    are returned unless a particular interface is requested.
+    """
+    try:
+        with closing(_connect(db_path)) as connection:
+            rows = connection.execute(
+                DAILY_SERIES_QUERY,
+                (
+                    system_name,
+                    interface,
+                    start_date.isoformat(),
+                    end_date.isoformat(),
+                ),
+            ).fetchall()
+    except sqlite3.Error as e:
+        raise exc.HistoryError(f"Failed to read the daily series: {e}")
+    return [
+        (date.fromisoformat(stat_date), day_traffic, month_traffic)
+        for stat_date, day_traffic, month_traffic in rows
+    ]
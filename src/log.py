@@ -1,16 +1,23 @@
+import atexit
 import functools
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 
 from src import settings
 
 
-def configure_logging(name: str, level: int = logging.DEBUG) -> logging.Logger:
-    """Logging configuration."""
+@functools.lru_cache(maxsize=None)
+def _get_queue_handler() -> QueueHandler:
+    """
+    Creates the handler shared by all the loggers (once).
+
+    The records are put on a queue and written to the rotating log file by a
+    background listener, so logging never blocks on the disk.
+    """
     settings.LOG_DIR.mkdir(exist_ok=True)
 
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
     formatter = logging.Formatter(
         fmt=settings.LOG_FORMAT, datefmt=settings.LOG_DT_FMT
     )
@@ -22,35 +29,75 @@ def configure_logging(name: str, level: int = logging.DEBUG) -> logging.Logger:
     )
     rotating_handler.setFormatter(formatter)
     rotating_handler.setLevel(settings.LOG_FILE_LEVEL)
-    logger.addHandler(rotating_handler)
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(
+        log_queue, rotating_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return QueueHandler(log_queue)
+
+
+def configure_logging(
+    name: str, level: Optional[int] = None
+) -> logging.Logger:
+    """
+    Logging configuration.
+
+    The level defaults to LOG_FILE_LEVEL, so that disabled levels are cheap to
+    check. Configuring the same logger again does not add more handlers.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(settings.LOG_FILE_LEVEL if level is None else level)
+    if (handler := _get_queue_handler()) not in logger.handlers:
+        logger.addHandler(handler)
     return logger
 
 
+class _Signature:
+    """Call arguments that are only formatted if the record is emitted."""
+
+    __slots__ = ("args", "kwargs")
+
+    def __init__(self, args: tuple, kwargs: dict) -> None:
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        args_repr = [repr(a) for a in self.args]
+        kwargs_repr = [f"{k}={v!r}" for k, v in self.kwargs.items()]
+        return ", ".join(args_repr + kwargs_repr)
+
+
 def log(_func=None, *, my_logger: logging.Logger = None):
     """Decorator for logging function calls."""
 
     def decorator_log(func):
+        logger = (
+            configure_logging(func.__module__)
+            if my_logger is None
+            else my_logger
+        )
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            if my_logger is None:
-                logger = configure_logging(func.__name__)
-            else:
-                logger = my_logger
-            args_repr = [repr(a) for a in args]
-            kwargs_repr = [f"{k}={v!r}" for k, v in kwargs.items()]
-            signature = ", ".join(args_repr + kwargs_repr)
-            logger.debug(
-                "function %s called with args %s", func.__name__, signature
-            )
+            if debug := logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "function %s called with args %s",
+                    func.__name__,
+                    _Signature(args, kwargs),
+                )
             try:
                 result = func(*args, **kwargs)
-                logger.debug("function %s returned %s", func.__name__, result)
-                return result
             except Exception as e:
                 logger.exception(
                     "Exception raised in %s. exception: %s", func.__name__, e
                 )
                 raise e
+            if debug:
+                logger.debug("function %s returned %s", func.__name__, result)
+            return result
 
         return wrapper
 
@@ -1,7 +1,16 @@
 import argparse
+import contextlib
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Optional
 
 from src import exceptions as exc
-from src import settings, ssh, tg, utils, vnstat
+from src import metrics, render, settings, utils, vnstat
+
+# `ssh` (paramiko, scp, cryptography) and `tg` (requests) are only imported
+# on the code paths that use them, so `--save-to-file` starts fast.
 
 parser = argparse.ArgumentParser(
     prog="Vnstat Notifier",
@@ -16,13 +25,87 @@ parser.add_argument(
 parser.add_argument(
     "-n", "--no-collect", action="store_true", help="Send only the local stats"
 )
-args = parser.parse_args()
+parser.add_argument(
+    "-H",
+    "--from-history",
+    action="store_true",
+    help="Send the stats stored in the history instead of collecting them",
+)
+parser.add_argument(
+    "-p",
+    "--push",
+    action="store_true",
+    help="Only push the local stat to the aggregator (PUSH_URL)",
+)
+parser.add_argument(
+    "-P",
+    "--push-partial",
+    action="store_true",
+    help=(
+        "Collect the stats of this node and its remotes and push them "
+        "pre-aggregated to the upper aggregator (PUSH_URL)"
+    ),
+)
+parser.add_argument(
+    "-r",
+    "--receive",
+    action="store_true",
+    help="Run the receiver of the snapshots pushed by the remotes",
+)
+parser.add_argument(
+    "-q",
+    "--check-quotas",
+    action="store_true",
+    help="Check today's traffic against the quota rules (QUOTA_RULES)",
+)
+parser.add_argument(
+    "-b",
+    "--backfill",
+    nargs=2,
+    type=date.fromisoformat,
+    metavar=("START", "END"),
+    help="Send the reports for every date from START to END (YYYY-MM-DD)",
+)
+parser.add_argument(
+    "--monthly",
+    action="store_true",
+    help="With --backfill, send one report per month instead of per day",
+)
+parser.add_argument(
+    "-o",
+    "--output-dir",
+    help="With --backfill, save the data to JSON files in the directory",
+)
+parser.add_argument(
+    "-d",
+    "--daemon",
+    action="store_true",
+    help="Run as a daemon with the internal scheduler",
+)
+parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="Log (and print) the time spent in every stage of the run",
+)
+parser.add_argument(
+    "--cprofile",
+    metavar="FILE",
+    help="Profile the run with cProfile and dump the stats to FILE",
+)
+parser.add_argument(
+    "--tracemalloc",
+    action="store_true",
+    help="Add the peak memory and the top allocations to the profile",
+)
 
 
-def get_local_vnstat_data():
-    """Gets the local VnStat data."""
+def get_local_vnstat_data(target_date: Optional[date] = None):
+    """Gets the local VnStat data (of yesterday by default)."""
     try:
-        return vnstat.get_traffic_data(settings.LOCAL_SYSTEM_NAME)
+        with metrics.timer("local_collection"):
+            return vnstat.get_traffic_data(
+                settings.LOCAL_SYSTEM_NAME, target_date
+            )
     except Exception as e:
         exc.handle_exception(e)
         return None
@@ -36,49 +119,320 @@ def save_data_to_file(local):
         exc.handle_exception(e)
 
 
-def generate_local_msg(local):
-    """Generates the VnStat message only for the local machine."""
+def is_saved_to_file(local):
+    """Checks whether the snapshot file already holds the local VnStat data."""
+    return (
+        local is not None
+        and utils.load_json_state(settings.LOCAL_JSON_FILE_NAME)
+        == local.to_dict()
+    )
+
+
+def push_data(local):
+    """Pushes the local VnStat data to the aggregator."""
     try:
-        return tg.get_final_msg(local)
+        from src import push
+
+        push.push_snapshot(local)
     except Exception as e:
         exc.handle_exception(e)
-        return None
 
 
-def generate_combined_msg(local):
-    """Generates the VnStat message for both local and remote machines."""
+def push_partial_data(*vnstat_objects):
+    """Pushes the pre-aggregated VnStat data to the upper aggregator."""
+    try:
+        from src import aggregate, push
+
+        push.push_snapshot(aggregate.get_partial(*vnstat_objects))
+    except Exception as e:
+        exc.handle_exception(e)
+
+
+def save_data_to_history(*vnstat_objects):
+    """Appends the VnStat data to the history store."""
+    if not settings.HISTORY_ENABLED:
+        return
+    try:
+        from src import history
+
+        with metrics.timer("history_record"):
+            history.record(*vnstat_objects)
+    except Exception as e:
+        exc.handle_exception(e, re_raise=False)
+
+
+def get_history_vnstat_data(stat_date: Optional[date] = None):
+    """Gets the VnStat data of all the machines from the history store."""
     try:
-        remote = ssh.get_remote_vnstat_data()
-        return tg.get_final_msg(local, remote)
+        from src import history
+
+        return history.get_snapshots(
+            stat_date or date.today() - timedelta(days=1)
+        )
+    except Exception as e:
+        exc.handle_exception(e)
+        return []
+
+
+def get_remote_vnstat_data():
+    """Gets the VnStat data of the remote machines (pulled or pushed)."""
+    try:
+        with metrics.timer("remote_collection"):
+            if settings.REMOTE_COLLECTION == "push":
+                from src import push
+
+                return push.get_pushed_vnstat_data()
+
+            from src import ssh
+
+            return ssh.get_all_remote_vnstat_data()
+    except Exception as e:
+        exc.handle_exception(e)
+        return []
+
+
+def check_quotas(*vnstat_objects):
+    """Gets the alerts for the quota rules crossed by the VnStat data."""
+    try:
+        from src import quota
+
+        return quota.tracker.evaluate(quota.get_rules(), *vnstat_objects)
+    except Exception as e:
+        exc.handle_exception(e)
+        return []
+
+
+def collect_vnstat_data(
+    no_collect: bool = False, target_date: Optional[date] = None
+):
+    """
+    Collects the local and (unless `no_collect`) the remote VnStat data.
+
+    The remotes are fetched in a background thread while the local data is
+    collected, so the collection takes as long as the slower of the two.
+    Both stages keep their own error handling.
+    """
+    if no_collect:
+        return get_local_vnstat_data(target_date), []
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="remote")
+    try:
+        remotes_future = executor.submit(get_remote_vnstat_data)
+        local = get_local_vnstat_data(target_date)
+        return local, remotes_future.result()
+    finally:
+        executor.shutdown(wait=False)
+
+
+def export_metrics(*vnstat_objects):
+    """Sets the traffic metrics and writes the metrics textfile."""
+    try:
+        metrics.registry.set_traffic(*vnstat_objects)
+        metrics.registry.write_textfile()
+    except Exception as e:
+        exc.handle_exception(e, re_raise=False)
+
+
+def generate_msg(*vnstat_objects):
+    """Generates the VnStat message for the given machines."""
+    try:
+        from src import tg
+
+        with metrics.timer("message"):
+            return tg.get_final_msg(*vnstat_objects)
     except Exception as e:
         exc.handle_exception(e)
         return None
 
 
 def send_telegram_msg(msg):
-    """Sends the VnStat message to Telegram."""
+    """Sends the VnStat message to Telegram (in the report format)."""
     try:
-        tg.send_telegram_message(msg)
+        from src import tg
+
+        with metrics.timer("telegram_send"):
+            tg.send_telegram_message(
+                msg, parse_mode=render.get_format().parse_mode
+            )
     except exc.TelegramError as e:
         exc.handle_exception(e, send_tg=False)
     except Exception as e:
         exc.handle_exception(e, send_tg=False)
 
 
-def main():
-    """Main function."""
-    local = get_local_vnstat_data()
+def run_report(
+    save_to_file: bool = False,
+    no_collect: bool = False,
+    from_history: bool = False,
+    push: bool = False,
+    push_partial: bool = False,
+):
+    """Collects the VnStat data and sends (or saves, or pushes) the report."""
+    try:
+        _run_report(save_to_file, no_collect, from_history, push, push_partial)
+    finally:
+        from src.alerts import aggregator
+
+        aggregator.flush()
+
 
-    if args.save_to_file:
-        save_data_to_file(local)
+def _run_report(
+    save_to_file: bool,
+    no_collect: bool,
+    from_history: bool,
+    push: bool,
+    push_partial: bool = False,
+):
+    if from_history:
+        send_telegram_msg(generate_msg(*get_history_vnstat_data()))
         return
 
-    if args.no_collect:
-        msg = generate_local_msg(local)
-    else:
-        msg = generate_combined_msg(local)
+    if save_to_file or push:
+        local = get_local_vnstat_data()
+        # The snapshot is repeated (e.g. by the daemon) during the day, while
+        # the data of yesterday rarely changes: only the changes are stored.
+        unchanged = save_to_file and is_saved_to_file(local)
+        if save_to_file and not unchanged:
+            save_data_to_file(local)
+        if push:
+            push_data(local)
+        if not unchanged:
+            save_data_to_history(local)
+        export_metrics(local)
+        return
+
+    local, remotes = collect_vnstat_data(no_collect)
+    # The pushed snapshots are already in the history.
+    pulled = remotes if settings.REMOTE_COLLECTION != "push" else []
+    save_data_to_history(local, *pulled)
+    if push_partial:
+        # A mid-tier aggregator: the upper tier reports on the partial.
+        push_partial_data(local, *remotes)
+        export_metrics(local, *remotes)
+        return
+    msg = generate_msg(local, *remotes)
 
     send_telegram_msg(msg)
+    export_metrics(local, *remotes)
+
+
+def get_today_vnstat_data(no_collect: bool = False):
+    """
+    Gets today's VnStat data of the systems the quotas are checked for.
+
+    The snapshot files of the pulled remotes hold the previous day, so vnstat
+    is run on the remotes for today instead (one command over the pooled
+    connection, as for a backfill). The pushed snapshots are only as recent
+    as the last push, so with REMOTE_COLLECTION=push only the local system is
+    checked.
+    """
+    today = date.today()
+    if no_collect or settings.REMOTE_COLLECTION == "push":
+        return [get_local_vnstat_data(today)]
+    try:
+        from src import backfill
+
+        with metrics.timer("quota_collection"):
+            return backfill.collect(today, today)[today]
+    except Exception as e:
+        exc.handle_exception(e)
+        return []
+
+
+def run_quota_check(no_collect: bool = False):
+    """Checks today's VnStat data against the quotas and sends the alerts."""
+    try:
+        if alerts := check_quotas(*get_today_vnstat_data(no_collect)):
+            send_telegram_msg(render.render_markup("\n\n".join(alerts)))
+    finally:
+        from src.alerts import aggregator
+
+        aggregator.flush()
+
+
+def profile_run(args: argparse.Namespace, name: str):
+    """Gets the profiling context of the run (a no-op without the flags)."""
+    if not (args.profile or args.cprofile or args.tracemalloc):
+        return contextlib.nullcontext({})
+
+    from src import profiling
+
+    return profiling.profile_run(
+        name, cprofile_path=args.cprofile, trace_memory=args.tracemalloc
+    )
+
+
+def run_backfill(
+    start_date: date,
+    end_date: date,
+    monthly: bool = False,
+    no_collect: bool = False,
+    output_dir: Optional[str] = None,
+):
+    """
+    Collects the VnStat data of a date range and sends (or saves) it.
+
+    Every system is queried once for the whole range, so a missed week costs
+    one vnstat call per host, not one per day.
+    """
+    try:
+        from src import backfill
+
+        with metrics.timer("backfill_collection"):
+            data = backfill.collect(start_date, end_date, no_collect)
+        dates = backfill.get_report_dates(start_date, end_date, monthly)
+        if output_dir:
+            backfill.save_to_files(data, dates, output_dir)
+            return
+        with metrics.timer("message"):
+            msg = backfill.get_message(data, dates, monthly)
+        send_telegram_msg(msg)
+    except Exception as e:
+        exc.handle_exception(e)
+    finally:
+        from src.alerts import aggregator
+
+        aggregator.flush()
+
+
+def main(args: Optional[argparse.Namespace] = None):
+    """Main function."""
+    args = args or parser.parse_args()
+
+    if args.daemon:
+        from src import daemon
+
+        daemon.run(no_collect=args.no_collect, profile=args.profile)
+        return
+
+    if args.receive:
+        from src import push
+
+        push.make_server().serve_forever()
+        return
+
+    if args.backfill and args.backfill[0] > args.backfill[1]:
+        parser.error("the backfill START must not be after END")
+
+    with profile_run(args, "report") as summary:
+        if args.backfill:
+            run_backfill(
+                *args.backfill,
+                monthly=args.monthly,
+                no_collect=args.no_collect,
+                output_dir=args.output_dir,
+            )
+        elif args.check_quotas:
+            run_quota_check(no_collect=args.no_collect)
+        else:
+            run_report(
+                save_to_file=args.save_to_file,
+                no_collect=args.no_collect,
+                from_history=args.from_history,
+                push=args.push,
+                push_partial=args.push_partial,
+            )
+    if summary:
+        print(json.dumps(summary, indent=2), file=sys.stderr)
 
 
 if __name__ == "__main__":
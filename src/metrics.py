@@ -0,0 +1,261 @@
+"""
+Prometheus metrics of the collected traffic and of the collector itself.
+
+The metrics are rendered in the Prometheus text exposition format, either to
+a file for the node_exporter textfile collector or over HTTP (`/metrics`).
+"""
+
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional, Union
+
+from src import settings
+from src.log import configure_logging
+from src.profiling import run_profile
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+    from src.vnstat import VnStatData
+
+logger = configure_logging(__name__)
+
+
+class Metric(NamedTuple):
+    """Type and help text of a metric."""
+
+    type: str
+    help: str
+
+
+METRICS = {
+    "vnstat_day_traffic_bytes": Metric(
+        "gauge",
+        "Traffic (rx + tx) of the day of the snapshot.",
+    ),
+    "vnstat_month_traffic_bytes": Metric(
+        "gauge",
+        "Traffic (rx + tx) of the month of the snapshot so far.",
+    ),
+    "vnstat_snapshot_date_seconds": Metric(
+        "gauge",
+        "Date of the snapshot as a Unix timestamp.",
+    ),
+    "vnstat_snapshot_error": Metric(
+        "gauge",
+        "Whether the snapshot of the system failed (1) or not (0).",
+    ),
+    "vnstat_collector_duration_seconds": Metric(
+        "summary",
+        "Time spent in the stages of the collection.",
+    ),
+    "vnstat_collector_last_duration_seconds": Metric(
+        "gauge",
+        "Time spent in the latest run of the stage.",
+    ),
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _get_labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Registry:
+    """Thread-safe store of the gauges and the stage timings."""
+
+    def __init__(self) -> None:
+        self._gauges: dict[tuple[str, Labels], float] = {}
+        # (stage labels) -> [count, sum]
+        self._durations: dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Sets the value of the gauge."""
+        with self._lock:
+            self._gauges[(name, _get_labels(labels))] = value
+
+    def observe(self, stage: str, seconds: float, **labels) -> None:
+        """Records the duration of the stage (in the run profile as well)."""
+        run_profile.add(stage, seconds, **labels)
+        labels = _get_labels({"stage": stage, **labels})
+        with self._lock:
+            duration = self._durations.setdefault(labels, [0, 0.0])
+            duration[0] += 1
+            duration[1] += seconds
+            last_duration = ("vnstat_collector_last_duration_seconds", labels)
+            self._gauges[last_duration] = seconds
+
+    @contextmanager
+    def timer(self, stage: str, **labels) -> Iterator[None]:
+        """Measures the duration of the block (even if it fails)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def set_traffic(self, *vnstat_objects: "VnStatData") -> None:
+        """Sets the traffic gauges from the snapshots."""
+        for vn_obj in vnstat_objects:
+            if vn_obj is None:
+                continue
+            system = vn_obj.system_name
+            self.set_gauge(
+                "vnstat_snapshot_error", int(bool(vn_obj.error)), system=system
+            )
+            if vn_obj.stat_date is not None:
+                self.set_gauge(
+                    "vnstat_snapshot_date_seconds",
+                    time.mktime(vn_obj.stat_date.timetuple()),
+                    system=system,
+                )
+            interfaces = vn_obj.interfaces or {}
+            for interface, traffic in interfaces.items():
+                for key in ("day_traffic", "month_traffic"):
+                    if traffic[key] is not None:
+                        self.set_gauge(
+                            f"vnstat_{key}_bytes",
+                            traffic[key],
+                            system=system,
+                            interface=interface,
+                        )
+            if not interfaces:
+                # Snapshots of the older versions only have the totals.
+                for key in ("day_traffic", "month_traffic"):
+                    if getattr(vn_obj, key) is not None:
+                        self.set_gauge(
+                            f"vnstat_{key}_bytes",
+                            getattr(vn_obj, key),
+                            system=system,
+                            interface="",
+                        )
+
+    def render(self) -> str:
+        """Renders the metrics in the Prometheus text format."""
+        with self._lock:
+            gauges = dict(self._gauges)
+            durations = {
+                labels: tuple(value)
+                for labels, value in self._durations.items()
+            }
+
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            if metric_type == "summary":
+                samples = [
+                    line
+                    for labels, (count, total) in sorted(durations.items())
+                    for line in (
+                        f"{name}_count{_format_labels(labels)} {count}",
+                        f"{name}_sum{_format_labels(labels)} {total:.6f}",
+                    )
+                ]
+            else:
+                samples = [
+                    f"{name}{_format_labels(labels)} {value:g}"
+                    for (gauge, labels), value in sorted(gauges.items())
+                    if gauge == name
+                ]
+            if samples:
+                lines += [
+                    f"# HELP {name} {help_text}",
+                    f"# TYPE {name} {metric_type}",
+                    *samples,
+                ]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_textfile(
+        self, path: Union[str, Path, None] = None
+    ) -> Optional[Path]:
+        """
+        Writes the metrics for the node_exporter textfile collector.
+
+        The file is replaced atomically, so the collector never reads a
+        partial file. Does nothing if no path is configured.
+        """
+        if not (path := path or settings.METRICS_TEXTFILE):
+            return None
+        path = Path(path)
+        tmp_file = path.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as file:
+            file.write(self.render())
+        os.replace(tmp_file, path)
+        return path
+
+    def clear(self) -> None:
+        """Removes all the metrics."""
+        with self._lock:
+            self._gauges.clear()
+            self._durations.clear()
+
+
+registry = Registry()
+timer = registry.timer
+
+
+def make_server(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    metrics_registry: Registry = registry,
+) -> "ThreadingHTTPServer":
+    """Creates the HTTP server exposing the metrics on `/metrics`."""
+    # Imported here: the one-shot runs only write the textfile.
+    from http import HTTPStatus
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Serves the metrics of the registry on `/metrics`."""
+
+        def do_GET(self):
+            """Renders the metrics (404 for any other path)."""
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            body = metrics_registry.render().encode("utf-8")
+            self.send_response(HTTPStatus.OK)
+            self.send_header(
+                "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            """Logs the requests at the debug level only."""
+            logger.debug("Metrics request: %s", args)
+
+    server = ThreadingHTTPServer(
+        (
+            host or settings.METRICS_LISTEN_HOST,
+            settings.METRICS_LISTEN_PORT if port is None else port,
+        ),
+        MetricsHandler,
+    )
+    server.daemon_threads = True
+    return server
+
+
+def start_server(**kwargs) -> "ThreadingHTTPServer":
+    """Starts the metrics server in a background thread."""
+    server = make_server(**kwargs)
+    threading.Thread(
+        target=server.serve_forever, name="metrics", daemon=True
+    ).start()
+    logger.info("Metrics are served on %s:%s", *server.server_address)
+    return server
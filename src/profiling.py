@@ -0,0 +1,125 @@
+"""
+Opt-in profiling of a run.
+
+Every stage measured with `metrics.timer` is also recorded in the run
+profile, which is summarized (as one JSON log record) at the end of the run.
+cProfile and tracemalloc captures can be enabled for the run as well.
+"""
+
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Union
+
+from src.log import configure_logging
+
+logger = configure_logging(__name__)
+
+TRACEMALLOC_TOP = 10
+
+
+class RunProfile:
+    """Durations of the stages of the current run."""
+
+    def __init__(self) -> None:
+        # stage -> [count, total, max]
+        self._stages: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, **labels) -> None:
+        """Records the duration of the stage."""
+        if labels:
+            stage += "[" + ",".join(f"{k}={v}" for k, v in labels.items())
+            stage += "]"
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def reset(self) -> None:
+        """Forgets the recorded stages."""
+        with self._lock:
+            self._stages = {}
+
+    def get_summary(self, total: Optional[float] = None) -> dict:
+        """Gets the stages sorted by their total time, slowest first."""
+        with self._lock:
+            stages = dict(self._stages)
+        summary = {
+            "stages": {
+                stage: {
+                    "count": count,
+                    "total": round(stage_total, 6),
+                    "max": round(stage_max, 6),
+                }
+                for stage, (count, stage_total, stage_max) in sorted(
+                    stages.items(), key=lambda item: -item[1][1]
+                )
+            }
+        }
+        if total is not None:
+            summary["total"] = round(total, 6)
+        return summary
+
+
+run_profile = RunProfile()
+
+
+def _get_memory_summary() -> dict:
+    import tracemalloc
+
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "current": current,
+        "peak": peak,
+        "top": [
+            {"location": str(stat.traceback), "size": stat.size}
+            for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]
+        ],
+    }
+
+
+@contextmanager
+def profile_run(
+    name: str,
+    *,
+    cprofile_path: Union[str, Path, None] = None,
+    trace_memory: bool = False,
+) -> Iterator[dict]:
+    """
+    Profiles the run and logs the summary of its stages at the end.
+
+    The yielded dict is filled with the summary when the run finishes. With
+    `cprofile_path` the cProfile stats are dumped to that file (readable with
+    `python -m pstats`), with `trace_memory` the peak memory and the top
+    allocation sites are added to the summary.
+    """
+    # Imported here: they are only needed when the capture is requested.
+    import cProfile
+    import tracemalloc
+
+    run_profile.reset()
+    summary: dict = {"run": name}
+    profiler = cProfile.Profile() if cprofile_path else None
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield summary
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+            summary["cprofile"] = str(cprofile_path)
+        summary.update(run_profile.get_summary(time.perf_counter() - start))
+        if trace_memory:
+            summary["memory"] = _get_memory_summary()
+            tracemalloc.stop()
+        logger.info("Run profile: %s", json.dumps(summary))
@@ -0,0 +1,236 @@
+import hashlib
+import hmac
+import threading
+import time
+from datetime import date, timedelta
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Union
+
+from src import exceptions as exc
+from src import history, settings
+from src.log import configure_logging, log
+from src.vnstat import VnStatData
+
+logger = configure_logging(__name__)
+
+SNAPSHOTS_PATH = "/snapshots"
+SIGNATURE_HEADER = "X-Vnstat-Signature"
+TIMESTAMP_HEADER = "X-Vnstat-Timestamp"
+BINARY_CONTENT_TYPE = "application/octet-stream"
+JSON_CONTENT_TYPE = "application/json"
+
+
+def sign(body: bytes, timestamp: str, secret: str) -> str:
+    """Gets the HMAC-SHA256 signature of the timestamped body."""
+    return hmac.new(
+        secret.encode("utf-8"),
+        timestamp.encode("ascii") + b"." + body,
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def verify(
+    body: bytes,
+    timestamp: Optional[str],
+    signature: Optional[str],
+    secret: str,
+    max_skew: Optional[float] = None,
+) -> bool:
+    """Checks the signature and that the timestamp is recent enough."""
+    if not secret or not timestamp or not signature:
+        return False
+    if max_skew is None:
+        max_skew = settings.PUSH_MAX_SKEW
+    try:
+        if abs(time.time() - float(timestamp)) > max_skew:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(sign(body, timestamp, secret), signature)
+
+
+@log
+def push_snapshot(
+    vn_obj: VnStatData,
+    url: Optional[str] = None,
+    secret: Optional[str] = None,
+    retries: int = 3,
+) -> None:
+    """Pushes the snapshot to the aggregator."""
+    from src.delivery import get_session
+
+    url = url or settings.PUSH_URL
+    secret = secret or settings.PUSH_SECRET
+    if not url or not secret:
+        raise exc.PushError("PUSH_URL and PUSH_SECRET must be set to push")
+
+    body = vn_obj.to_bytes()
+    error = None
+    for attempt in range(retries):
+        if attempt:
+            time.sleep(2**attempt)
+        timestamp = str(time.time())
+        try:
+            response = get_session().post(
+                url,
+                data=body,
+                headers={
+                    "Content-Type": BINARY_CONTENT_TYPE,
+                    TIMESTAMP_HEADER: timestamp,
+                    SIGNATURE_HEADER: sign(body, timestamp, secret),
+                },
+                timeout=settings.PUSH_TIMEOUT,
+            )
+        except Exception as e:
+            error = e
+            continue
+        if response.status_code < HTTPStatus.BAD_REQUEST:
+            return
+        error = f"status code {response.status_code}: {response.text}"
+        if response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR:
+            break
+    raise exc.PushError(f"Failed to push the snapshot to {url}: {error}")
+
+
+class SnapshotHandler(BaseHTTPRequestHandler):
+    """Accepts the signed snapshots and records them in the history."""
+
+    server_version = "VnstatReceiver"
+
+    @property
+    def timeout(self) -> float:
+        """Socket timeout, so that a stalled client does not hold a thread."""
+        return settings.PUSH_TIMEOUT
+
+    def _reply(self, status: HTTPStatus, message: str = "") -> None:
+        body = message.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> Optional[bytes]:
+        """Reads the request body, replying with an error if it is invalid."""
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._reply(HTTPStatus.LENGTH_REQUIRED)
+            return None
+        if length < 0:
+            self._reply(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+            return None
+        if length > settings.PUSH_MAX_BODY:
+            self._reply(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            return None
+        return self.rfile.read(length)
+
+    def do_POST(self):
+        """Handles the snapshot upload."""
+        if self.path != SNAPSHOTS_PATH:
+            self._reply(HTTPStatus.NOT_FOUND)
+            return
+        if (body := self._read_body()) is None:
+            return
+
+        if not verify(
+            body,
+            self.headers.get(TIMESTAMP_HEADER),
+            self.headers.get(SIGNATURE_HEADER),
+            self.server.secret,
+        ):
+            self._reply(HTTPStatus.UNAUTHORIZED, "Invalid signature")
+            return
+
+        try:
+            if self.headers.get("Content-Type") == JSON_CONTENT_TYPE:
+                vn_obj = VnStatData.from_json(body)
+            else:
+                vn_obj = VnStatData.from_bytes(body)
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(HTTPStatus.BAD_REQUEST, f"Invalid snapshot: {e}")
+            return
+
+        try:
+            history.record(vn_obj, db_path=self.server.history_db_path)
+        except exc.HistoryError as e:
+            logger.error("Failed to store the snapshot: %s", e)
+            self._reply(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+        logger.info(
+            "Snapshot of %s for %s received from %s",
+            vn_obj.system_name,
+            vn_obj.stat_date,
+            self.client_address[0],
+        )
+        self._reply(HTTPStatus.NO_CONTENT)
+
+    def log_message(self, *args):
+        logger.debug(*args)
+
+
+def make_server(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    secret: Optional[str] = None,
+    history_db_path: Union[str, Path, None] = None,
+) -> ThreadingHTTPServer:
+    """Creates the snapshot receiver (not started yet)."""
+    if not (secret := secret or settings.PUSH_SECRET):
+        raise exc.PushError("PUSH_SECRET must be set to receive snapshots")
+    server = ThreadingHTTPServer(
+        (
+            host or settings.PUSH_LISTEN_HOST,
+            settings.PUSH_LISTEN_PORT if port is None else port,
+        ),
+        SnapshotHandler,
+    )
+    server.daemon_threads = True
+    server.secret = secret
+    server.history_db_path = history_db_path or settings.HISTORY_DB_PATH
+    return server
+
+
+def start_receiver(**kwargs) -> ThreadingHTTPServer:
+    """Starts the snapshot receiver in a background thread."""
+    server = make_server(**kwargs)
+    threading.Thread(
+        target=server.serve_forever, name="receiver", daemon=True
+    ).start()
+    logger.info("Snapshot receiver listening on %s:%s", *server.server_address)
+    return server
+
+
+@log
+def get_pushed_vnstat_data(
+    stat_date: Optional[date] = None,
+    history_db_path: Union[str, Path, None] = None,
+) -> list[VnStatData]:
+    """
+    Gets the snapshots pushed by the remotes for the date.
+
+    Every system in PUSH_EXPECTED_SYSTEMS that did not push its snapshot gets
+    a VnStatData with the error. If no systems are expected, all the pushed
+    snapshots (except the local one) are returned.
+    """
+    stat_date = stat_date or date.today() - timedelta(days=1)
+    snapshots = {
+        vn_obj.system_name: vn_obj
+        for vn_obj in history.get_snapshots(
+            stat_date, db_path=history_db_path or settings.HISTORY_DB_PATH
+        )
+    }
+    expected = settings.PUSH_EXPECTED_SYSTEMS or [
+        name for name in snapshots if name != settings.LOCAL_SYSTEM_NAME
+    ]
+    return [
+        snapshots.get(name)
+        or VnStatData(
+            system_name=name,
+            stat_date=stat_date,
+            error="No snapshot was pushed for this date",
+        )
+        for name in expected
+    ]
@@ -0,0 +1,202 @@
+import calendar
+import re
+import threading
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional, Union
+
+from src import exceptions as exc
+from src import settings, utils
+from src.log import configure_logging, log
+
+if TYPE_CHECKING:
+    from src.vnstat import VnStatData
+
+logger = configure_logging(__name__)
+
+GB = 1024**3
+ANY_SYSTEM = "*"
+
+RULE_PATTERN = re.compile(
+    r"^(?P<system_name>[^/:=]+)(?:/(?P<interface>[^:=]+))?"
+    r":(?P<period>day|month|projected)"
+    r"=(?P<limit>\d+(?:\.\d+)?)(?:(?P<percent>%)@(?P<plan>\d+(?:\.\d+)?))?$"
+)
+
+PERIOD_NAMES = {
+    "day": "daily traffic",
+    "month": "monthly traffic",
+    "projected": "projected monthly traffic",
+}
+
+
+class Rule(NamedTuple):
+    """Quota rule: the traffic of the period must stay under the limit."""
+
+    spec: str
+    system_name: str
+    interface: Optional[str]
+    period: str
+    limit: int
+
+    def matches(self, vn_obj: "VnStatData") -> bool:
+        """Checks if the rule applies to the system."""
+        return self.system_name in (ANY_SYSTEM, vn_obj.system_name)
+
+
+@log
+def parse_rule(spec: str) -> Rule:
+    """
+    Parses the quota rule.
+
+    The rule is specified as `system[/interface]:period=limit`. The system may
+    be `*` (any system), the period is `day`, `month` or `projected`, and the
+    limit is either in GB (`500`) or in percent of a plan in GB (`80%@1000`).
+    """
+    if (match := RULE_PATTERN.match(spec.strip())) is None:
+        raise exc.QuotaRuleError(f"Invalid quota rule: '{spec}'")
+    limit_gb = float(match["limit"])
+    if match["percent"]:
+        limit_gb = float(match["plan"]) * limit_gb / 100
+    return Rule(
+        spec=spec.strip(),
+        system_name=match["system_name"],
+        interface=match["interface"],
+        period=match["period"],
+        limit=int(limit_gb * GB),
+    )
+
+
+@log
+def get_rules(rules_spec: Optional[str] = None) -> list[Rule]:
+    """Parses the comma-separated quota rules from the settings."""
+    if rules_spec is None:
+        rules_spec = settings.QUOTA_RULES
+    return [parse_rule(spec) for spec in rules_spec.split(",") if spec.strip()]
+
+
+def _get_projection(
+    month_traffic: int,
+    day_traffic: Optional[int],
+    stat_date: date,
+    today: Optional[date] = None,
+) -> Optional[int]:
+    """
+    Extrapolates the monthly traffic to the end of the month.
+
+    The pace is taken from the complete days only: the day of a snapshot of
+    today is not over yet, so it counts with its actual traffic instead. None
+    if there is no complete day yet.
+    """
+    complete_days, complete_traffic = stat_date.day, month_traffic
+    if stat_date >= (today or date.today()):
+        if day_traffic is None:
+            return None
+        complete_days -= 1
+        complete_traffic -= day_traffic
+    if not complete_days:
+        return None
+    days_in_month = calendar.monthrange(stat_date.year, stat_date.month)[1]
+    days_to_come = days_in_month - stat_date.day
+    return month_traffic + complete_traffic * days_to_come // complete_days
+
+
+def _get_usage(
+    rule: Rule, vn_obj: "VnStatData", today: Optional[date] = None
+) -> Optional[int]:
+    """Gets the traffic of the system (or its interface) the rule limits."""
+    if rule.interface is None:
+        day_traffic, month_traffic = vn_obj.day_traffic, vn_obj.month_traffic
+    elif (traffic := (vn_obj.interfaces or {}).get(rule.interface)) is None:
+        return None
+    else:
+        day_traffic = traffic["day_traffic"]
+        month_traffic = traffic["month_traffic"]
+
+    if rule.period == "day":
+        return day_traffic
+    if month_traffic is None or rule.period == "month":
+        return month_traffic
+    return _get_projection(month_traffic, day_traffic, vn_obj.stat_date, today)
+
+
+def _get_alert(rule: Rule, vn_obj: "VnStatData", usage: int) -> str:
+    target = vn_obj.system_name.upper()
+    if rule.interface is not None:
+        target += f" ({rule.interface})"
+    return (
+        f"<b>{target}</b>: {PERIOD_NAMES[rule.period]} "
+        f"{utils.bytes_to_gb(usage, bold=True)} crossed the quota of "
+        f"{utils.bytes_to_gb(rule.limit)} ({rule.spec})"
+    )
+
+
+class QuotaTracker:
+    """
+    Evaluates the quota rules against the new snapshots.
+
+    The last evaluated value of every rule and system is kept in the state
+    file, so a snapshot that has not changed since the last check is skipped,
+    and an alert is only raised when a rule crosses its threshold within its
+    period (a day or a month), not on every check while it stays crossed.
+    """
+
+    def __init__(self, state_file: Union[str, Path, None] = None) -> None:
+        self.state_file = Path(state_file or settings.QUOTA_STATE_FILE)
+        self._state: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if self._state is None:
+            self._state = utils.load_json_state(self.state_file)
+        return self._state
+
+    def _save(self) -> None:
+        try:
+            utils.save_json_state(self.state_file, self._state)
+        except OSError as e:
+            logger.error("Failed to save the quota state: %s", e)
+
+    @log
+    def evaluate(
+        self, rules: list[Rule], *vnstat_objects: "VnStatData"
+    ) -> list[str]:
+        """Evaluates the rules and gets the alerts for the new crossings."""
+        alerts = []
+        with self._lock:
+            state = self._load()
+            changed = False
+            for vn_obj in vnstat_objects:
+                if vn_obj is None or vn_obj.stat_date is None:
+                    continue
+                for rule in rules:
+                    if not rule.matches(vn_obj):
+                        continue
+                    if (usage := _get_usage(rule, vn_obj)) is None:
+                        continue
+                    key = f"{vn_obj.system_name}|{rule.spec}"
+                    period = (
+                        vn_obj.stat_date.isoformat()
+                        if rule.period == "day"
+                        else vn_obj.stat_date.strftime("%Y-%m")
+                    )
+                    previous = state.get(key)
+                    if previous is not None and previous["period"] != period:
+                        previous = None
+                    if previous is not None and previous["value"] == usage:
+                        continue
+                    crossed = usage >= rule.limit
+                    if crossed and not (previous and previous["crossed"]):
+                        alerts.append(_get_alert(rule, vn_obj, usage))
+                    state[key] = {
+                        "period": period,
+                        "value": usage,
+                        "crossed": crossed,
+                    }
+                    changed = True
+            if changed:
+                self._save()
+        return alerts
+
+
+tracker = QuotaTracker()
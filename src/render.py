@@ -0,0 +1,486 @@
+"""
+Rendering of the traffic reports.
+
+The report is built once from the aggregated data as a list of segments
+(a text and its style), which every output format (HTML, Markdown, plain
+text) renders in a single join. The JSON format gets the aggregated data
+itself. The rendered reports are cached, so a report whose data has not
+changed is not rendered again.
+"""
+
+import functools
+import html
+import json
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import date
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from src import aggregate
+from src import exceptions as exc
+from src import forecast, settings
+from src.log import configure_logging, log
+
+if TYPE_CHECKING:
+    from src.vnstat import VnStatData
+
+logger = configure_logging(__name__)
+
+# Segment styles.
+PLAIN = 0
+BOLD = 1
+# Text with the HTML markup of its own (the status of the service).
+MARKUP = 2
+
+Segment = tuple[str, int]
+
+GB = 1024**3
+NO_DATA = "No data"
+SEPARATOR = "\n\n====================\n\n"
+TAG = re.compile(r"<(/?)(\w+)[^>]*>")
+MARKDOWN_SPECIAL = re.compile(r"([_*\[\]()~`>#+\-=|{}.!\\])")
+
+
+@functools.lru_cache(maxsize=1024)
+def format_date(value: date, pattern: str) -> str:
+    """Formats the date (every date and pattern is formatted once)."""
+    return value.strftime(pattern)
+
+
+def format_gb(bytes_value: Optional[int]) -> Optional[str]:
+    """Gets the value in gigabytes (`1.5`), None if there is no data."""
+    if not bytes_value:
+        return None
+    return f"{bytes_value / GB:.1f}".rstrip("0").rstrip(".")
+
+
+def _escape_markdown(text: str) -> str:
+    return MARKDOWN_SPECIAL.sub(r"\\\1", text)
+
+
+def _convert_markup(text: str, bold: str, escape: Callable[[str], str]):
+    """Converts the HTML bold tags, dropping the other tags."""
+    parts = TAG.split(text)
+    # The split gives: text, slash, tag name, text, slash, tag name, ...
+    converted = [escape(html.unescape(parts[0]))]
+    for index in range(1, len(parts), 3):
+        if parts[index + 1].lower() in {"b", "strong"}:
+            converted.append(bold)
+        converted.append(escape(html.unescape(parts[index + 2])))
+    return "".join(converted)
+
+
+class Format(NamedTuple):
+    """Output format: the renderers of the segment styles."""
+
+    name: str
+    parse_mode: Optional[str]
+    plain: Callable[[str], str]
+    bold: Callable[[str], str]
+    markup: Callable[[str], str]
+
+    def render(self, segments: list[Segment]) -> str:
+        """Renders the segments in one pass."""
+        renderers = (self.plain, self.bold, self.markup)
+        return "".join([renderers[style](text) for text, style in segments])
+
+
+def _identity(text: str) -> str:
+    return text
+
+
+def _escape_html(text: str) -> str:
+    return html.escape(text, quote=False)
+
+
+def _strip_markup(text: str) -> str:
+    return _convert_markup(text, "", _identity)
+
+
+PLAIN_TEXT = Format(
+    name="text",
+    parse_mode=None,
+    plain=_identity,
+    bold=_identity,
+    markup=_strip_markup,
+)
+
+FORMATS = {
+    "html": Format(
+        name="html",
+        parse_mode="HTML",
+        plain=_escape_html,
+        bold=lambda text: f"<b>{_escape_html(text)}</b>",
+        markup=_identity,
+    ),
+    # Telegram MarkdownV2: every special character is escaped.
+    "markdown": Format(
+        name="markdown",
+        parse_mode="MarkdownV2",
+        plain=_escape_markdown,
+        bold=lambda text: f"*{_escape_markdown(text)}*",
+        markup=lambda text: _convert_markup(text, "*", _escape_markdown),
+    ),
+    "text": PLAIN_TEXT,
+    # The segments of a JSON report (the titles, the alerts) are plain text.
+    "json": PLAIN_TEXT._replace(name="json"),
+}
+
+
+def get_format(name: Optional[str] = None) -> Format:
+    """Gets the output format (the configured one by default)."""
+    name = (name or settings.REPORT_FORMAT).lower()
+    try:
+        return FORMATS[name]
+    except KeyError as e:
+        raise exc.ReportFormatError(
+            f"Unknown report format: '{name}' "
+            f"(expected one of: {', '.join(FORMATS)})"
+        ) from e
+
+
+class Summary(NamedTuple):
+    """Aggregated data of the report."""
+
+    vnstat_objects: tuple["VnStatData", ...]
+    forecasts: dict[str, Optional[forecast.Forecast]]
+    # Tag keys of the levels of the groups, from the top level down.
+    levels: tuple[str, ...]
+    rollups: dict[tuple[str, ...], aggregate.Rollup]
+    day_traffic: int
+    month_traffic: int
+    # None if there is no forecast for any of the systems.
+    forecast_traffic: Optional[int]
+
+
+@log
+def summarize(*vnstat_objects: "VnStatData") -> Summary:
+    """
+    Aggregates the data of the systems for the report.
+
+    The totals are rolled up the AGGREGATION_LEVELS of the SYSTEM_TAGS (see
+    `aggregate.aggregate`).
+    """
+    forecasts = (
+        forecast.get_forecasts(*vnstat_objects)
+        if settings.FORECAST_ENABLED
+        else {}
+    )
+    levels = tuple(settings.AGGREGATION_LEVELS)
+    rollups = aggregate.aggregate(
+        *vnstat_objects, forecasts=forecasts, levels=levels
+    )
+    total = rollups[aggregate.TOTAL]
+    return Summary(
+        vnstat_objects=vnstat_objects,
+        forecasts=forecasts,
+        levels=levels,
+        rollups=rollups,
+        day_traffic=total.day_traffic,
+        month_traffic=total.month_traffic,
+        forecast_traffic=(
+            total.forecast_traffic if any(forecasts.values()) else None
+        ),
+    )
+
+
+def _get_system_dict(
+    vn_obj: "VnStatData", service_forecast: Optional[forecast.Forecast]
+) -> dict:
+    system = vn_obj.to_dict()
+    del system["version"], system["daily_traffic"]
+    system["forecast"] = (
+        {
+            "month_traffic": service_forecast.month_traffic,
+            "daily_average": service_forecast.daily_average,
+            "anomalous_days": [
+                day.isoformat() for day in service_forecast.anomalous_days
+            ],
+        }
+        if service_forecast is not None
+        else None
+    )
+    return system
+
+
+def get_summary_dict(
+    summary: Summary, day_label: Optional[str] = "Yesterday"
+) -> dict:
+    """Gets the JSON-compatible dict of the summary (traffic in bytes)."""
+    return {
+        "day_label": day_label,
+        "systems": [
+            _get_system_dict(vn_obj, summary.forecasts.get(vn_obj.system_name))
+            for vn_obj in summary.vnstat_objects
+        ],
+        "levels": list(summary.levels),
+        "groups": [
+            rollup.to_dict()
+            for group, rollup in summary.rollups.items()
+            if group != aggregate.TOTAL
+        ],
+        "total": {
+            "day_traffic": summary.day_traffic,
+            "month_traffic": summary.month_traffic,
+            "forecast_traffic": summary.forecast_traffic,
+        },
+    }
+
+
+def _add_traffic(
+    segments: list[Segment], bytes_value: Optional[int], bold: bool = False
+) -> None:
+    if (value := format_gb(bytes_value)) is None:
+        segments.append((NO_DATA, PLAIN))
+    else:
+        segments += [(value, BOLD if bold else PLAIN), (" GB", PLAIN)]
+
+
+def _add_interfaces_breakdown(
+    segments: list[Segment], vn_obj: "VnStatData", key: str
+) -> None:
+    """Adds the per-interface lines if there is more than one interface."""
+    if not vn_obj.interfaces or len(vn_obj.interfaces) < 2:
+        return
+    for name, traffic in vn_obj.interfaces.items():
+        segments.append((f"\n  {name}: ", PLAIN))
+        _add_traffic(segments, traffic[key])
+
+
+def _add_forecast(
+    segments: list[Segment],
+    vn_obj: "VnStatData",
+    service_forecast: forecast.Forecast,
+) -> None:
+    month = format_date(vn_obj.stat_date, "%B %Y")
+    segments.append((f"\n\nForecast for {month}:\n", PLAIN))
+    _add_traffic(segments, service_forecast.month_traffic, bold=True)
+    segments.append((" (~", PLAIN))
+    _add_traffic(segments, service_forecast.daily_average)
+    segments.append((" a day)", PLAIN))
+    if service_forecast.anomalous_days:
+        anomalous_days = ", ".join(
+            format_date(day, "%d %B")
+            for day in service_forecast.anomalous_days
+        )
+        segments.append((f"\nUnusual traffic on: {anomalous_days}", PLAIN))
+
+
+def get_system_segments(
+    vn_obj: "VnStatData",
+    service_forecast: Optional[forecast.Forecast] = None,
+    day_label: Optional[str] = "Yesterday",
+) -> list[Segment]:
+    """Gets the segments of the section of a system."""
+    segments = [(vn_obj.system_name.upper(), BOLD), (":\n\n", PLAIN)]
+    if vn_obj.service_status:
+        segments += [(vn_obj.service_status, MARKUP), ("\n\n", PLAIN)]
+    day = format_date(vn_obj.stat_date, "%A, %d %B %Y")
+    segments.append(
+        (f"{day_label}, {day}:\n" if day_label else f"{day}:\n", PLAIN)
+    )
+    _add_traffic(segments, vn_obj.day_traffic, bold=True)
+    _add_interfaces_breakdown(segments, vn_obj, "day_traffic")
+    month = format_date(vn_obj.stat_date, "%B %Y")
+    segments.append((f"\n\nCumulative for {month}:\n", PLAIN))
+    _add_traffic(segments, vn_obj.month_traffic, bold=True)
+    _add_interfaces_breakdown(segments, vn_obj, "month_traffic")
+    if service_forecast is not None:
+        _add_forecast(segments, vn_obj, service_forecast)
+    if vn_obj.error:
+        segments += [
+            ("\n\n", PLAIN),
+            ("Error", BOLD),
+            (f": {vn_obj.error}", PLAIN),
+        ]
+    segments.append((SEPARATOR, PLAIN))
+    return segments
+
+
+def _add_groups(
+    segments: list[Segment], summary: Summary, day_label: Optional[str]
+) -> None:
+    """Adds the totals of the groups, every subgroup under its group."""
+    levels = " / ".join(summary.levels).upper()
+    segments += [(f"TOTAL BY {levels}", BOLD), (":\n", PLAIN)]
+    day_label = (day_label or "Day").lower()
+    for group, rollup in summary.rollups.items():
+        if group == aggregate.TOTAL:
+            continue
+        indent = "  " * (len(group) - 1)
+        segments.append(
+            (f"{indent}{group[-1]} ({rollup.systems}): {day_label} ", PLAIN)
+        )
+        _add_traffic(segments, rollup.day_traffic, bold=True)
+        segments.append((", cumulative ", PLAIN))
+        _add_traffic(segments, rollup.month_traffic)
+        if summary.forecast_traffic is not None:
+            segments.append((", forecast ", PLAIN))
+            _add_traffic(segments, rollup.forecast_traffic)
+        if rollup.failed:
+            failed = ", ".join(rollup.failed)
+            segments.append((f", failed: {failed}", PLAIN))
+        segments.append(("\n", PLAIN))
+    segments.append(("\n", PLAIN))
+
+
+def get_total_segments(
+    summary: Summary, day_label: Optional[str] = "Yesterday"
+) -> list[Segment]:
+    """Gets the segments of the totals of the groups and all the systems."""
+    segments = []
+    if summary.levels:
+        _add_groups(segments, summary, day_label)
+    segments += [
+        ("TOTAL FOR ALL SERVICES", BOLD),
+        (f":\n{day_label or 'Day'}: ", PLAIN),
+    ]
+    _add_traffic(segments, summary.day_traffic, bold=True)
+    segments.append(("\nCumulative: ", PLAIN))
+    _add_traffic(segments, summary.month_traffic, bold=True)
+    segments.append(("\n", PLAIN))
+    if summary.forecast_traffic is not None:
+        segments.append(("Forecast: ", PLAIN))
+        _add_traffic(segments, summary.forecast_traffic, bold=True)
+        segments.append(("\n", PLAIN))
+    segments.append(("\n", PLAIN))
+    return segments
+
+
+def _get_data_key(vn_obj: "VnStatData") -> tuple:
+    """Gets the hashable key of everything the report shows of the object."""
+    return (
+        vn_obj.system_name,
+        vn_obj.service_status,
+        vn_obj.stat_date,
+        vn_obj.day_traffic,
+        vn_obj.month_traffic,
+        vn_obj.error,
+        tuple(
+            (name, traffic["day_traffic"], traffic["month_traffic"])
+            for name, traffic in (vn_obj.interfaces or {}).items()
+        ),
+        vn_obj.daily_traffic,
+    )
+
+
+class Renderer:
+    """
+    Renders the reports, keeping the latest ones in an LRU cache.
+
+    The whole report and every section of a system are cached separately, so
+    when a single system of many has changed, only its section is rendered.
+    """
+
+    def __init__(self, cache_size: Optional[int] = None) -> None:
+        self.cache_size = (
+            settings.RENDER_CACHE_SIZE if cache_size is None else cache_size
+        )
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_cached(self, key: tuple, render_func: Callable[[], str]) -> str:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        rendered = render_func()
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = rendered
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return rendered
+
+    def render_system(
+        self,
+        vn_obj: "VnStatData",
+        service_forecast: Optional[forecast.Forecast] = None,
+        day_label: Optional[str] = "Yesterday",
+        fmt: Optional[str] = None,
+    ) -> str:
+        """Renders the section of a system."""
+        output_format = get_format(fmt)
+        if output_format.name == "json":
+            return json.dumps(_get_system_dict(vn_obj, service_forecast))
+        return self._get_cached(
+            (
+                "system",
+                output_format.name,
+                day_label,
+                _get_data_key(vn_obj),
+                service_forecast,
+            ),
+            lambda: output_format.render(
+                get_system_segments(vn_obj, service_forecast, day_label)
+            ),
+        )
+
+    def _render_summary(
+        self, summary: Summary, day_label: Optional[str], output_format
+    ) -> str:
+        if output_format.name == "json":
+            return json.dumps(get_summary_dict(summary, day_label))
+        parts = [
+            self.render_system(
+                vn_obj,
+                summary.forecasts.get(vn_obj.system_name),
+                day_label,
+                output_format.name,
+            )
+            for vn_obj in summary.vnstat_objects
+        ]
+        parts.append(
+            output_format.render(get_total_segments(summary, day_label))
+        )
+        return "".join(parts)
+
+    @log
+    def render(
+        self,
+        *vnstat_objects: "VnStatData",
+        day_label: Optional[str] = "Yesterday",
+        fmt: Optional[str] = None,
+    ) -> str:
+        """Renders the report for all the systems."""
+        output_format = get_format(fmt)
+        key = (
+            "report",
+            output_format.name,
+            day_label,
+            settings.FORECAST_ENABLED,
+            settings.FORECAST_WINDOW,
+            settings.FORECAST_ANOMALY_THRESHOLD,
+            settings.SYSTEM_TAGS,
+            tuple(settings.AGGREGATION_LEVELS),
+            tuple(_get_data_key(vn_obj) for vn_obj in vnstat_objects),
+        )
+        return self._get_cached(
+            key,
+            lambda: self._render_summary(
+                summarize(*vnstat_objects), day_label, output_format
+            ),
+        )
+
+    def clear(self) -> None:
+        """Empties the cache."""
+        with self._lock:
+            self._cache.clear()
+
+
+renderer = Renderer()
+render = renderer.render
+
+
+@log
+def render_markup(text: str, fmt: Optional[str] = None) -> str:
+    """Renders the text with the HTML bold markup in the format."""
+    return get_format(fmt).render([(text, MARKUP)])
+
+
+@log
+def render_title(title: str, fmt: Optional[str] = None) -> str:
+    """Renders the bold title line of a report."""
+    return get_format(fmt).render([(title, BOLD), ("\n\n", PLAIN)])
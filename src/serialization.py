@@ -0,0 +1,168 @@
+"""
+Versioned serialization of the VnStat data.
+
+The binary form is a header (magic + version) followed by tag-length-value
+fields. Missing fields are None, unknown tags are skipped, so fields can be
+added without breaking the older readers.
+"""
+
+import struct
+from collections.abc import Iterator
+from datetime import date
+
+VERSION = 1
+
+MAGIC = b"VNS"
+HEADER = struct.Struct(">3sB")
+FIELD = struct.Struct(">BI")
+ORDINAL = struct.Struct(">I")
+COUNTER = struct.Struct(">Q")
+INTERFACE = struct.Struct(">qq")
+DAY = struct.Struct(">q")
+
+TAG_SYSTEM_NAME = 1
+TAG_SERVICE_STATUS = 2
+TAG_STAT_DATE = 3
+TAG_DAY_TRAFFIC = 4
+TAG_MONTH_TRAFFIC = 5
+TAG_ERROR = 6
+TAG_INTERFACE = 7
+TAG_INTERFACES = 8
+TAG_DAILY_TRAFFIC = 9
+
+STRING_TAGS = {
+    TAG_SYSTEM_NAME: "system_name",
+    TAG_SERVICE_STATUS: "service_status",
+    TAG_ERROR: "error",
+}
+COUNTER_TAGS = {
+    TAG_DAY_TRAFFIC: "day_traffic",
+    TAG_MONTH_TRAFFIC: "month_traffic",
+}
+
+
+def check_version(version: int) -> None:
+    """Raises ValueError if the version is newer than the supported one."""
+    if version > VERSION:
+        raise ValueError(
+            f"Unsupported serialization version {version}, "
+            f"the latest supported is {VERSION}"
+        )
+
+
+def _field(tag: int, value: bytes) -> bytes:
+    return FIELD.pack(tag, len(value)) + value
+
+
+def _optional_counter(value: int) -> int:
+    return -1 if value is None else value
+
+
+def dump_fields(data: dict) -> bytes:
+    """Packs the `VnStatData.to_dict` output into the binary form."""
+    parts = [HEADER.pack(MAGIC, VERSION)]
+    for tag, key in STRING_TAGS.items():
+        if data[key] is not None:
+            parts.append(_field(tag, data[key].encode("utf-8")))
+    parts.append(
+        _field(
+            TAG_STAT_DATE,
+            ORDINAL.pack(date.fromisoformat(data["stat_date"]).toordinal()),
+        )
+    )
+    for tag, key in COUNTER_TAGS.items():
+        if data[key] is not None:
+            parts.append(_field(tag, COUNTER.pack(data[key])))
+    if data["interfaces"] is not None:
+        parts.append(_field(TAG_INTERFACES, b""))
+        for name, traffic in data["interfaces"].items():
+            value = INTERFACE.pack(
+                _optional_counter(traffic["day_traffic"]),
+                _optional_counter(traffic["month_traffic"]),
+            )
+            parts.append(_field(TAG_INTERFACE, value + name.encode("utf-8")))
+    if data.get("daily_traffic") is not None:
+        value = b"".join(
+            DAY.pack(_optional_counter(traffic))
+            for traffic in data["daily_traffic"]
+        )
+        parts.append(_field(TAG_DAILY_TRAFFIC, value))
+    return b"".join(parts)
+
+
+def _load_string(result: dict, tag: int, value: bytes) -> None:
+    result[STRING_TAGS[tag]] = value.decode("utf-8")
+
+
+def _load_counter(result: dict, tag: int, value: bytes) -> None:
+    result[COUNTER_TAGS[tag]] = COUNTER.unpack(value)[0]
+
+
+def _load_stat_date(result: dict, _tag: int, value: bytes) -> None:
+    result["stat_date"] = date.fromordinal(
+        ORDINAL.unpack(value)[0]
+    ).isoformat()
+
+
+def _load_interfaces(result: dict, _tag: int, _value: bytes) -> None:
+    result["interfaces"] = {}
+
+
+def _load_interface(result: dict, _tag: int, value: bytes) -> None:
+    day, month = INTERFACE.unpack_from(value)
+    name = value[INTERFACE.size :].decode("utf-8")
+    interfaces = result.get("interfaces") or {}
+    interfaces[name] = {
+        "day_traffic": None if day < 0 else day,
+        "month_traffic": None if month < 0 else month,
+    }
+    result["interfaces"] = interfaces
+
+
+def _load_daily_traffic(result: dict, _tag: int, value: bytes) -> None:
+    result["daily_traffic"] = [
+        None if traffic < 0 else traffic
+        for (traffic,) in DAY.iter_unpack(value)
+    ]
+
+
+FIELD_LOADERS = {
+    **dict.fromkeys(STRING_TAGS, _load_string),
+    **dict.fromkeys(COUNTER_TAGS, _load_counter),
+    TAG_STAT_DATE: _load_stat_date,
+    TAG_INTERFACES: _load_interfaces,
+    TAG_INTERFACE: _load_interface,
+    TAG_DAILY_TRAFFIC: _load_daily_traffic,
+}
+
+
+def _iter_fields(data: bytes, offset: int) -> Iterator[tuple[int, bytes]]:
+    while offset < len(data):
+        tag, length = FIELD.unpack_from(data, offset)
+        offset += FIELD.size
+        value = data[offset : offset + length]
+        if len(value) != length:
+            raise ValueError("Invalid VnStat data: truncated field")
+        offset += length
+        yield tag, value
+
+
+def load_fields(data: bytes) -> dict:
+    """Unpacks the binary form into a dict for `VnStatData.from_dict`."""
+    try:
+        magic, version = HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError(f"Invalid VnStat data: {e}") from e
+    if magic != MAGIC:
+        raise ValueError("Invalid VnStat data: bad magic")
+    check_version(version)
+
+    result = {"version": version, "interfaces": None}
+    try:
+        for tag, value in _iter_fields(data, HEADER.size):
+            # Unknown tags are skipped.
+            if (load := FIELD_LOADERS.get(tag)) is not None:
+                load(result, tag, value)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid VnStat data: {e}") from e
+    return result
@@ -12,14 +12,62 @@ load_dotenv(override=True)
 
 
 NO_DATA = "No data"
-COMMAND = ("vnstat", "--json", "a", "2")
+COMMAND = ("vnstat", "--json", "a")
+# Minimum number of entries per list requested from vnstat; a date range
+# raises it so that the single call covers all of the range.
+COMMAND_LIMIT = 2
+
+# Where the traffic data is read from: `cli` runs `vnstat --json`, `sqlite`
+# reads the vnstat database directly.
+VNSTAT_BACKEND = os.getenv("VNSTAT_BACKEND", "cli").lower()
+VNSTAT_DB_PATH = os.getenv("VNSTAT_DB_PATH", "/var/lib/vnstat/vnstat.db")
+# With the `cli` backend, parse the output while vnstat writes it, keeping
+# only the requested interfaces and dates (for very large outputs).
+VNSTAT_STREAMING = os.getenv("VNSTAT_STREAMING", "false").lower() == "true"
+
+# Comma-separated systemd units whose status is shown in the report, and for
+# how long (in seconds) their status is cached.
+SERVICE_UNITS = [
+    unit.strip()
+    for unit in os.getenv("SERVICE_UNITS", "vnstat").split(",")
+    if unit.strip()
+]
+SYSTEMCTL_CACHE_TTL = float(os.getenv("SYSTEMCTL_CACHE_TTL", "30"))
 
 INTERFACE_NAME = os.getenv("INTERFACE_NAME", "eth0")
+# Comma-separated list of the interfaces to report on.
+INTERFACE_NAMES = [
+    name.strip()
+    for name in os.getenv("INTERFACE_NAMES", INTERFACE_NAME).split(",")
+    if name.strip()
+]
+# Interfaces of the remotes, used by the backfill (which runs vnstat on the
+# remotes instead of reading their snapshot files).
+REMOTE_INTERFACE_NAMES = [
+    name.strip()
+    for name in os.getenv(
+        "REMOTE_INTERFACE_NAMES", ",".join(INTERFACE_NAMES)
+    ).split(",")
+    if name.strip()
+]
 LOCAL_SYSTEM_NAME = os.getenv("LOCAL_SYSTEM_NAME", "local")
 REMOTE_SYSTEM_NAME = os.getenv("REMOTE_SYSTEM_NAME", "remote")
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+# Comma-separated chat IDs in TELEGRAM_CHAT_ID get the message each.
+TELEGRAM_CHAT_IDS = [
+    chat_id.strip()
+    for chat_id in (TELEGRAM_CHAT_ID or "").split(",")
+    if chat_id.strip()
+]
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_SPOOL_DIR = DATA_DIR / os.getenv("TELEGRAM_SPOOL_DIR", "spool")
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))
+TELEGRAM_BACKOFF = float(os.getenv("TELEGRAM_BACKOFF", "1"))
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", "10"))
+# Telegram allows about one message per second to the same chat.
+TELEGRAM_CHAT_INTERVAL = float(os.getenv("TELEGRAM_CHAT_INTERVAL", "1"))
 
 REMOTE_HOST = os.getenv("REMOTE_HOST")
 REMOTE_PORT = int(os.getenv("REMOTE_PORT", "22"))
@@ -32,6 +80,93 @@ IMPORTED_JSON_FILE_NAME = DATA_DIR / os.getenv(
 LOCAL_JSON_FILE_NAME = DATA_DIR / os.getenv(
     "LOCAL_JSON_FILE_NAME", "vnstat_remote.json"
 )
+# How the remote JSON file is fetched: `sftp` reads it straight into memory,
+# `scp` copies it to IMPORTED_JSON_FILE_NAME first. SFTP falls back to SCP.
+REMOTE_FETCH_MODE = os.getenv("REMOTE_FETCH_MODE", "sftp").lower()
+# Append-only store of all the collected snapshots.
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "true").lower() == "true"
+HISTORY_DB_PATH = DATA_DIR / os.getenv("HISTORY_DB_PATH", "history.db")
+# Skip the transfer of the remote files that have not changed (by mtime and
+# size) since the last fetch and reuse the cached data instead.
+REMOTE_INCREMENTAL_SYNC = (
+    os.getenv("REMOTE_INCREMENTAL_SYNC", "true").lower() == "true"
+)
+REMOTE_SYNC_STATE_FILE = DATA_DIR / os.getenv(
+    "REMOTE_SYNC_STATE_FILE", "sync_state.json"
+)
+# Comma-separated list of remotes: `name=username@host:port`. If empty, the
+# single remote described by the REMOTE_* variables above is used.
+REMOTES = os.getenv("REMOTES", "")
+SSH_KEY_PASSPHRASE = os.getenv("SSH_KEY_PASSPHRASE") or None
+SSH_KEEPALIVE_INTERVAL = int(os.getenv("SSH_KEEPALIVE_INTERVAL", "30"))
+SSH_MAX_WORKERS = int(os.getenv("SSH_MAX_WORKERS", "8"))
+SSH_TIMEOUT = float(os.getenv("SSH_TIMEOUT", "30"))
+
+# How the remote data is collected: `ssh` pulls it from the remotes, `push`
+# uses the snapshots the remotes pushed to the receiver (`--push` mode).
+REMOTE_COLLECTION = os.getenv("REMOTE_COLLECTION", "ssh").lower()
+PUSH_URL = os.getenv("PUSH_URL")
+PUSH_SECRET = os.getenv("PUSH_SECRET")
+PUSH_TIMEOUT = float(os.getenv("PUSH_TIMEOUT", "10"))
+PUSH_LISTEN_HOST = os.getenv("PUSH_LISTEN_HOST", "0.0.0.0")
+PUSH_LISTEN_PORT = int(os.getenv("PUSH_LISTEN_PORT", "8765"))
+# Maximum clock difference (in seconds) between the pusher and the receiver.
+PUSH_MAX_SKEW = float(os.getenv("PUSH_MAX_SKEW", "300"))
+PUSH_MAX_BODY = int(os.getenv("PUSH_MAX_BODY", "1048576"))
+PUSH_EXPECTED_SYSTEMS = [
+    name.strip()
+    for name in os.getenv("PUSH_EXPECTED_SYSTEMS", "").split(",")
+    if name.strip()
+]
+
+# Repeated exception alerts are only sent once per window (in seconds).
+ALERT_SUPPRESS_WINDOW = int(os.getenv("ALERT_SUPPRESS_WINDOW", "3600"))
+ALERT_STATE_FILE = DATA_DIR / os.getenv("ALERT_STATE_FILE", "alerts.json")
+
+# End-of-month forecast in the report: the number of the latest days the
+# trend is fitted on, and the deviation (in standard deviations from the
+# preceding days) from which a day is flagged as anomalous.
+FORECAST_ENABLED = os.getenv("FORECAST_ENABLED", "true").lower() == "true"
+FORECAST_WINDOW = int(os.getenv("FORECAST_WINDOW", "7"))
+FORECAST_ANOMALY_THRESHOLD = float(
+    os.getenv("FORECAST_ANOMALY_THRESHOLD", "3")
+)
+
+# Hierarchical aggregation: the tags of the systems (comma-separated
+# `system=key:value;key:value` entries), the tag keys the report totals are
+# rolled up by, from the top level down (e.g. `region,dc`), and the name of
+# the pre-aggregated snapshot a mid-tier aggregator pushes upward.
+SYSTEM_TAGS = os.getenv("SYSTEM_TAGS", "")
+AGGREGATION_LEVELS = [
+    level.strip()
+    for level in os.getenv("AGGREGATION_LEVELS", "").split(",")
+    if level.strip()
+]
+PARTIAL_SYSTEM_NAME = os.getenv("PARTIAL_SYSTEM_NAME", LOCAL_SYSTEM_NAME)
+
+# Format of the report: html, markdown (Telegram MarkdownV2), text or json,
+# and the number of the rendered reports (and sections) kept in the cache.
+REPORT_FORMAT = os.getenv("REPORT_FORMAT", "html").lower()
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "256"))
+
+# Prometheus metrics: the file for the node_exporter textfile collector
+# (written after every run, empty to disable) and the port of the `/metrics`
+# endpoint of the daemon (0 to disable).
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+METRICS_LISTEN_HOST = os.getenv("METRICS_LISTEN_HOST", "127.0.0.1")
+METRICS_LISTEN_PORT = int(os.getenv("METRICS_LISTEN_PORT", "0"))
+
+# Comma-separated quota rules: `system[/interface]:period=limit`, where the
+# period is day, month or projected (end-of-month usage at the current pace)
+# and the limit is in GB or in percent of a plan (`80%@1000`).
+QUOTA_RULES = os.getenv("QUOTA_RULES", "")
+QUOTA_STATE_FILE = DATA_DIR / os.getenv("QUOTA_STATE_FILE", "quota.json")
+
+# Daemon mode (`--daemon`): time of the daily report and the intervals (in
+# seconds, 0 to disable) of the local snapshots and the quota checks.
+DAEMON_REPORT_TIME = os.getenv("DAEMON_REPORT_TIME", "08:00")
+DAEMON_SNAPSHOT_INTERVAL = int(os.getenv("DAEMON_SNAPSHOT_INTERVAL", "3600"))
+DAEMON_QUOTA_INTERVAL = int(os.getenv("DAEMON_QUOTA_INTERVAL", "300"))
 
 LOG_DIR = BASE_DIR / os.getenv("LOG_DIR", "logs")
 LOG_FILE = LOG_DIR / os.getenv("LOG_FILE", "vnstat.log")
@@ -1,16 +1,110 @@
+import atexit
+import functools
 import json
+import math
+import os
+import shlex
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
 from datetime import date, timedelta
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, NamedTuple, Optional, Union
 
 import paramiko
 from scp import SCPClient, SCPException
 
 from src import exceptions as exc
-from src import settings
-from src.log import log
+from src import metrics, settings, utils, vnstat
+from src.log import configure_logging, log
 from src.vnstat import VnStatData
 
+logger = configure_logging(__name__)
+
+# How often the fetches of the remotes are checked for their timeouts.
+FETCH_POLL_INTERVAL = 0.05
+
+
+class Remote(NamedTuple):
+    """Remote server to collect the Vnstat data from."""
+
+    system_name: str
+    host: str
+    # None: REMOTE_PORT and REMOTE_USERNAME (read when connecting).
+    port: Optional[int] = None
+    username: Optional[str] = None
+
+
+@log
+def get_remotes(remotes_spec: Optional[str] = None) -> list[Remote]:
+    """
+    Parses the list of remotes from the settings.
+
+    Each remote is specified as `name=username@host:port`, where the username
+    and the port are optional. If the spec is empty, the single remote from the
+    REMOTE_* settings is returned (if configured).
+    """
+    if remotes_spec is None:
+        remotes_spec = settings.REMOTES
+    if not remotes_spec.strip():
+        if not settings.REMOTE_HOST:
+            return []
+        return [
+            Remote(
+                settings.REMOTE_SYSTEM_NAME,
+                settings.REMOTE_HOST,
+                settings.REMOTE_PORT,
+                settings.REMOTE_USERNAME,
+            )
+        ]
+
+    remotes = []
+    for item in remotes_spec.split(","):
+        if not (item := item.strip()):
+            continue
+        system_name, _, address = item.rpartition("=")
+        username, _, host_port = address.rpartition("@")
+        host, _, port = host_port.partition(":")
+        remotes.append(
+            Remote(
+                system_name=system_name or host,
+                host=host,
+                port=int(port) if port else settings.REMOTE_PORT,
+                username=username or settings.REMOTE_USERNAME,
+            )
+        )
+    return remotes
+
+
+KEY_CLASSES = (paramiko.Ed25519Key, paramiko.ECDSAKey, paramiko.RSAKey)
+
+
+def _get_timeout(timeout: Optional[float]) -> Optional[float]:
+    return settings.SSH_TIMEOUT if timeout is None else timeout
+
+
+@functools.lru_cache(maxsize=None)
+def _load_private_key(
+    ssh_key_path: Union[str, Path], passphrase: Optional[str] = None
+) -> paramiko.PKey:
+    """Loads an Ed25519, ECDSA or RSA private key (once per path)."""
+    path = os.path.expanduser(os.path.expandvars(str(ssh_key_path)))
+    errors = []
+    for key_class in KEY_CLASSES:
+        try:
+            return key_class.from_private_key_file(path, password=passphrase)
+        except paramiko.SSHException as e:
+            errors.append(f"{key_class.__name__}: {e}")
+    raise exc.SSHError(
+        f"Failed to load the private key {path}: {'; '.join(errors)}"
+    )
+
 
 @log
 def _connect_to_ssh(
@@ -18,34 +112,231 @@ def _connect_to_ssh(
     remote_port: int,
     username: str,
     ssh_key_path: Union[str, Path],
+    timeout: Optional[float] = None,
 ) -> Optional[paramiko.SSHClient]:
+    timeout = _get_timeout(timeout)
     try:
         ssh = paramiko.SSHClient()
         ssh.load_system_host_keys()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
-        private_key = paramiko.Ed25519Key.from_path(ssh_key_path)
+        private_key = _load_private_key(
+            ssh_key_path, settings.SSH_KEY_PASSPHRASE
+        )
         ssh.connect(
-            remote_host, port=remote_port, username=username, pkey=private_key
+            remote_host,
+            port=remote_port,
+            username=username,
+            pkey=private_key,
+            timeout=timeout,
+            banner_timeout=timeout,
+            auth_timeout=timeout,
         )
         return ssh
-    except paramiko.SSHException as e:
+    except (paramiko.SSHException, OSError) as e:
         raise exc.SSHError(f"Failed to SSH to {remote_host}: {e}")
 
 
+class SSHConnectionPool:
+    """
+    Pool of SSH connections keyed by host, port and username.
+
+    The connections are kept alive between the collections and checked before
+    being reused, so a long-running process only pays for the handshake once
+    per host. A dead connection is transparently replaced with a new one.
+    """
+
+    def __init__(self, keepalive_interval: Optional[int] = None) -> None:
+        self.keepalive_interval = (
+            settings.SSH_KEEPALIVE_INTERVAL
+            if keepalive_interval is None
+            else keepalive_interval
+        )
+        self._clients: dict[tuple, paramiko.SSHClient] = {}
+        self._locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_healthy(client: paramiko.SSHClient) -> bool:
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore()
+        except (paramiko.SSHException, OSError):
+            return False
+        return True
+
+    def get(
+        self,
+        remote_host: str,
+        remote_port: int,
+        username: str,
+        ssh_key_path: Union[str, Path],
+        timeout: Optional[float] = None,
+    ) -> paramiko.SSHClient:
+        """Returns a healthy connection, (re)connecting if necessary."""
+        key = (remote_host, remote_port, username)
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if (client := self._clients.get(key)) is not None:
+                if self._is_healthy(client):
+                    return client
+                logger.info("Reconnecting to %s:%s", *key[:2])
+                client.close()
+            client = _connect_to_ssh(
+                remote_host, remote_port, username, ssh_key_path, timeout
+            )
+            if self.keepalive_interval:
+                client.get_transport().set_keepalive(self.keepalive_interval)
+            self._clients[key] = client
+            return client
+
+    def discard(
+        self, remote_host: str, remote_port: int, username: str
+    ) -> None:
+        """Closes the connection so the next `get` reconnects."""
+        with self._lock:
+            client = self._clients.pop(
+                (remote_host, remote_port, username), None
+            )
+        if client is not None:
+            client.close()
+
+    def close_all(self) -> None:
+        """Closes all the pooled connections."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    def __enter__(self) -> "SSHConnectionPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close_all()
+
+
+pool = SSHConnectionPool()
+
+
+@atexit.register
+def _close_pool() -> None:
+    pool.close_all()
+
+
 @log
 def _scp_remote_file(
     ssh: paramiko.SSHClient,
     json_file_path: Union[str, Path],
     local_file_path: Union[str, Path],
+    timeout: Optional[float] = None,
 ) -> None:
     try:
-        with SCPClient(ssh.get_transport()) as scp:
+        with SCPClient(
+            ssh.get_transport(), socket_timeout=_get_timeout(timeout)
+        ) as scp:
             scp.get(json_file_path, local_file_path)
-    except SCPException as e:
+    except (SCPException, OSError) as e:
         raise exc.SCPError(f"Failed to SCP file {json_file_path}: {e}")
 
 
+def _get_sftp_path(json_file_path: Union[str, Path]) -> str:
+    # SFTP does not expand the shell variables, but relative paths are
+    # resolved against the home directory of the user.
+    path = str(json_file_path)
+    for home_prefix in ("~/", "$HOME/", "${HOME}/"):
+        if path.startswith(home_prefix):
+            return path[len(home_prefix) :]
+    return path
+
+
+@log
+def _read_remote_file(
+    ssh: paramiko.SSHClient,
+    json_file_path: Union[str, Path],
+    timeout: Optional[float] = None,
+) -> str:
+    try:
+        with ssh.open_sftp() as sftp:
+            sftp.get_channel().settimeout(_get_timeout(timeout))
+            with sftp.open(_get_sftp_path(json_file_path), "r") as file:
+                return file.read().decode("utf-8")
+    except (paramiko.SSHException, OSError, UnicodeDecodeError) as e:
+        raise exc.SFTPError(f"Failed to read file {json_file_path}: {e}")
+
+
+@log
+def _stat_remote_file(
+    ssh: paramiko.SSHClient,
+    json_file_path: Union[str, Path],
+    timeout: Optional[float] = None,
+) -> Optional[tuple[int, int]]:
+    """Gets the (mtime, size) of the remote file, None if not available."""
+    try:
+        with ssh.open_sftp() as sftp:
+            sftp.get_channel().settimeout(_get_timeout(timeout))
+            attributes = sftp.stat(_get_sftp_path(json_file_path))
+    except (paramiko.SSHException, OSError) as e:
+        logger.info("Cannot stat %s, fetching it: %s", json_file_path, e)
+        return None
+    return attributes.st_mtime, attributes.st_size
+
+
+class RemoteSyncCache:
+    """
+    Latest snapshots of the remotes with the mtime and size of their files.
+
+    A remote whose file has not changed since the last fetch is not
+    transferred again: its cached snapshot is reused. The cache is persisted
+    so that it survives between the runs.
+    """
+
+    def __init__(self, state_file: Union[str, Path, None] = None) -> None:
+        self.state_file = Path(state_file or settings.REMOTE_SYNC_STATE_FILE)
+        self._state: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if self._state is None:
+            self._state = utils.load_json_state(self.state_file)
+        return self._state
+
+    def get(
+        self, key: str, stat: Optional[tuple[int, int]]
+    ) -> Optional[VnStatData]:
+        """Gets the cached snapshot if the file is unchanged."""
+        if stat is None:
+            return None
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None or tuple(entry["stat"]) != tuple(stat):
+            return None
+        try:
+            return VnStatData.from_dict(entry["data"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def put(
+        self, key: str, stat: Optional[tuple[int, int]], vn_obj: VnStatData
+    ) -> None:
+        """Caches the snapshot fetched from the file with the given stat."""
+        if stat is None:
+            return
+        with self._lock:
+            state = self._load()
+            state[key] = {"stat": list(stat), "data": vn_obj.to_dict()}
+            try:
+                utils.save_json_state(self.state_file, state)
+            except OSError as e:
+                logger.error("Failed to save the sync state: %s", e)
+
+
+sync_cache = RemoteSyncCache()
+
+
 @log
 def _read_file(local_file_path: Union[str, Path]) -> Optional[str]:
     try:
@@ -59,40 +350,387 @@ def _read_file(local_file_path: Union[str, Path]) -> Optional[str]:
 
 
 @log
-def _get_vnstat_obj_from_json(file_data: str):
-    data_dict = json.loads(file_data)
-    data_dict["system_name"] = settings.REMOTE_SYSTEM_NAME
-    data_dict["stat_date"] = date.fromisoformat(data_dict["stat_date"])
-    return VnStatData(**data_dict)
+def _get_vnstat_obj_from_json(
+    file_data: str, system_name: Optional[str] = None
+):
+    system_name = system_name or settings.REMOTE_SYSTEM_NAME
+    try:
+        vn_obj = VnStatData.from_json(file_data)
+    except (ValueError, KeyError, TypeError) as e:
+        raise exc.JSONDecodeError(f"Failed to parse the remote data: {e}")
+    return vn_obj.replace(system_name=system_name)
+
+
+def _fetch_file_data(
+    ssh: paramiko.SSHClient,
+    remote_json_file_path: Union[str, Path],
+    imported_json_file_path: Union[str, Path],
+    timeout: Optional[float],
+) -> str:
+    if settings.REMOTE_FETCH_MODE == "sftp":
+        try:
+            return _read_remote_file(ssh, remote_json_file_path, timeout)
+        except exc.SFTPError as e:
+            logger.warning("%s, falling back to SCP", e)
+    _scp_remote_file(
+        ssh, remote_json_file_path, imported_json_file_path, timeout
+    )
+    return _read_file(imported_json_file_path)
+
+
+def _get_error_vnstat_obj(
+    system_name: str, error: str, stat_date: Optional[date] = None
+) -> VnStatData:
+    return VnStatData(
+        system_name=system_name,
+        stat_date=stat_date or date.today() - timedelta(days=1),
+        error=error,
+    )
+
+
+def _get_error_vnstat_objs(
+    system_name: str, error: str, dates: list[date]
+) -> list[VnStatData]:
+    return [
+        _get_error_vnstat_obj(system_name, error, stat_date)
+        for stat_date in dates
+    ]
 
 
 @log
 def get_remote_vnstat_data(
     *,
-    remote_host: str = settings.REMOTE_HOST,
-    remote_port: int = settings.REMOTE_PORT,
-    username: str = settings.REMOTE_USERNAME,
-    remote_json_file_path: Union[str, Path] = settings.REMOTE_JSON_FILE_PATH,
-    imported_json_file_path: Union[
-        str, Path
-    ] = settings.IMPORTED_JSON_FILE_NAME,
-    ssh_key_path: Union[str, Path] = settings.SSH_KEY_PATH,
+    system_name: Optional[str] = None,
+    remote_host: Optional[str] = None,
+    remote_port: Optional[int] = None,
+    username: Optional[str] = None,
+    remote_json_file_path: Union[str, Path, None] = None,
+    imported_json_file_path: Union[str, Path, None] = None,
+    ssh_key_path: Union[str, Path, None] = None,
+    timeout: Optional[float] = None,
+    connection_pool: Optional[SSHConnectionPool] = None,
+    cache: Optional[RemoteSyncCache] = None,
 ) -> Optional[VnStatData]:
-    """Gets the Vnstat data from the file on the remote server."""
+    """
+    Gets the Vnstat data from the file on the remote server.
+
+    In the `sftp` REMOTE_FETCH_MODE the file is read over SFTP straight into
+    memory. If that fails, or in the `scp` mode, the file is copied to
+    `imported_json_file_path` and read from there. The SSH connection is taken
+    from the connection pool (the module-wide one by default). The omitted
+    arguments are read from the settings at call time.
+
+    With REMOTE_INCREMENTAL_SYNC the mtime and size of the remote file are
+    checked first, and an unchanged file is not transferred again.
+    """
+    system_name = system_name or settings.REMOTE_SYSTEM_NAME
+    remote_host = remote_host or settings.REMOTE_HOST
+    remote_port = remote_port or settings.REMOTE_PORT
+    username = username or settings.REMOTE_USERNAME
+    remote_json_file_path = (
+        remote_json_file_path or settings.REMOTE_JSON_FILE_PATH
+    )
+    imported_json_file_path = (
+        imported_json_file_path or settings.IMPORTED_JSON_FILE_NAME
+    )
+    ssh_key_path = ssh_key_path or settings.SSH_KEY_PATH
+    timeout = _get_timeout(timeout)
+    connection_pool = connection_pool or pool
+    cache = cache or sync_cache
+    cache_key = f"{system_name}:{remote_host}:{remote_json_file_path}"
+
+    try:
+        with metrics.timer("ssh_connect", system=system_name):
+            ssh = connection_pool.get(
+                remote_host, remote_port, username, ssh_key_path, timeout
+            )
+        stat = (
+            _stat_remote_file(ssh, remote_json_file_path, timeout)
+            if settings.REMOTE_INCREMENTAL_SYNC
+            else None
+        )
+        if (cached := cache.get(cache_key, stat)) is not None:
+            logger.info("%s is unchanged, reusing the cached data", cache_key)
+            return cached.replace(system_name=system_name)
+        try:
+            with metrics.timer("ssh_transfer", system=system_name):
+                file_data = _fetch_file_data(
+                    ssh,
+                    remote_json_file_path,
+                    imported_json_file_path,
+                    timeout,
+                )
+        except exc.InternalError:
+            connection_pool.discard(remote_host, remote_port, username)
+            raise
+        with metrics.timer("json_parse", system=system_name):
+            vn_obj = _get_vnstat_obj_from_json(file_data, system_name)
+        cache.put(cache_key, stat, vn_obj)
+        return vn_obj
+
+    except exc.InternalError as e:
+        return _get_error_vnstat_obj(system_name, str(e))
+
+
+def _fetch_remote(remote: Remote, timeout: Optional[float]) -> VnStatData:
+    try:
+        return get_remote_vnstat_data(
+            system_name=remote.system_name,
+            remote_host=remote.host,
+            remote_port=remote.port,
+            username=remote.username,
+            imported_json_file_path=(
+                settings.DATA_DIR / f"vnstat_{remote.system_name}.json"
+            ),
+            timeout=timeout,
+        )
+    except Exception as e:
+        return _get_error_vnstat_obj(
+            remote.system_name,
+            f"Failed to fetch data from {remote.host}: {e}",
+        )
+
+
+def _get_finished(
+    futures: list[Future],
+    pending: set[int],
+    started: dict[int, float],
+    timeout: float,
+    deadline: float,
+) -> tuple[set[int], set[int]]:
+    """
+    Gets the indexes of the done and of the timed out pending futures.
+
+    Past the deadline all the pending futures are timed out, including the
+    ones that never started.
+    """
+    now = time.monotonic()
+    done = {index for index in pending if futures[index].done()}
+    timed_out = {
+        index
+        for index in pending - done
+        if now >= deadline
+        or (index in started and now - started[index] >= timeout)
+    }
+    return done, timed_out
+
+
+def _fetch_all(
+    remotes: list[Remote],
+    fetch: Callable[[Remote, Optional[float]], Any],
+    on_timeout: Callable[[Remote], Any],
+    max_workers: Optional[int],
+    timeout: Optional[float],
+) -> list:
+    """
+    Runs `fetch` for all the remotes through a bounded thread pool.
 
+    Every remote gets its own timeout, measured from the start of its fetch,
+    so a hung host does not use up the time of the hosts queued behind it.
+    The worker of a hung host is freed by the socket timeouts of the
+    connection and the channel. All the fetches are bounded by an overall
+    deadline of one timeout per round of workers: the remotes still queued
+    behind the hung workers by then are timed out as well.
+    """
+    max_workers = max(
+        1, min(max_workers or settings.SSH_MAX_WORKERS, len(remotes))
+    )
+    timeout = timeout or settings.SSH_TIMEOUT
+    deadline = (
+        time.monotonic() + math.ceil(len(remotes) / max_workers) * timeout
+    )
+    started: dict[int, float] = {}
+
+    def run(index: int, remote: Remote):
+        started[index] = time.monotonic()
+        return fetch(remote, timeout)
+
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix="ssh",
+    )
+    futures = [
+        executor.submit(run, index, remote)
+        for index, remote in enumerate(remotes)
+    ]
+    pending = set(range(len(futures)))
+    timed_out: set[int] = set()
+    while pending:
+        done, expired = _get_finished(
+            futures, pending, started, timeout, deadline
+        )
+        pending -= done | expired
+        timed_out |= expired
+        if pending:
+            wait(
+                [futures[index] for index in pending],
+                timeout=FETCH_POLL_INTERVAL,
+                return_when=FIRST_COMPLETED,
+            )
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    return [
+        on_timeout(remote) if index in timed_out else futures[index].result()
+        for index, remote in enumerate(remotes)
+    ]
+
+
+@log
+def get_all_remote_vnstat_data(
+    remotes: Optional[list[Remote]] = None,
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> list[VnStatData]:
+    """
+    Gets the Vnstat data from all the remote servers concurrently.
+
+    The remotes are fetched through a bounded thread pool. A remote that fails
+    or does not respond within its timeout still produces a VnStatData object
+    with the error, so the results are always returned in the order of the
+    remotes.
+    """
+    if remotes is None:
+        remotes = get_remotes()
+    if not remotes:
+        return []
+    return _fetch_all(
+        remotes,
+        _fetch_remote,
+        lambda remote: _get_error_vnstat_obj(
+            remote.system_name, f"Timed out fetching data from {remote.host}"
+        ),
+        max_workers,
+        timeout,
+    )
+
+
+@log
+def _exec_remote_command(
+    ssh: paramiko.SSHClient,
+    command: tuple,
+    timeout: Optional[float] = None,
+) -> str:
+    command_line = shlex.join(command)
     try:
-        ssh = _connect_to_ssh(remote_host, remote_port, username, ssh_key_path)
-        _scp_remote_file(ssh, remote_json_file_path, imported_json_file_path)
-        file_data = _read_file(imported_json_file_path)
-        return _get_vnstat_obj_from_json(file_data)
+        _, stdout, stderr = ssh.exec_command(
+            command_line, timeout=_get_timeout(timeout)
+        )
+        output = stdout.read()
+        returncode = stdout.channel.recv_exit_status()
+        error_output = stderr.read()
+    except (paramiko.SSHException, OSError) as e:
+        raise exc.SSHError(f"Failed to run `{command_line}`: {e}")
+    if returncode:
+        raise exc.CommandError(
+            f"{settings.NO_DATA}: Error running command `{command_line}`: "
+            f"returncode: {returncode}, "
+            f"stderr: `{error_output.decode(errors='replace').strip()}`"
+        )
+    return output.decode("utf-8", errors="replace")
 
+
+@log
+def get_remote_vnstat_data_range(
+    remote: Remote,
+    start_date: date,
+    end_date: date,
+    *,
+    interfaces: Optional[list[str]] = None,
+    ssh_key_path: Union[str, Path, None] = None,
+    timeout: Optional[float] = None,
+    connection_pool: Optional[SSHConnectionPool] = None,
+) -> list[VnStatData]:
+    """
+    Gets the Vnstat data of the remote for every date of the range.
+
+    Instead of the snapshot file, `vnstat --json` is run on the remote once
+    (over the pooled connection) with a limit covering the whole range, and
+    all the dates are computed from that single dump.
+    """
+    connection_pool = connection_pool or pool
+    interfaces = interfaces or settings.REMOTE_INTERFACE_NAMES
+    port = remote.port or settings.REMOTE_PORT
+    username = remote.username or settings.REMOTE_USERNAME
+    try:
+        with metrics.timer("ssh_connect", system=remote.system_name):
+            ssh = connection_pool.get(
+                remote.host,
+                port,
+                username,
+                ssh_key_path or settings.SSH_KEY_PATH,
+                timeout,
+            )
+        try:
+            with metrics.timer("ssh_command", system=remote.system_name):
+                output = _exec_remote_command(
+                    ssh, vnstat._get_command(start_date), timeout
+                )
+        except exc.SSHError:
+            connection_pool.discard(remote.host, port, username)
+            raise
+        with metrics.timer("json_parse", system=remote.system_name):
+            try:
+                vnstat_data = json.loads(output)
+            except json.JSONDecodeError as e:
+                raise exc.JSONDecodeError(
+                    f"Failed to parse the vnstat output of {remote.host}: {e}"
+                )
     except exc.InternalError as e:
-        return VnStatData(
-            system_name=settings.REMOTE_SYSTEM_NAME,
-            stat_date=date.today() - timedelta(days=1),
-            error=str(e),
+        return _get_error_vnstat_objs(
+            remote.system_name,
+            str(e),
+            vnstat.get_date_range(start_date, end_date),
         )
+    return vnstat.get_traffic_data_range_from_dump(
+        remote.system_name,
+        vnstat_data,
+        start_date,
+        end_date,
+        interfaces=interfaces,
+    )
+
+
+@log
+def get_all_remote_vnstat_data_range(
+    start_date: date,
+    end_date: date,
+    remotes: Optional[list[Remote]] = None,
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> list[list[VnStatData]]:
+    """
+    Gets the Vnstat data of the date range from all the remotes concurrently.
+
+    Returns a list of the per-date objects for every remote, in the order of
+    the remotes. One SSH command is run per remote for the whole range.
+    """
+    if remotes is None:
+        remotes = get_remotes()
+    if not remotes:
+        return []
+    dates = vnstat.get_date_range(start_date, end_date)
+
+    def fetch(remote: Remote, timeout: Optional[float]) -> list[VnStatData]:
+        try:
+            return get_remote_vnstat_data_range(
+                remote, start_date, end_date, timeout=timeout
+            )
+        except Exception as e:
+            return _get_error_vnstat_objs(
+                remote.system_name,
+                f"Failed to fetch data from {remote.host}: {e}",
+                dates,
+            )
+
+    def on_timeout(remote: Remote) -> list[VnStatData]:
+        return _get_error_vnstat_objs(
+            remote.system_name,
+            f"Timed out fetching data from {remote.host}",
+            dates,
+        )
+
+    return _fetch_all(remotes, fetch, on_timeout, max_workers, timeout)
 
 
 if __name__ == "__main__":
-    print(get_remote_vnstat_data())
+    print(get_all_remote_vnstat_data())
@@ -1,10 +1,14 @@
 import builtins
+import functools
 import keyword
 import re
 import subprocess
+import threading
+import time
 from datetime import datetime
 from typing import Optional
 
+from src import settings
 from src.log import log
 
 PROPERTIES = [
@@ -17,15 +21,29 @@ PROPERTIES = [
     "InactiveEnterTimestamp",
 ]
 
-COMMAND = [
-    "systemctl",
-    "show",
-    "vnstat",
-    f"--property={(','.join(PROPERTIES))}",
-]
+
+def _get_command(units: tuple[str, ...]) -> list[str]:
+    return ["systemctl", "show", *units, f"--property={','.join(PROPERTIES)}"]
+
+
+COMMAND = _get_command(("vnstat",))
 
 ERROR_OUTPUT_LIMIT = 100
 
+RESERVED_NAMES = frozenset(keyword.kwlist) | frozenset(dir(builtins))
+PASCAL_CASE_BOUNDARY = re.compile(r"(?<!^)(?=[A-Z])")
+
+# units -> (monotonic time of the fetch, statuses)
+_status_cache: dict[tuple[str, ...], tuple[float, dict]] = {}
+_status_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_attribute_name(key: str) -> str:
+    """Maps a systemctl property name to the attribute name (memoized)."""
+    name = PASCAL_CASE_BOUNDARY.sub("_", key).lower()
+    return f"{name}_" if name in RESERVED_NAMES else name
+
 
 class SystemctlStatus:
     """Systemctl status object."""
@@ -34,23 +52,13 @@ class SystemctlStatus:
         for param in param_list:
             key, value = param.split("=", 1)
 
-            key = self.pascal_to_snake_case(key)
+            key = _get_attribute_name(key)
 
-            if self.is_keyword_or_builtin(key):
-                key = f"{key}_"
             if "timestamp" in key:
                 value = self.parse_timestamp(value)
 
             setattr(self, key, value if value else None)
 
-    def pascal_to_snake_case(self, name):
-        """Convert PascalCase to snake_case."""
-        return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
-
-    def is_keyword_or_builtin(self, word):
-        """Check if word is a keyword or builtin."""
-        return keyword.iskeyword(word) or word in dir(builtins)
-
     def parse_timestamp(self, timestamp_str):
         """Parse timestamp string."""
         try:
@@ -97,32 +105,68 @@ def _parse_status(status: SystemctlStatus) -> str:
             f"unit is <b>{status.unit_file_state}</b>"
         )
     except AttributeError as e:
-        return f"vnstat.service: could not parse status: {e} "
+        unit = getattr(status, "id_", None) or "service"
+        return f"{unit}: could not parse status: {e} "
 
 
-@log
-def get_service_status() -> Optional[str]:
-    """Fetch the status of the VnStat service."""
+def _fetch_services_status(units: tuple[str, ...]) -> dict:
     try:
         res = subprocess.run(
-            COMMAND, capture_output=True, text=True, check=False
+            _get_command(units), capture_output=True, text=True, check=False
         )
     except Exception as e:
-        return (
-            "vnstat.service: an error occurred while trying "
-            f"to fetch the status: '{e}'"
-        )
+        return {
+            unit: (
+                f"{unit}.service: an error occurred while trying "
+                f"to fetch the status: '{e}'"
+            )
+            for unit in units
+        }
 
     if res.stderr:
         error_msg = res.stderr.strip().strip("\n")[:ERROR_OUTPUT_LIMIT]
-        return f"vnstat.service: status <b>unknown</b>: {error_msg}"
+        return {
+            unit: f"{unit}.service: status <b>unknown</b>: {error_msg}"
+            for unit in units
+        }
+
+    # `systemctl show` separates the units with an empty line.
+    blocks = res.stdout.strip().split("\n\n") if res.stdout.strip() else []
+    statuses = dict.fromkeys(units)
+    for unit, block in zip(units, blocks):
+        status = SystemctlStatus(block.strip().split("\n"))
+        statuses[unit] = _parse_status(status)
+    return statuses
 
-    if res.stdout:
-        params = res.stdout.strip().split("\n")
-        status = SystemctlStatus(params)
-        return _parse_status(status)
 
-    return None
+@log
+def get_services_status(
+    units: tuple[str, ...] = ("vnstat",), ttl: Optional[float] = None
+) -> dict[str, Optional[str]]:
+    """
+    Fetch the status of several services with a single systemctl call.
+
+    The statuses are cached for `ttl` seconds (SYSTEMCTL_CACHE_TTL by
+    default), so frequent polling does not fork systemctl every time.
+    """
+    units = tuple(units)
+    ttl = settings.SYSTEMCTL_CACHE_TTL if ttl is None else ttl
+    now = time.monotonic()
+    with _status_cache_lock:
+        cached = _status_cache.get(units)
+    if cached is not None and now - cached[0] < ttl:
+        return dict(cached[1])
+
+    statuses = _fetch_services_status(units)
+    with _status_cache_lock:
+        _status_cache[units] = (now, statuses)
+    return dict(statuses)
+
+
+@log
+def get_service_status(unit: str = "vnstat") -> Optional[str]:
+    """Fetch the status of the VnStat service."""
+    return get_services_status((unit,))[unit]
 
 
 if __name__ == "__main__":
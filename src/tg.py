@@ -1,10 +1,9 @@
 import locale
-from http import HTTPStatus
-
-import requests
+from typing import Optional
 
+from src import delivery
 from src import exceptions as exc
-from src import settings, utils
+from src import forecast, render, settings
 from src.log import configure_logging, log
 from src.vnstat import VnStatData, vn_sim, vn_sim_error
 
@@ -14,68 +13,52 @@ logger = configure_logging(__name__)
 
 
 @log
-def get_msg_for_service(vn_obj: VnStatData) -> str:
+def get_msg_for_service(
+    vn_obj: VnStatData,
+    service_forecast: Optional[forecast.Forecast] = None,
+    day_label: Optional[str] = "Yesterday",
+) -> str:
     """Gets the message for a particular service (system)."""
-    service_status = (
-        f"{vn_obj.service_status}\n\n" if vn_obj.service_status else ""
-    )
-    day_traffic = utils.bytes_to_gb(vn_obj.day_traffic, bold=True)
-    month_traffic = utils.bytes_to_gb(vn_obj.month_traffic, bold=True)
-    error = f"\n\n<b>Error</b>: {vn_obj.error}" if vn_obj.error else ""
-    return (
-        f"<b>{vn_obj.system_name.upper()}</b>:\n\n{service_status}"
-        f"Yesterday, {vn_obj.stat_date.strftime('%A, %d %B %Y')}:\n"
-        f"{day_traffic}\n\n"
-        f"Cumulative for {vn_obj.stat_date.strftime('%B %Y')}:\n"
-        f"{month_traffic}{error}\n\n====================\n\n"
-    )
+    return render.renderer.render_system(vn_obj, service_forecast, day_label)
 
 
 @log
-def get_final_msg(*vnstat_objects: VnStatData) -> str:
-    """Gets the final combined message for all systems ready to be sent."""
-    message = ""
-    day_traffic = 0
-    month_traffic = 0
-    for vn_obj in vnstat_objects:
-        message += get_msg_for_service(vn_obj)
-        if vn_obj.day_traffic:
-            day_traffic += vn_obj.day_traffic
-        if vn_obj.month_traffic:
-            month_traffic += vn_obj.month_traffic
+def get_final_msg(
+    *vnstat_objects: VnStatData, day_label: Optional[str] = "Yesterday"
+) -> str:
+    """
+    Gets the final combined message for all systems ready to be sent.
 
-    message += (
-        "<b>TOTAL FOR ALL SERVICES</b>:\n"
-        f"Yesterday: {utils.bytes_to_gb(day_traffic, bold=True)}\n"
-        f"Cumulative: {utils.bytes_to_gb(month_traffic, bold=True)}\n\n"
-    )
-    return message
+    The message is rendered in the format of the `REPORT_FORMAT` setting.
+    """
+    return render.render(*vnstat_objects, day_label=day_label)
 
 
 @log
 def send_telegram_message(
     message: str,
-    telegram_bot_token: str = settings.TELEGRAM_BOT_TOKEN,
-    telegram_chat_id: str = settings.TELEGRAM_CHAT_ID,
+    telegram_bot_token: Optional[str] = None,
+    telegram_chat_id: Optional[str] = None,
+    parse_mode: Optional[str] = "HTML",
 ) -> None:
-    """Sends a Telegram message."""
+    """
+    Sends a Telegram message to the chat (all the configured chats by default).
 
-    url = f"https://api.telegram.org/bot{telegram_bot_token}/sendMessage"
-    payload = {
-        "chat_id": telegram_chat_id,
-        "text": message,
-        "parse_mode": "HTML",
-    }
+    See `delivery.TelegramDelivery` for the splitting, retries and spooling.
+    """
+    telegram_bot_token = telegram_bot_token or settings.TELEGRAM_BOT_TOKEN
+    chat_ids = (
+        (telegram_chat_id,)
+        if telegram_chat_id
+        else tuple(settings.TELEGRAM_CHAT_IDS)
+    )
 
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        if response.status_code == HTTPStatus.OK:
-            logger.info("Message sent successfully.")
-        else:
-            logger.error(
-                "Failed to send message. Status code: %s",
-                response.status_code,
-            )
+        delivery.get_delivery(
+            telegram_bot_token, chat_ids, settings.TELEGRAM_API_URL
+        ).send(message, parse_mode)
+    except exc.TelegramError:
+        raise
     except Exception as e:
         raise exc.TelegramError(f"Error sending Telegram message: {e}")
 
@@ -83,4 +66,4 @@ def send_telegram_message(
 if __name__ == "__main__":
     final_msg = get_final_msg(vn_sim, vn_sim_error)
     print(final_msg)
-    send_telegram_message(final_msg)
+    send_telegram_message(final_msg, parse_mode=render.get_format().parse_mode)
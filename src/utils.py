@@ -1,5 +1,6 @@
 import calendar
 import json
+import os
 from datetime import date
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional
@@ -28,14 +29,30 @@ def bytes_to_gb(bytes_value: Optional[int] = None, bold: bool = False) -> str:
 
 @log
 def save_vnstat_data_to_file(
-    vnstat_data: "VnStatData", file_path: Path = settings.LOCAL_JSON_FILE_NAME
+    vnstat_data: "VnStatData", file_path: Optional[Path] = None
 ):
     """Save VnStat data to file."""
-    vn_dict = vnstat_data.__dict__
-    vn_dict["stat_date"] = vn_dict["stat_date"].isoformat()
-    vn_json = json.dumps(vn_dict)
-    with open(file_path, "w", encoding="utf-8") as file:
-        file.write(vn_json)
+    with open(
+        file_path or settings.LOCAL_JSON_FILE_NAME, "w", encoding="utf-8"
+    ) as file:
+        file.write(vnstat_data.to_json())
+
+
+def load_json_state(file_path: Path) -> dict:
+    """Loads the JSON state file, empty if it is missing or corrupted."""
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json_state(file_path: Path, state: dict) -> None:
+    """Replaces the JSON state file atomically (raises OSError)."""
+    tmp_file = file_path.with_suffix(".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(tmp_file, file_path)
 
 
 @log
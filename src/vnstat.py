@@ -1,16 +1,19 @@
 import json
+import re
 import subprocess
-from collections.abc import Generator
+from collections.abc import Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
 from enum import Enum
-from typing import Optional
+from types import MappingProxyType
+from typing import Optional, TextIO, Union
 
 import jmespath as jm
 
 from src import exceptions as exc
-from src import settings, utils
+from src import metrics, serialization, settings, utils
 from src.log import configure_logging, log
-from src.systemctl import get_service_status
+from src.systemctl import get_services_status
 
 logger = configure_logging(__name__)
 
@@ -23,7 +26,32 @@ class Modifiers(Enum):
 
 
 class VnStatData:
-    """VnStat data object."""
+    """
+    VnStat data object.
+
+    The object is immutable (use `replace` to get a modified copy) and has
+    versioned JSON and compact binary serialization forms.
+    """
+
+    __slots__ = (
+        "system_name",
+        "service_status",
+        "stat_date",
+        "day_traffic",
+        "month_traffic",
+        "error",
+        "interfaces",
+        "daily_traffic",
+    )
+
+    system_name: str
+    service_status: Optional[str]
+    stat_date: date
+    day_traffic: Optional[int]
+    month_traffic: Optional[int]
+    error: Optional[str]
+    interfaces: Optional[Mapping[str, Mapping[str, Optional[int]]]]
+    daily_traffic: Optional[tuple[Optional[int], ...]]
 
     def __init__(
         self,
@@ -34,13 +62,111 @@ class VnStatData:
         day_traffic: Optional[int] = None,
         month_traffic: Optional[int] = None,
         error: Optional[str] = None,
+        interfaces: Optional[dict[str, dict[str, Optional[int]]]] = None,
+        daily_traffic: Optional[list[Optional[int]]] = None,
     ) -> None:
-        self.system_name = system_name
-        self.service_status = service_status
-        self.stat_date = stat_date
-        self.day_traffic = day_traffic
-        self.month_traffic = month_traffic
-        self.error = error
+        # Per-interface breakdown: {name: {"day_traffic", "month_traffic"}}.
+        if interfaces is not None:
+            interfaces = MappingProxyType(
+                {
+                    name: MappingProxyType(dict(traffic))
+                    for name, traffic in interfaces.items()
+                }
+            )
+        # Totals of the days of the month up to (and including) `stat_date`.
+        if daily_traffic is not None:
+            daily_traffic = tuple(daily_traffic)
+        for name, value in (
+            ("system_name", system_name),
+            ("service_status", service_status),
+            ("stat_date", stat_date),
+            ("day_traffic", day_traffic),
+            ("month_traffic", month_traffic),
+            ("error", error),
+            ("interfaces", interfaces),
+            ("daily_traffic", daily_traffic),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"VnStatData is immutable, cannot set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"VnStatData is immutable, cannot delete {name}")
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, VnStatData):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return _vnstat_data_from_dict, (self.to_dict(),)
+
+    def replace(self, **changes) -> "VnStatData":
+        """Gets a copy of the object with the given fields changed."""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return VnStatData(**fields)
+
+    def to_dict(self) -> dict:
+        """Gets the JSON-compatible dict with the serialization version."""
+        return {
+            "version": serialization.VERSION,
+            "system_name": self.system_name,
+            "service_status": self.service_status,
+            "stat_date": self.stat_date.isoformat(),
+            "day_traffic": self.day_traffic,
+            "month_traffic": self.month_traffic,
+            "error": self.error,
+            "interfaces": (
+                {
+                    name: dict(traffic)
+                    for name, traffic in self.interfaces.items()
+                }
+                if self.interfaces is not None
+                else None
+            ),
+            "daily_traffic": (
+                list(self.daily_traffic)
+                if self.daily_traffic is not None
+                else None
+            ),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VnStatData":
+        """Creates the object from `to_dict` output (or a legacy dict)."""
+        serialization.check_version(data.get("version", 0))
+        return cls(
+            system_name=data["system_name"],
+            service_status=data.get("service_status"),
+            stat_date=date.fromisoformat(data["stat_date"]),
+            day_traffic=data.get("day_traffic"),
+            month_traffic=data.get("month_traffic"),
+            error=data.get("error"),
+            interfaces=data.get("interfaces"),
+            daily_traffic=data.get("daily_traffic"),
+        )
+
+    def to_json(self) -> str:
+        """Serializes the object to JSON."""
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: Union[str, bytes]) -> "VnStatData":
+        """Deserializes the object from JSON."""
+        return cls.from_dict(json.loads(data))
+
+    def to_bytes(self) -> bytes:
+        """Serializes the object to the compact binary form."""
+        return serialization.dump_fields(self.to_dict())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "VnStatData":
+        """Deserializes the object from the compact binary form."""
+        return cls.from_dict(serialization.load_fields(data))
 
     def __repr__(self) -> str:
         day_traffic = (
@@ -53,25 +179,49 @@ class VnStatData:
             if self.month_traffic
             else None
         )
+        interfaces = self.to_dict()["interfaces"]
         return (
             f"<VnStatData(system_name='{self.system_name}', "
             f"service_status='{self.service_status}', "
             f"stat_date={self.stat_date.isoformat()}, "
             f"day_traffic={day_traffic}, "
             f"month_traffic={month_traffic}, "
-            f"error='{self.error}')>"
+            f"error='{self.error}', "
+            f"interfaces={interfaces})>"
         )
 
 
+def _vnstat_data_from_dict(data: dict) -> VnStatData:
+    return VnStatData.from_dict(data)
+
+
+@log
+def _get_command(start_date: date, today: Optional[date] = None) -> tuple:
+    """Gets the vnstat command with a limit covering `start_date`."""
+    today = today or date.today()
+    days = (today - start_date).days + 1
+    months = (
+        (today.year - start_date.year) * 12
+        + today.month
+        - start_date.month
+        + 1
+    )
+    limit = max(settings.COMMAND_LIMIT, days, months)
+    return (*settings.COMMAND, str(limit))
+
+
 @log
 def _get_command_result(
-    command: list[str] = settings.COMMAND,
+    command: Optional[tuple] = None,
 ) -> Optional[dict]:
+    command = command or (*settings.COMMAND, str(settings.COMMAND_LIMIT))
     try:
-        raw_json = subprocess.run(
-            command, capture_output=True, text=True, check=True
-        )
-        result = json.loads(raw_json.stdout.strip("\n"))
+        with metrics.timer("vnstat_command"):
+            raw_json = subprocess.run(
+                command, capture_output=True, text=True, check=True
+            )
+        with metrics.timer("json_parse"):
+            result = json.loads(raw_json.stdout.strip("\n"))
     except subprocess.CalledProcessError as e:
         stdout = (
             f", stdout: `{e.stdout.strip()}`"
@@ -91,94 +241,441 @@ def _get_command_result(
     return result
 
 
+STREAM_CHUNK_SIZE = 64 * 1024
+INTERFACES_START = re.compile(r'"interfaces"\s*:\s*\[')
+JSON_DECODER = json.JSONDecoder()
+
+
+def _skip_to_interfaces(stream: TextIO, chunk_size: int) -> str:
+    """Reads the stream up to the `interfaces` array, returns the rest."""
+    buffer = ""
+    while (match := INTERFACES_START.search(buffer)) is None:
+        if not (chunk := stream.read(chunk_size)):
+            raise exc.JSONDecodeError(
+                "Failed to parse data: no interfaces in the vnstat output"
+            )
+        # The tail is kept in case the key is split between the chunks.
+        buffer = buffer[-32:] + chunk
+    return buffer[match.end() :]
+
+
+def _iter_interfaces(
+    stream: TextIO, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[dict]:
+    """
+    Yields the objects of the `interfaces` array of the vnstat JSON output.
+
+    The stream is read incrementally and only one interface is held in
+    memory at a time. An incomplete interface is retried once the buffer has
+    doubled, so the parsing stays linear in the size of the output.
+    """
+    buffer = _skip_to_interfaces(stream, chunk_size)
+    eof = False
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,")
+        if buffer.startswith("]"):
+            return
+        if buffer.startswith("{"):
+            try:
+                interface, end = JSON_DECODER.raw_decode(buffer)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise exc.JSONDecodeError(f"Failed to parse data: {e}")
+            else:
+                yield interface
+                buffer = buffer[end:]
+                continue
+        elif buffer:
+            raise exc.JSONDecodeError(
+                f"Failed to parse data: unexpected `{buffer[:20]}`"
+            )
+        if eof:
+            raise exc.JSONDecodeError(
+                "Failed to parse data: unexpected end of the vnstat output"
+            )
+        chunk = stream.read(max(chunk_size, len(buffer)))
+        eof = not chunk
+        buffer += chunk
+
+
+def _trim_interface(interface: dict, start_date: date) -> dict:
+    """Keeps only the day and month buckets from `start_date` on."""
+    traffic = interface.get("traffic") or {}
+    start_keys = {
+        Modifiers.DAY: (start_date.year, start_date.month, start_date.day),
+        Modifiers.MONTH: (start_date.year, start_date.month, 0),
+    }
+    return {
+        "name": interface.get("name"),
+        "traffic": {
+            modifier.value: [
+                record
+                for record in traffic.get(modifier.value) or []
+                if (
+                    record["date"]["year"],
+                    record["date"]["month"],
+                    record["date"].get("day", 0),
+                )
+                >= start_keys[modifier]
+            ]
+            for modifier in Modifiers
+        },
+    }
+
+
 @log
-def __get_interface_traffic_data(
-    vnstat_data: dict,
-    target_interface: str = settings.INTERFACE_NAME,
-) -> Optional[dict]:
-    return jm.search(
-        f"interfaces[?name=='{target_interface}'].traffic | [0]", vnstat_data
+def _get_streamed_command_result(
+    command: tuple, interfaces: list[str], start_date: date
+) -> dict:
+    """
+    Runs vnstat and parses its output while it is being read.
+
+    Only the requested interfaces and their day and month buckets from
+    `start_date` on are kept, so the peak memory is bounded by the largest
+    interface instead of the whole output.
+    """
+    wanted = set(interfaces)
+    parse_error = None
+    try:
+        with metrics.timer("vnstat_command"), subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        ) as process:
+            try:
+                result = {
+                    "interfaces": [
+                        _trim_interface(interface, start_date)
+                        for interface in _iter_interfaces(process.stdout)
+                        if interface.get("name") in wanted
+                    ]
+                }
+            except exc.JSONDecodeError as e:
+                parse_error = e
+            except (KeyError, TypeError, AttributeError) as e:
+                parse_error = exc.JSONDecodeError(f"Failed to parse data: {e}")
+            except BaseException:
+                process.kill()
+                raise
+            # Drain the rest of the output so that vnstat can exit.
+            while process.stdout.read(STREAM_CHUNK_SIZE):
+                pass
+            error_output = process.stderr.read()
+    except OSError as e:
+        raise exc.FetchError(f"Failed to fetch data: {e}")
+    if process.returncode:
+        raise exc.CommandError(
+            f"{settings.NO_DATA}: Error running command "
+            f"`{' '.join(command)}`: returncode: {process.returncode}, "
+            f"stderr: `{error_output.strip()}`"
+        )
+    if parse_error is not None:
+        raise parse_error
+    return result
+
+
+# Compiled once: every lookup below is a dict access on the traffic index.
+INTERFACES_EXPRESSION = jm.compile("interfaces[].[name, traffic]")
+TRAFFIC_EXPRESSIONS = {
+    modifier: jm.compile(
+        f"{modifier.value}[].[date.year, date.month, date.day, rx, tx]"
     )
+    for modifier in Modifiers
+}
+
+DateKey = tuple[int, int, Optional[int]]
+InterfaceIndex = dict[Modifiers, dict[DateKey, int]]
+
+
+def _get_date_key(modifier: Modifiers, target_date: date) -> DateKey:
+    day = target_date.day if modifier == Modifiers.DAY else None
+    return target_date.year, target_date.month, day
+
+
+@log
+def _index_traffic(vnstat_data: dict) -> dict[str, InterfaceIndex]:
+    """
+    Indexes the day and month traffic of all the interfaces in one pass.
+
+    Returns a mapping of interface names to the rx + tx totals keyed by
+    (year, month, day), with the day being None for the months. The records
+    keep the vnstat order, so the last one is the latest available.
+    """
+    index = {}
+    for name, traffic in INTERFACES_EXPRESSION.search(vnstat_data) or []:
+        index[name] = {
+            modifier: {
+                (year, month, day): rx + tx
+                for year, month, day, rx, tx in (
+                    expression.search(traffic or {}) or []
+                )
+            }
+            for modifier, expression in TRAFFIC_EXPRESSIONS.items()
+        }
+    return index
+
+
+@log
+def __get_interface_traffic_data(
+    traffic_index: dict[str, InterfaceIndex],
+    target_interface: Optional[str] = None,
+) -> Optional[InterfaceIndex]:
+    return traffic_index.get(target_interface or settings.INTERFACE_NAME)
 
 
 @log
 def __get_traffic_value(
-    interface_traffic_data: Optional[dict],
+    interface_traffic_data: Optional[InterfaceIndex],
     modifier: Modifiers,
     target_date: date,
 ) -> Optional[int]:
-    day_part = (
-        f" && date.day==`{target_date.day}`"
-        if modifier == Modifiers.DAY
-        else ""
+    if not interface_traffic_data:
+        return None
+    records = interface_traffic_data[modifier]
+    if (
+        traffic := records.get(_get_date_key(modifier, target_date))
+    ) is not None:
+        return traffic
+
+    if not records:
+        raise exc.MissingTargetDateError(
+            f"Target date {target_date} not found in traffic data. "
+            f"No {modifier.value} data is available. "
+            "Please check if the vnstat service is running."
+        )
+    latest_date = next(reversed(records))
+    date_obj = (
+        date(*latest_date)
+        if latest_date[-1]
+        else utils.get_month_date_object(*latest_date[:-1])
     )
-    rx_tx: Optional[list] = jm.search(
-        f"{modifier.value}[?date.year==`{target_date.year}` "
-        f"&& date.month==`{target_date.month}`{day_part}].[rx, tx] | [0]",
-        interface_traffic_data,
+    slicer = -3 if modifier == Modifiers.MONTH else len(date_obj.isoformat())
+
+    raise exc.MissingTargetDateError(
+        f"Target date {target_date} not found in traffic data. "
+        f"Latest available {modifier.value} is "
+        f"{date_obj.isoformat()[:slicer]}. "
+        "Please check if the vnstat service is running."
     )
-    if interface_traffic_data and not rx_tx:
-        latest_date: list[Optional[int]] = jm.search(
-            f"{modifier.value}[-1].date.[year, month, day]",
-            interface_traffic_data,
+
+
+def _sum_traffic(values: list[Optional[int]]) -> Optional[int]:
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
+
+
+@log
+def _get_interfaces_traffic(
+    traffic_index: dict[str, InterfaceIndex],
+    interfaces: list[str],
+    target_date: date,
+) -> dict[str, dict[str, Optional[int]]]:
+    result = {}
+    for interface in interfaces:
+        interface_traffic_data = __get_interface_traffic_data(
+            traffic_index, interface
         )
-        date_obj = (
-            date(*latest_date)
-            if latest_date[-1]
-            else utils.get_month_date_object(*latest_date[:-1])
+        day_traffic, month_traffic = (
+            __get_traffic_value(interface_traffic_data, modifier, target_date)
+            for modifier in Modifiers
         )
-        slicer = (
-            -3 if modifier == Modifiers.MONTH else len(date_obj.isoformat())
+        result[interface] = {
+            "day_traffic": day_traffic,
+            "month_traffic": month_traffic,
+        }
+    return result
+
+
+@log
+def _get_daily_traffic(
+    traffic_index: dict[str, InterfaceIndex],
+    interfaces: list[str],
+    target_date: date,
+) -> list[Optional[int]]:
+    """Gets the totals of the days of the month up to `target_date`."""
+    day_records = [
+        traffic_index[interface][Modifiers.DAY]
+        for interface in interfaces
+        if interface in traffic_index
+    ]
+    year, month = target_date.year, target_date.month
+    return [
+        _sum_traffic(
+            [records.get((year, month, day)) for records in day_records]
         )
+        for day in range(1, target_date.day + 1)
+    ]
 
-        raise exc.MissingTargetDateError(
-            f"Target date {target_date} not found in traffic data. "
-            f"Latest available {modifier.value} is "
-            f"{date_obj.isoformat()[:slicer]}. "
-            "Please check if the vnstat service is running."
+
+@log
+def _get_traffic_index(
+    start_date: date,
+    interfaces: list[str],
+    backend: Optional[str] = None,
+) -> dict[str, InterfaceIndex]:
+    if (backend := backend or settings.VNSTAT_BACKEND) == "sqlite":
+        from src import vnstat_db
+
+        return vnstat_db.get_traffic_index(start_date, interfaces)
+    if settings.VNSTAT_STREAMING:
+        vnstat_data = _get_streamed_command_result(
+            _get_command(start_date), interfaces, start_date
         )
-    return sum(rx_tx) if rx_tx else None
+    else:
+        vnstat_data = _get_command_result(_get_command(start_date))
+    with metrics.timer("jmespath_index"):
+        return _index_traffic(vnstat_data)
 
 
 @log
-def _get_traffic_in_bytes(
-    vnstat_data: dict, target_date: date
-) -> Generator[Optional[int], Optional[int]]:
-    interface_traffic_data = __get_interface_traffic_data(vnstat_data)
-    return (
-        __get_traffic_value(interface_traffic_data, modifier, target_date)
-        for modifier in Modifiers
-    )
+def _get_service_status() -> Optional[str]:
+    statuses = get_services_status(tuple(settings.SERVICE_UNITS))
+    return "\n".join(status for status in statuses.values() if status) or None
+
+
+def _get_range_traffic_data(
+    system_name: str,
+    service_status: Optional[str],
+    traffic_index: dict[str, InterfaceIndex],
+    interfaces: list[str],
+    target_dates: list[date],
+) -> list[VnStatData]:
+    results = []
+    for target_date in target_dates:
+        try:
+            interfaces_traffic = _get_interfaces_traffic(
+                traffic_index, interfaces, target_date
+            )
+        except exc.InternalError as e:
+            results.append(
+                VnStatData(
+                    system_name=system_name,
+                    service_status=service_status,
+                    stat_date=target_date,
+                    error=str(e),
+                )
+            )
+            continue
+        results.append(
+            VnStatData(
+                system_name=system_name,
+                service_status=service_status,
+                stat_date=target_date,
+                day_traffic=_sum_traffic(
+                    [t["day_traffic"] for t in interfaces_traffic.values()]
+                ),
+                month_traffic=_sum_traffic(
+                    [t["month_traffic"] for t in interfaces_traffic.values()]
+                ),
+                interfaces=interfaces_traffic,
+                daily_traffic=(
+                    _get_daily_traffic(traffic_index, interfaces, target_date)
+                    if settings.FORECAST_ENABLED
+                    else None
+                ),
+            )
+        )
+    return results
+
+
+def get_date_range(start_date: date, end_date: date) -> list[date]:
+    """Gets all the dates from `start_date` to `end_date` (inclusive)."""
+    return [
+        start_date + timedelta(days=offset)
+        for offset in range((end_date - start_date).days + 1)
+    ]
 
 
 @log
-def get_traffic_data(
-    system_name: str, target_date: date = date.today() - timedelta(days=1)
-) -> Optional[VnStatData]:
-    """Get traffic data from vnstat."""
+def get_traffic_data_range(
+    system_name: str,
+    start_date: date,
+    end_date: date,
+    *,
+    interfaces: Optional[list[str]] = None,
+) -> list[VnStatData]:
+    """
+    Get traffic data from vnstat for every date of the range (inclusive).
+
+    All the dates and interfaces are served from a single vnstat call (or a
+    single read of the vnstat database with the `sqlite` backend). The
+    day and month traffic of the returned objects are the totals over the
+    interfaces, the per-interface values are in their `interfaces` attribute.
+    With FORECAST_ENABLED the days since the start of the month are read as
+    well, for the `daily_traffic` used by the forecast.
+
+    The service status is fetched in parallel with the traffic, so the call
+    takes as long as the slower of the two.
+    """
+    interfaces = interfaces or settings.INTERFACE_NAMES
+    index_start_date = (
+        start_date.replace(day=1) if settings.FORECAST_ENABLED else start_date
+    )
+    target_dates = get_date_range(start_date, end_date)
     try:
-        service_status = get_service_status()
-        vnstat_data = _get_command_result()
-        day_traffic, month_traffic = _get_traffic_in_bytes(
-            vnstat_data, target_date
-        )
+        with ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="systemctl"
+        ) as executor:
+            status_future = executor.submit(_get_service_status)
+            traffic_index = _get_traffic_index(index_start_date, interfaces)
+            service_status = status_future.result()
     except exc.InternalError as e:
-        return VnStatData(
-            system_name=system_name,
-            service_status=None,
-            stat_date=target_date,
-            error=str(e),
-        )
+        return [
+            VnStatData(
+                system_name=system_name,
+                service_status=None,
+                stat_date=target_date,
+                error=str(e),
+            )
+            for target_date in target_dates
+        ]
+    return _get_range_traffic_data(
+        system_name, service_status, traffic_index, interfaces, target_dates
+    )
+
+
+@log
+def get_traffic_data_range_from_dump(
+    system_name: str,
+    vnstat_data: dict,
+    start_date: date,
+    end_date: date,
+    *,
+    interfaces: Optional[list[str]] = None,
+) -> list[VnStatData]:
+    """
+    Same as `get_traffic_data_range`, but for a `vnstat --json` dump.
 
-    return VnStatData(
-        system_name=system_name,
-        service_status=service_status,
-        stat_date=target_date,
-        day_traffic=day_traffic,
-        month_traffic=month_traffic,
+    Used for the dumps fetched from the remotes, which have no service
+    status.
+    """
+    interfaces = interfaces or settings.INTERFACE_NAMES
+    with metrics.timer("jmespath_index", system=system_name):
+        traffic_index = _index_traffic(vnstat_data)
+    return _get_range_traffic_data(
+        system_name,
+        None,
+        traffic_index,
+        interfaces,
+        get_date_range(start_date, end_date),
     )
 
 
+@log
+def get_traffic_data(
+    system_name: str,
+    target_date: Optional[date] = None,
+    *,
+    interfaces: Optional[list[str]] = None,
+) -> Optional[VnStatData]:
+    """Get traffic data from vnstat (of yesterday by default)."""
+    target_date = target_date or date.today() - timedelta(days=1)
+    return get_traffic_data_range(
+        system_name, target_date, target_date, interfaces=interfaces
+    )[0]
+
+
 vn_sim = VnStatData(
     system_name="local",
     service_status="Vnstat service status: active",
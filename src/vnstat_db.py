@@ -0,0 +1,70 @@
+import sqlite3
+from contextlib import closing
+from datetime import date
+from pathlib import Path
+from typing import Union
+
+from src import exceptions as exc
+from src import metrics, settings
+from src.log import log
+from src.vnstat import InterfaceIndex, Modifiers
+
+# Both the `day` and the `month` tables of the vnstat database share the
+# same layout; month rows are dated with the first day of the month.
+QUERY = (
+    "SELECT interface.name, {table}.date, {table}.rx + {table}.tx "
+    "FROM {table} JOIN interface ON interface.id = {table}.interface "
+    "WHERE interface.name IN ({placeholders}) AND {table}.date >= ? "
+    "ORDER BY interface.name, {table}.date"
+)
+
+
+def _connect(db_path: Union[str, Path]) -> sqlite3.Connection:
+    # Read-only: vnstatd keeps writing to the database while we read it.
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+@log
+def get_traffic_index(
+    start_date: date,
+    interfaces: list[str],
+    db_path: Union[str, Path, None] = None,
+) -> dict[str, InterfaceIndex]:
+    """
+    Reads the day and month traffic straight from the vnstat database.
+
+    Only the rows of the requested interfaces starting from `start_date` (or
+    its month) are queried. The result has the same shape as the index built
+    from the `vnstat --json` output.
+    """
+    db_path = db_path or settings.VNSTAT_DB_PATH
+    placeholders = ", ".join("?" for _ in interfaces)
+    start_params = {
+        Modifiers.DAY: start_date.isoformat(),
+        Modifiers.MONTH: start_date.replace(day=1).isoformat(),
+    }
+    index: dict[str, InterfaceIndex] = {}
+    try:
+        with metrics.timer("vnstat_db"), closing(
+            _connect(db_path)
+        ) as connection:
+            for modifier in Modifiers:
+                rows = connection.execute(
+                    QUERY.format(
+                        table=modifier.value, placeholders=placeholders
+                    ),
+                    (*interfaces, start_params[modifier]),
+                )
+                for name, row_date, traffic in rows:
+                    row_date = date.fromisoformat(row_date[:10])
+                    day = row_date.day if modifier == Modifiers.DAY else None
+                    records = index.setdefault(
+                        name, {modifier: {} for modifier in Modifiers}
+                    )[modifier]
+                    records[(row_date.year, row_date.month, day)] = traffic
+    except (sqlite3.Error, ValueError) as e:
+        raise exc.DatabaseError(
+            f"{settings.NO_DATA}: Failed to read the vnstat database "
+            f"{db_path}: {e}"
+        )
+    return index
@@ -1,3 +1,5 @@
 pytest_plugins = [
+    "tests.fixtures.fixture_db",
     "tests.fixtures.fixture_json",
+    "tests.fixtures.fixture_telegram",
 ]
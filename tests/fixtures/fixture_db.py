@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+# The relevant part of the vnstat 2.x database schema.
+SCHEMA = """
+CREATE TABLE info(
+    id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, value TEXT NOT NULL
+);
+CREATE TABLE interface(
+    id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, alias TEXT,
+    active INTEGER NOT NULL, created DATE NOT NULL, updated DATE NOT NULL,
+    rxcounter INTEGER NOT NULL, txcounter INTEGER NOT NULL,
+    rxtotal INTEGER NOT NULL, txtotal INTEGER NOT NULL
+);
+CREATE TABLE day(
+    id INTEGER PRIMARY KEY,
+    interface INTEGER REFERENCES interface(id) ON DELETE CASCADE,
+    date DATE NOT NULL, rx INTEGER NOT NULL, tx INTEGER NOT NULL,
+    CONSTRAINT u UNIQUE (interface, date)
+);
+CREATE TABLE month(
+    id INTEGER PRIMARY KEY,
+    interface INTEGER REFERENCES interface(id) ON DELETE CASCADE,
+    date DATE NOT NULL, rx INTEGER NOT NULL, tx INTEGER NOT NULL,
+    CONSTRAINT u UNIQUE (interface, date)
+);
+"""
+
+
+@pytest.fixture
+def vnstat_db_path(tmp_path):
+    db_path = tmp_path / "vnstat.db"
+    connection = sqlite3.connect(db_path)
+    connection.executescript(SCHEMA)
+    connection.executemany(
+        "INSERT INTO interface VALUES (?, ?, '', 1, '2024-08-20', "
+        "'2024-09-12 09:40:00', 0, 0, 0, 0)",
+        [(1, "eth0"), (2, "eth1")],
+    )
+    connection.executemany(
+        "INSERT INTO day (interface, date, rx, tx) VALUES (?, ?, ?, ?)",
+        [
+            (1, "2024-09-11", 5094408961, 3151798436),
+            (1, "2024-09-12", 1743913561, 862805062),
+            (2, "2024-09-11", 100, 200),
+        ],
+    )
+    connection.executemany(
+        "INSERT INTO month (interface, date, rx, tx) VALUES (?, ?, ?, ?)",
+        [
+            (1, "2024-08-01", 7821185928, 5401883104),
+            (1, "2024-09-01", 235356172410, 186823871278),
+            (2, "2024-09-01", 1000, 2000),
+        ],
+    )
+    connection.commit()
+    connection.close()
+    return db_path
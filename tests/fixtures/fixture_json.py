@@ -109,6 +109,16 @@ def get_month_dict(dm: DayMonth):
     }
 
 
+@pytest.fixture
+def combined_vnstat_data():
+    """The `vnstat --json a` output with both the days and the months."""
+    dm = DayMonth(date(2024, 9, 12))
+    data = get_day_dict(dm)
+    month_traffic = get_month_dict(dm)["interfaces"][0]["traffic"]["month"]
+    data["interfaces"][0]["traffic"]["month"] = month_traffic
+    return data
+
+
 @pytest.fixture(
     params=[
         (date(2024, 9, 12),),
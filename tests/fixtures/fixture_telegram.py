@@ -0,0 +1,56 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class TelegramStub:
+    """Local HTTP stub of the Telegram Bot API."""
+
+    def __init__(self):
+        self.requests = []
+        # Queued (status, body) responses; 200 once they run out.
+        self.responses = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                stub.requests.append(
+                    (self.path, json.loads(self.rfile.read(length)))
+                )
+                status, body = (
+                    stub.responses.pop(0)
+                    if stub.responses
+                    else (200, {"ok": True})
+                )
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def texts(self):
+        return [payload["text"] for _, payload in self.requests]
+
+
+@pytest.fixture
+def telegram_stub():
+    stub = TelegramStub()
+    thread = threading.Thread(target=stub.server.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+
+from src import aggregate
+from src import exceptions as exc
+from src.forecast import Forecast
+from src.vnstat import VnStatData
+
+TAGS = "edge1=region:eu;dc:fra1,edge2=region:eu;dc:ams1,edge3=region:us"
+
+
+def get_vn_obj(system_name, day, month, **kwargs):
+    return VnStatData(
+        system_name=system_name,
+        stat_date=date(2024, 9, 11),
+        day_traffic=day,
+        month_traffic=month,
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def vnstat_objects():
+    return (
+        get_vn_obj("edge1", 10, 100),
+        get_vn_obj("edge2", 20, 200),
+        get_vn_obj("edge3", 30, 300),
+        get_vn_obj("edge4", None, None, error="failed"),
+    )
+
+
+def test_parse_tags():
+    assert aggregate.parse_tags(TAGS)["edge1"] == {
+        "region": "eu",
+        "dc": "fra1",
+    }
+    with pytest.raises(exc.AggregationError):
+        aggregate.parse_tags("edge1=region")
+
+
+def test_rollups(vnstat_objects):
+    rollups = aggregate.aggregate(
+        *vnstat_objects,
+        forecasts={"edge1": Forecast("edge1", 150, 10, ())},
+        levels=["region", "dc"],
+        tags=aggregate.parse_tags(TAGS),
+    )
+    assert list(rollups) == [
+        (),
+        ("eu",),
+        ("eu", "ams1"),
+        ("eu", "fra1"),
+        ("untagged",),
+        ("untagged", "untagged"),
+        ("us",),
+        ("us", "untagged"),
+    ]
+    assert rollups[()] == aggregate.Rollup((), 4, 60, 600, 650, ("edge4",))
+    assert rollups[("eu",)] == aggregate.Rollup(("eu",), 2, 30, 300, 350, ())
+    assert rollups[("eu", "fra1")].name == "eu/fra1"
+
+
+def test_no_levels(vnstat_objects):
+    rollups = aggregate.aggregate(*vnstat_objects, levels=[], tags={})
+    assert list(rollups) == [()]
+    assert rollups[()].systems == 4
+
+
+def test_partial(vnstat_objects):
+    objs = (
+        vnstat_objects[0].replace(daily_traffic=[1, 2, None]),
+        vnstat_objects[1].replace(daily_traffic=[3, None]),
+        *vnstat_objects[2:],
+    )
+    partial = aggregate.get_partial(*objs, system_name="eu")
+    assert partial.system_name == "eu"
+    assert (partial.day_traffic, partial.month_traffic) == (60, 600)
+    assert partial.daily_traffic == (4, 2, None)
+    assert partial.error is None
+    assert partial.service_status == (
+        "Aggregated from 4 systems (failed: edge4)"
+    )
+
+
+def test_partial_fails_if_all_systems_failed(vnstat_objects):
+    partial = aggregate.get_partial(vnstat_objects[3], system_name="eu")
+    assert partial.error
+    assert partial.day_traffic is None
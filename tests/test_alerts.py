@@ -0,0 +1,75 @@
+from src import exceptions as exc
+from src.alerts import AlertAggregator
+
+
+def test_fingerprint_ignores_numbers():
+    first = exc.SSHError("Failed to SSH to 10.0.0.1: timeout")
+    second = exc.SSHError("Failed to SSH to 10.0.0.2: timeout")
+    other = exc.SCPError("Failed to SSH to 10.0.0.1: timeout")
+    assert AlertAggregator.fingerprint(first) == (
+        AlertAggregator.fingerprint(second)
+    )
+    assert AlertAggregator.fingerprint(first) != (
+        AlertAggregator.fingerprint(other)
+    )
+
+
+def test_flush_sends_one_digest_with_counts(tmp_path):
+    aggregator = AlertAggregator(state_file=tmp_path / "alerts.json")
+    for host in range(5):
+        aggregator.add(exc.SSHError(f"Failed to SSH to 10.0.0.{host}"))
+    aggregator.add(exc.TelegramError("<oops>"))
+    sent = []
+    aggregator.flush(sent.append)
+    assert len(sent) == 1
+    assert "(6)" in sent[0]
+    assert "5× SSHError: Failed to SSH to 10.0.0.0" in sent[0]
+    assert "&lt;oops&gt;" in sent[0]
+
+    aggregator.flush(sent.append)
+    assert len(sent) == 1
+
+
+def test_repeats_within_window_are_suppressed(tmp_path):
+    state_file = tmp_path / "alerts.json"
+    sent = []
+    first_run = AlertAggregator(state_file=state_file)
+    first_run.add(exc.SSHError("down"))
+    first_run.flush(sent.append)
+
+    second_run = AlertAggregator(state_file=state_file)
+    second_run.add(exc.SSHError("down"))
+    second_run.flush(sent.append)
+    assert len(sent) == 1
+
+    second_run.add(exc.SSHError("down"))
+    second_run.add(exc.SCPError("new"))
+    second_run.flush(sent.append)
+    assert len(sent) == 2
+    assert "SCPError: new" in sent[1]
+    assert "SSHError" not in sent[1].split("\n\n")[0]
+    assert "1 repeated alert(s) suppressed" in sent[1]
+
+
+def test_failed_digest_is_not_suppressed(tmp_path):
+    aggregator = AlertAggregator(state_file=tmp_path / "alerts.json")
+
+    def failing_send(digest):
+        raise exc.TelegramError("unreachable")
+
+    aggregator.add(exc.SSHError("down"))
+    aggregator.flush(failing_send)
+
+    sent = []
+    aggregator.add(exc.SSHError("down"))
+    aggregator.flush(sent.append)
+    assert len(sent) == 1
+
+
+def test_expired_window_sends_again(tmp_path):
+    aggregator = AlertAggregator(window=0, state_file=tmp_path / "a.json")
+    sent = []
+    for _ in range(2):
+        aggregator.add(exc.SSHError("down"))
+        aggregator.flush(sent.append)
+    assert len(sent) == 2
@@ -0,0 +1,79 @@
+import json
+from datetime import date
+from unittest.mock import MagicMock
+
+from src import backfill, ssh
+from src.ssh import Remote
+from src.vnstat import VnStatData
+
+
+def get_fake_pool(output: str, returncode: int = 0):
+    client = MagicMock()
+    stdout = MagicMock()
+    stdout.read.return_value = output.encode()
+    stdout.channel.recv_exit_status.return_value = returncode
+    stderr = MagicMock()
+    stderr.read.return_value = b"vnstat: command not found"
+    client.exec_command.return_value = (None, stdout, stderr)
+    pool = MagicMock()
+    pool.get.return_value = client
+    return pool, client
+
+
+def test_get_report_dates_monthly():
+    dates = backfill.get_report_dates(
+        date(2024, 8, 30), date(2024, 9, 12), monthly=True
+    )
+    assert dates == [date(2024, 8, 31), date(2024, 9, 12)]
+    dates = backfill.get_report_dates(date(2024, 8, 30), date(2024, 9, 1))
+    assert len(dates) == 3
+
+
+def test_remote_range_runs_vnstat_once(combined_vnstat_data):
+    pool, client = get_fake_pool(json.dumps(combined_vnstat_data))
+    results = ssh.get_remote_vnstat_data_range(
+        Remote("edge1", "10.0.0.1"),
+        date(2024, 9, 11),
+        date(2024, 9, 12),
+        interfaces=["eth0"],
+        connection_pool=pool,
+    )
+    client.exec_command.assert_called_once()
+    assert client.exec_command.call_args.args[0].startswith("vnstat --json a")
+    assert [vn.stat_date for vn in results] == [
+        date(2024, 9, 11),
+        date(2024, 9, 12),
+    ]
+    assert all(vn.system_name == "edge1" and not vn.error for vn in results)
+    assert results[0].day_traffic == 5094408961 + 3151798436
+
+
+def test_remote_range_failure_covers_all_dates():
+    pool, _ = get_fake_pool("", returncode=127)
+    results = ssh.get_remote_vnstat_data_range(
+        Remote("edge1", "10.0.0.1"),
+        date(2024, 9, 10),
+        date(2024, 9, 12),
+        connection_pool=pool,
+    )
+    assert len(results) == 3
+    assert all("command not found" in vn.error for vn in results)
+
+
+def test_collect_and_save(mocker, tmp_path):
+    dates = [date(2024, 9, 11), date(2024, 9, 12)]
+    local = [VnStatData(system_name="local", stat_date=d) for d in dates]
+    remote = [VnStatData(system_name="edge1", stat_date=d) for d in dates]
+    mocker.patch.object(
+        backfill.vnstat, "get_traffic_data_range", return_value=local
+    )
+    mocker.patch.object(
+        ssh, "get_all_remote_vnstat_data_range", return_value=[remote]
+    )
+    data = backfill.collect(*dates)
+    assert data[dates[1]] == [local[1], remote[1]]
+
+    paths = backfill.save_to_files(data, dates, tmp_path)
+    assert len(paths) == 4
+    saved = (tmp_path / "edge1_2024-09-12.json").read_text()
+    assert VnStatData.from_json(saved) == remote[1]
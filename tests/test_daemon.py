@@ -0,0 +1,90 @@
+import importlib
+import os
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from src import history, settings, ssh
+from src.daemon import Job, Scheduler, reload_settings
+from src.vnstat import VnStatData
+
+
+def test_job_daily_next_run():
+    job = Job("daily", lambda: None, at=time(8, 0))
+    assert job.get_next_run(datetime(2024, 9, 12, 7, 0)) == datetime(
+        2024, 9, 12, 8, 0
+    )
+    assert job.get_next_run(datetime(2024, 9, 12, 8, 0)) == datetime(
+        2024, 9, 13, 8, 0
+    )
+
+
+def test_job_requires_single_trigger():
+    with pytest.raises(ValueError):
+        Job("bad", lambda: None)
+
+
+def test_scheduler_runs_jobs_until_stopped():
+    scheduler = Scheduler()
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 3:
+            scheduler.stop()
+
+    scheduler.add(Job("fast", func, interval=timedelta(milliseconds=10)))
+    scheduler.run()
+    assert len(calls) == 3
+
+
+def test_scheduler_survives_failing_job(mocker):
+    mocker.patch("src.daemon.exc.handle_exception")
+    scheduler = Scheduler()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        if len(calls) == 2:
+            scheduler.stop()
+        raise RuntimeError("boom")
+
+    scheduler.add(Job("failing", failing, interval=timedelta(0)))
+    scheduler.run()
+    assert len(calls) == 2
+
+
+def test_scheduler_reload():
+    scheduler = Scheduler()
+    reloaded = []
+    scheduler.reload()
+    scheduler.add(Job("stop", scheduler.stop, interval=timedelta(0)))
+    scheduler.run(lambda: reloaded.append(1))
+    assert reloaded == [1]
+
+
+@pytest.fixture
+def environ():
+    saved = dict(os.environ)
+    yield os.environ
+    os.environ.clear()
+    os.environ.update(saved)
+    importlib.reload(settings)
+
+
+def test_reload_settings_applies_new_values(mocker, tmp_path, environ):
+    environ["SSH_TIMEOUT"] = "5"
+    environ["HISTORY_DB_PATH"] = str(tmp_path / "reloaded.db")
+    old_pool = ssh.pool
+    reload_settings(Scheduler())
+    assert ssh.pool is not old_pool
+
+    client = mocker.patch.object(ssh.paramiko, "SSHClient").return_value
+    mocker.patch.object(ssh, "_load_private_key")
+    ssh._connect_to_ssh("host", 22, "user", "key")
+    assert client.connect.call_args.kwargs["timeout"] == 5
+
+    history.record(
+        VnStatData(system_name="local", stat_date=date(2024, 9, 11))
+    )
+    assert (tmp_path / "reloaded.db").exists()
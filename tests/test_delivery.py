@@ -0,0 +1,134 @@
+import re
+
+import pytest
+
+from src import exceptions as exc
+from src.delivery import TelegramDelivery, split_message
+
+
+@pytest.fixture
+def make_delivery(telegram_stub, tmp_path):
+    def factory(chat_ids=("1",), **kwargs):
+        return TelegramDelivery(
+            "token",
+            list(chat_ids),
+            api_url=telegram_stub.url,
+            spool_dir=tmp_path / "spool",
+            backoff=0,
+            chat_interval=0,
+            **kwargs,
+        )
+
+    return factory
+
+
+def test_split_message_at_section_boundaries():
+    section = "a" * 30 + "\n\n====================\n\n"
+    message = section * 5
+    chunks = split_message(message, limit=len(section) * 2)
+    assert "".join(chunks) == message
+    assert chunks == [section * 2, section * 2, section]
+
+
+def test_split_message_falls_back_to_lines_and_characters():
+    message = "line\n" * 10 + "x" * 25
+    chunks = split_message(message, limit=10)
+    assert "".join(chunks) == message
+    assert all(len(chunk) <= 10 for chunk in chunks)
+
+
+def test_split_message_keeps_html_tags_intact():
+    message = '<b>bold</b> &lt;<a href="https://example.com">link</a>&gt; ' * 8
+    chunks = split_message(message, limit=50, parse_mode="HTML")
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk) <= 50
+        # No tag or entity is cut and every opened tag is closed.
+        assert "<" not in re.sub(r"<[^<>]+>", "", chunk)
+        assert not re.search(r"&(?!lt;|gt;)", chunk)
+        assert chunk.count("<b>") == chunk.count("</b>")
+        assert chunk.count("<a ") == chunk.count("</a>")
+    text = re.sub(r"<[^<>]+>", "", "".join(chunks))
+    assert text == re.sub(r"<[^<>]+>", "", message)
+
+
+def test_split_message_reopens_multi_line_html_tags():
+    rows = "\n".join(f"row {index:02}" for index in range(20))
+    message = f"<b>Table</b>\n<pre>{rows}</pre>\nafter"
+    chunks = split_message(message, limit=40, parse_mode="HTML")
+    assert len(chunks) > 2
+    for chunk in chunks:
+        assert len(chunk) <= 40
+        assert chunk.count("<pre>") == chunk.count("</pre>")
+    # Only the line breaks are used as split points.
+    assert all(chunk.endswith(("\n", "</pre>")) for chunk in chunks[:-1])
+    text = re.sub(r"<[^<>]+>", "", "".join(chunks))
+    assert text == re.sub(r"<[^<>]+>", "", message)
+
+
+def test_send_to_multiple_chats(telegram_stub, make_delivery):
+    make_delivery(chat_ids=("1", "2")).send("hello")
+    assert [payload["chat_id"] for _, payload in telegram_stub.requests] == [
+        "1",
+        "2",
+    ]
+    assert telegram_stub.requests[0][0] == "/bottoken/sendMessage"
+
+
+def test_send_respects_retry_after(telegram_stub, make_delivery, mocker):
+    sleep = mocker.patch("src.delivery.time.sleep")
+    telegram_stub.responses = [
+        (429, {"ok": False, "parameters": {"retry_after": 3}}),
+        (500, {"ok": False}),
+    ]
+    make_delivery().send("hello")
+    assert telegram_stub.texts == ["hello"] * 3
+    sleep.assert_any_call(3)
+
+
+def test_send_does_not_retry_rejected_messages(telegram_stub, make_delivery):
+    telegram_stub.responses = [(400, {"ok": False})]
+    delivery = make_delivery()
+    with pytest.raises(exc.TelegramError, match="rejected"):
+        delivery.send("bad")
+    assert len(telegram_stub.requests) == 1
+    assert not list(delivery.spool_dir.glob("*.json"))
+
+
+def test_failed_messages_are_spooled_and_replayed(
+    telegram_stub, make_delivery
+):
+    telegram_stub.responses = [(502, {"ok": False})] * 2
+    delivery = make_delivery(max_retries=1)
+    with pytest.raises(exc.TelegramError):
+        delivery.send("first")
+    assert len(list(delivery.spool_dir.glob("*.json"))) == 1
+
+    delivery.send("second")
+    assert telegram_stub.texts[-2:] == ["first", "second"]
+    assert not list(delivery.spool_dir.glob("*.json"))
+
+
+def test_corrupted_spool_files_are_set_aside(telegram_stub, make_delivery):
+    delivery = make_delivery()
+    delivery.spool_dir.mkdir()
+    (delivery.spool_dir / "1-truncated.json").write_text('{"chat_id": "1", ')
+    delivery._spool("1", "spooled", None)
+
+    delivery.send("new")
+    assert telegram_stub.texts == ["spooled", "new"]
+    assert not list(delivery.spool_dir.glob("*.json"))
+    assert [path.name for path in delivery.spool_dir.iterdir()] == [
+        "1-truncated.bad"
+    ]
+
+
+def test_no_backoff_after_the_last_attempt(
+    telegram_stub, make_delivery, mocker
+):
+    sleep = mocker.patch("src.delivery.time.sleep")
+    telegram_stub.responses = [(502, {"ok": False})] * 3
+    with pytest.raises(exc.TelegramError):
+        make_delivery(max_retries=2).send("hello")
+    assert len(telegram_stub.requests) == 3
+    assert sleep.call_count == 2
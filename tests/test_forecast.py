@@ -0,0 +1,59 @@
+from datetime import date
+
+from src import forecast
+from src.vnstat import VnStatData
+
+GB = 1024**3
+
+
+def get_vn_obj(daily_gb, system_name="edge1"):
+    daily_traffic = [None if gb is None else gb * GB for gb in daily_gb]
+    return VnStatData(
+        system_name=system_name,
+        stat_date=date(2024, 9, len(daily_traffic)),
+        day_traffic=daily_traffic[-1],
+        month_traffic=sum(t for t in daily_traffic if t is not None),
+        daily_traffic=daily_traffic,
+    )
+
+
+def test_flat_usage_is_extrapolated():
+    result = forecast.get_forecast(get_vn_obj([10] * 10), window=7)
+    assert result.month_traffic == 300 * GB
+    assert result.daily_average == 10 * GB
+    assert result.anomalous_days == ()
+
+
+def test_trend_is_extended():
+    # +1 GB a day: the rest of September (days 11-30) adds 11 + ... + 30 GB.
+    result = forecast.get_forecast(get_vn_obj(range(1, 11)), window=7)
+    assert result.month_traffic == sum(range(1, 31)) * GB
+
+
+def test_partial_day_is_projected():
+    # Today (10 September) is not over: its 4 GB so far are not counted, and
+    # it is projected like the 20 days to come.
+    vn_obj = get_vn_obj([10] * 9 + [4])
+    result = forecast.get_forecast(vn_obj, window=7, today=date(2024, 9, 10))
+    assert result.month_traffic == 300 * GB
+    assert result.daily_average == 10 * GB
+
+
+def test_anomalous_days_are_flagged():
+    daily_gb = [10, 11, 10, 9, 10, 11, 80, 10, 10, None, 11]
+    result = forecast.get_forecast(get_vn_obj(daily_gb), window=7)
+    assert result.anomalous_days == (date(2024, 9, 7),)
+
+
+def test_no_forecast_without_daily_traffic():
+    vn_obj = get_vn_obj([10] * 5).replace(daily_traffic=None)
+    assert forecast.get_forecast(vn_obj) is None
+
+
+def test_get_forecasts_by_system():
+    forecasts = forecast.get_forecasts(
+        get_vn_obj([10] * 10, "edge1"),
+        get_vn_obj([20] * 10, "edge2").replace(error="failed"),
+    )
+    assert forecasts["edge1"].month_traffic == 300 * GB
+    assert forecasts["edge2"] is None
@@ -0,0 +1,58 @@
+from datetime import date
+
+from src import history
+from src.vnstat import VnStatData
+
+
+def _snapshot(system_name, stat_date, day_traffic, **kwargs):
+    return VnStatData(
+        system_name=system_name,
+        stat_date=stat_date,
+        day_traffic=day_traffic,
+        month_traffic=day_traffic * 10,
+        **kwargs,
+    )
+
+
+def test_record_and_get_snapshots(tmp_path):
+    db_path = tmp_path / "history.db"
+    interfaces = {
+        "eth0": {"day_traffic": 1, "month_traffic": 10},
+        "eth1": {"day_traffic": 2, "month_traffic": 20},
+    }
+    history.record(
+        _snapshot("local", date(2024, 9, 11), 3, interfaces=interfaces),
+        _snapshot("remote", date(2024, 9, 11), 5),
+        db_path=db_path,
+    )
+    history.record(
+        _snapshot("remote", date(2024, 9, 11), 0, error="late"),
+        _snapshot("failing", date(2024, 9, 11), 0, error="down"),
+        db_path=db_path,
+    )
+
+    snapshots = history.get_snapshots(date(2024, 9, 11), db_path=db_path)
+    by_name = {vn.system_name: vn for vn in snapshots}
+    assert by_name["local"].day_traffic == 3
+    assert by_name["local"].interfaces == interfaces
+    # A later error does not hide the earlier good snapshot.
+    assert by_name["remote"].day_traffic == 5
+    assert by_name["remote"].error is None
+    assert by_name["failing"].error == "down"
+
+
+def test_get_daily_series(tmp_path):
+    db_path = tmp_path / "history.db"
+    history.record(
+        *(_snapshot("local", date(2024, 9, day), day) for day in (1, 2, 3)),
+        _snapshot("other", date(2024, 9, 2), 100),
+        db_path=db_path,
+    )
+    history.record(
+        _snapshot("local", date(2024, 9, 3), 0, error="unreachable"),
+        db_path=db_path,
+    )
+    series = history.get_daily_series(
+        "local", date(2024, 9, 2), date(2024, 9, 30), db_path=db_path
+    )
+    assert series == [(date(2024, 9, 2), 2, 20), (date(2024, 9, 3), 3, 30)]
@@ -0,0 +1,47 @@
+import logging
+
+from src.log import configure_logging, log
+
+
+class ReprCounter:
+    calls = 0
+
+    def __repr__(self):
+        ReprCounter.calls += 1
+        return "ReprCounter()"
+
+
+def test_configure_logging_adds_handler_once():
+    first = configure_logging("tests.log.once")
+    second = configure_logging("tests.log.once")
+    assert first is second
+    assert len(second.handlers) == 1
+
+
+def test_log_formats_args_only_when_debug_enabled():
+    logger = configure_logging("tests.log.lazy", level=logging.INFO)
+
+    @log(my_logger=logger)
+    def identity(value):
+        return value
+
+    ReprCounter.calls = 0
+    identity(ReprCounter())
+    assert ReprCounter.calls == 0
+
+    logger.setLevel(logging.DEBUG)
+    identity(ReprCounter())
+    configure_logging("tests.log.lazy").handlers[0].flush()
+    assert ReprCounter.calls > 0
+
+
+def test_log_does_not_add_handlers_per_call():
+    @log
+    def noop():
+        return None
+
+    logger = logging.getLogger(noop.__module__)
+    handlers = len(logger.handlers)
+    for _ in range(3):
+        noop()
+    assert len(logger.handlers) == handlers == 1
@@ -0,0 +1,73 @@
+import subprocess
+import sys
+import time
+from datetime import date
+
+from src import settings
+from src.vnstat import VnStatData
+
+
+def test_main_does_not_import_heavy_dependencies():
+    code = (
+        "import sys, src.main; "
+        "print(sorted({'paramiko', 'scp', 'requests'} & set(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=settings.BASE_DIR,
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_remote_fetch_overlaps_local_collection(mocker):
+    from src import main
+
+    def slow(result):
+        def func(*args):
+            time.sleep(0.3)
+            return result
+
+        return func
+
+    mocker.patch.object(
+        main, "get_local_vnstat_data", side_effect=slow("local")
+    )
+    mocker.patch.object(
+        main, "get_remote_vnstat_data", side_effect=slow(["remote"])
+    )
+    start = time.perf_counter()
+    assert main.collect_vnstat_data() == ("local", ["remote"])
+    assert time.perf_counter() - start < 0.5
+    assert main.collect_vnstat_data(no_collect=True) == ("local", [])
+
+
+def test_unchanged_snapshot_is_not_saved_again(mocker, tmp_path):
+    from src import main
+
+    def snapshot(day_traffic):
+        return VnStatData(
+            system_name="local",
+            stat_date=date(2024, 9, 11),
+            day_traffic=day_traffic,
+        )
+
+    saved_file = tmp_path / "vnstat_remote.json"
+    mocker.patch.object(settings, "LOCAL_JSON_FILE_NAME", saved_file)
+    local = mocker.patch.object(
+        main, "get_local_vnstat_data", return_value=snapshot(1)
+    )
+    save_data_to_history = mocker.patch.object(main, "save_data_to_history")
+    mocker.patch.object(main, "export_metrics")
+
+    main.run_report(save_to_file=True)
+    main.run_report(save_to_file=True)
+    assert save_data_to_history.call_count == 1
+    assert VnStatData.from_json(saved_file.read_text()).day_traffic == 1
+
+    local.return_value = snapshot(2)
+    main.run_report(save_to_file=True)
+    assert save_data_to_history.call_count == 2
+    assert VnStatData.from_json(saved_file.read_text()).day_traffic == 2
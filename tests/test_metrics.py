@@ -0,0 +1,73 @@
+import urllib.request
+from datetime import date
+
+import pytest
+
+from src import metrics
+from src.vnstat import VnStatData
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+
+def test_traffic_gauges(registry):
+    registry.set_traffic(
+        VnStatData(
+            system_name="edge1",
+            stat_date=date(2024, 9, 11),
+            day_traffic=30,
+            month_traffic=300,
+            interfaces={
+                "eth0": {"day_traffic": 10, "month_traffic": 100},
+                "eth1": {"day_traffic": 20, "month_traffic": 200},
+            },
+        ),
+        VnStatData(
+            system_name="edge2", stat_date=date(2024, 9, 11), error="failed"
+        ),
+    )
+    text = registry.render()
+    assert "# TYPE vnstat_day_traffic_bytes gauge" in text
+    assert (
+        'vnstat_day_traffic_bytes{interface="eth1",system="edge1"} 20' in text
+    )
+    assert (
+        'vnstat_month_traffic_bytes{interface="eth0",system="edge1"} 100'
+        in text
+    )
+    assert 'vnstat_snapshot_error{system="edge2"} 1' in text
+
+
+def test_timer_records_failures(registry):
+    with pytest.raises(RuntimeError):
+        with registry.timer("ssh_connect", system="edge1"):
+            raise RuntimeError
+    with registry.timer("ssh_connect", system="edge1"):
+        pass
+    text = registry.render()
+    assert (
+        'vnstat_collector_duration_seconds_count{stage="ssh_connect",'
+        'system="edge1"} 2'
+    ) in text
+    assert "vnstat_collector_last_duration_seconds{" in text
+
+
+def test_write_textfile(registry, tmp_path):
+    registry.set_gauge("vnstat_snapshot_error", 0, system="local")
+    path = registry.write_textfile(tmp_path / "vnstat.prom")
+    assert path.read_text() == registry.render()
+
+
+def test_http_endpoint(registry):
+    registry.set_gauge("vnstat_snapshot_error", 0, system="local")
+    server = metrics.start_server(
+        host="127.0.0.1", port=0, metrics_registry=registry
+    )
+    try:
+        url = "http://{}:{}/metrics".format(*server.server_address)
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.read().decode() == registry.render()
+    finally:
+        server.shutdown()
@@ -0,0 +1,36 @@
+import pstats
+
+from src import metrics, profiling
+
+
+def test_stages_are_summarized():
+    with profiling.profile_run("report") as summary:
+        with metrics.timer("remote_collection"):
+            with metrics.timer("ssh_connect", system="edge1"):
+                pass
+        with metrics.timer("ssh_connect", system="edge1"):
+            pass
+    assert summary["run"] == "report"
+    assert summary["total"] >= summary["stages"]["remote_collection"]["total"]
+    assert summary["stages"]["ssh_connect[system=edge1]"]["count"] == 2
+    assert list(summary["stages"])[0] == "remote_collection"
+
+
+def test_run_profile_is_reset():
+    with metrics.timer("message"):
+        pass
+    with profiling.profile_run("report") as summary:
+        pass
+    assert summary["stages"] == {}
+
+
+def test_cprofile_and_tracemalloc(tmp_path):
+    cprofile_path = tmp_path / "run.prof"
+    with profiling.profile_run(
+        "report", cprofile_path=cprofile_path, trace_memory=True
+    ) as summary:
+        data = [bytes(1024) for _ in range(100)]
+    assert data
+    assert pstats.Stats(str(cprofile_path)).total_calls > 0
+    assert summary["memory"]["peak"] >= 100 * 1024
+    assert summary["memory"]["top"]
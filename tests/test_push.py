@@ -0,0 +1,100 @@
+import socket
+import threading
+import time
+from datetime import date
+
+import pytest
+import requests
+
+from src import exceptions as exc
+from src import history, push
+from src.vnstat import VnStatData
+
+
+@pytest.fixture
+def receiver(tmp_path):
+    server = push.make_server(
+        host="127.0.0.1",
+        port=0,
+        secret="secret",
+        history_db_path=tmp_path / "history.db",
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_port}/snapshots"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _snapshot(system_name):
+    return VnStatData(
+        system_name=system_name,
+        stat_date=date(2024, 9, 11),
+        day_traffic=1,
+        month_traffic=2,
+    )
+
+
+def test_verify_rejects_stale_and_tampered_requests():
+    timestamp = str(time.time())
+    signature = push.sign(b"body", timestamp, "secret")
+    assert push.verify(b"body", timestamp, signature, "secret")
+    assert not push.verify(b"other", timestamp, signature, "secret")
+    assert not push.verify(b"body", timestamp, signature, "wrong")
+    stale = str(time.time() - 3600)
+    assert not push.verify(
+        b"body", stale, push.sign(b"body", stale, "secret"), "secret"
+    )
+
+
+def test_pushed_snapshots_are_recorded(receiver):
+    threads = [
+        threading.Thread(
+            target=push.push_snapshot,
+            args=(_snapshot(f"edge{index}"), receiver.url, "secret"),
+        )
+        for index in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshots = history.get_snapshots(
+        date(2024, 9, 11), db_path=receiver.history_db_path
+    )
+    assert sorted(vn.system_name for vn in snapshots) == [
+        f"edge{index}" for index in range(5)
+    ]
+
+
+def test_unsigned_snapshots_are_rejected(receiver):
+    response = requests.post(
+        receiver.url, data=_snapshot("edge").to_bytes(), timeout=5
+    )
+    assert response.status_code == 401
+    with pytest.raises(exc.PushError):
+        push.push_snapshot(_snapshot("edge"), receiver.url, "wrong")
+
+
+def test_negative_content_length_is_rejected(receiver):
+    with socket.create_connection(receiver.server_address, timeout=5) as sock:
+        sock.sendall(
+            b"POST /snapshots HTTP/1.1\r\n"
+            b"Host: localhost\r\n"
+            b"Content-Length: -1\r\n\r\n"
+        )
+        assert sock.recv(1024).startswith(b"HTTP/1.0 400")
+
+
+def test_get_pushed_vnstat_data_reports_missing_systems(receiver, mocker):
+    push.push_snapshot(_snapshot("edge1"), receiver.url, "secret")
+    mocker.patch.object(
+        push.settings, "PUSH_EXPECTED_SYSTEMS", ["edge1", "edge2"]
+    )
+    result = push.get_pushed_vnstat_data(
+        date(2024, 9, 11), receiver.history_db_path
+    )
+    assert result[0].day_traffic == 1
+    assert result[1].system_name == "edge2"
+    assert "No snapshot" in result[1].error
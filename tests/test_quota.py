@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+
+from src import exceptions as exc
+from src import quota
+from src.vnstat import VnStatData
+
+GB = quota.GB
+
+
+def get_vn_obj(day_gb, month_gb, stat_date=date(2024, 9, 10)):
+    return VnStatData(
+        system_name="edge1",
+        service_status=None,
+        stat_date=stat_date,
+        day_traffic=day_gb * GB,
+        month_traffic=month_gb * GB,
+        interfaces={
+            "eth0": {
+                "day_traffic": day_gb * GB,
+                "month_traffic": month_gb * GB,
+            }
+        },
+    )
+
+
+def test_parse_rule():
+    rule = quota.parse_rule("edge1/eth0:month=80%@1000")
+    assert rule.system_name == "edge1"
+    assert rule.interface == "eth0"
+    assert rule.period == "month"
+    assert rule.limit == 800 * GB
+
+
+def test_parse_rule_invalid():
+    with pytest.raises(exc.QuotaRuleError):
+        quota.parse_rule("edge1:week=10")
+
+
+def test_projected_usage():
+    rule = quota.parse_rule("*:projected=1000")
+    # 300 GB in 10 days of September -> 900 GB by the end of the month.
+    assert quota._get_usage(rule, get_vn_obj(30, 300)) == 900 * GB
+
+
+def test_projected_usage_of_today():
+    rule = quota.parse_rule("*:projected=1000")
+    today = date(2024, 9, 10)
+    # 270 GB in the 9 complete days, 3 GB so far today: 20 days to come.
+    assert quota._get_usage(rule, get_vn_obj(3, 273), today) == 873 * GB
+    # Nothing to extrapolate from on the first day of the month.
+    first_day = get_vn_obj(3, 3, stat_date=date(2024, 9, 1))
+    assert quota._get_usage(rule, first_day, date(2024, 9, 1)) is None
+
+
+def test_alert_only_on_crossing(tmp_path):
+    tracker = quota.QuotaTracker(tmp_path / "quota.json")
+    rules = quota.get_rules("edge1:month=500,*:day=100")
+
+    assert tracker.evaluate(rules, get_vn_obj(20, 400)) == []
+    alerts = tracker.evaluate(rules, get_vn_obj(30, 510))
+    assert len(alerts) == 1
+    assert "crossed the quota of 500 GB (edge1:month=500)" in alerts[0]
+    assert tracker.evaluate(rules, get_vn_obj(40, 520)) == []
+
+    # The state survives between the runs.
+    tracker = quota.QuotaTracker(tmp_path / "quota.json")
+    assert tracker.evaluate(rules, get_vn_obj(50, 530)) == []
+    # A new month starts below the quota.
+    next_month = get_vn_obj(10, 600, stat_date=date(2024, 10, 1))
+    assert len(tracker.evaluate(rules, next_month)) == 1
+
+
+def test_unknown_interface_is_skipped(tmp_path):
+    tracker = quota.QuotaTracker(tmp_path / "quota.json")
+    rules = quota.get_rules("edge1/eth9:day=1")
+    assert tracker.evaluate(rules, get_vn_obj(30, 300)) == []
@@ -0,0 +1,147 @@
+import json
+from datetime import date
+
+import pytest
+
+from src import exceptions as exc
+from src import render, settings
+from src.vnstat import VnStatData
+
+GB = 1024**3
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    monkeypatch.setattr(settings, "FORECAST_ENABLED", False)
+    return render.Renderer(cache_size=16)
+
+
+@pytest.fixture
+def vnstat_objects():
+    return (
+        VnStatData(
+            system_name="local",
+            service_status="Service <b>active</b>",
+            stat_date=date(2024, 9, 11),
+            day_traffic=int(1.5 * GB),
+            month_traffic=20 * GB,
+            interfaces={
+                "eth0": {"day_traffic": GB, "month_traffic": 15 * GB},
+                "wg0": {"day_traffic": GB // 2, "month_traffic": None},
+            },
+        ),
+        VnStatData(
+            system_name="edge1", stat_date=date(2024, 9, 11), error="failed"
+        ),
+    )
+
+
+def test_html(renderer, vnstat_objects):
+    assert renderer.render(*vnstat_objects, fmt="html") == (
+        "<b>LOCAL</b>:\n\nService <b>active</b>\n\n"
+        "Yesterday, Wednesday, 11 September 2024:\n<b>1.5</b> GB"
+        "\n  eth0: 1 GB\n  wg0: 0.5 GB\n\n"
+        "Cumulative for September 2024:\n<b>20</b> GB"
+        "\n  eth0: 15 GB\n  wg0: No data"
+        "\n\n====================\n\n"
+        "<b>EDGE1</b>:\n\n"
+        "Yesterday, Wednesday, 11 September 2024:\nNo data\n\n"
+        "Cumulative for September 2024:\nNo data"
+        "\n\n<b>Error</b>: failed"
+        "\n\n====================\n\n"
+        "<b>TOTAL FOR ALL SERVICES</b>:\n"
+        "Yesterday: <b>1.5</b> GB\nCumulative: <b>20</b> GB\n\n"
+    )
+
+
+def test_markdown_is_escaped(renderer, vnstat_objects):
+    message = renderer.render(*vnstat_objects, fmt="markdown")
+    assert message.startswith("*LOCAL*:\n\nService *active*\n\n")
+    assert "*1\\.5* GB" in message
+    assert "\\=\\=\\=" in message
+
+
+def test_text_has_no_markup(renderer, vnstat_objects):
+    message = renderer.render(*vnstat_objects, day_label=None, fmt="text")
+    assert message.startswith(
+        "LOCAL:\n\nService active\n\nWednesday, 11 September 2024:\n1.5 GB"
+    )
+    assert message.endswith(
+        "TOTAL FOR ALL SERVICES:\nDay: 1.5 GB\nCumulative: 20 GB\n\n"
+    )
+
+
+def test_json(renderer, vnstat_objects):
+    summary = json.loads(renderer.render(*vnstat_objects, fmt="json"))
+    assert [system["system_name"] for system in summary["systems"]] == [
+        "local",
+        "edge1",
+    ]
+    assert summary["total"] == {
+        "day_traffic": int(1.5 * GB),
+        "month_traffic": 20 * GB,
+        "forecast_traffic": None,
+    }
+
+
+def test_unchanged_report_is_not_rendered_again(
+    monkeypatch, renderer, vnstat_objects
+):
+    calls = []
+    get_system_segments = render.get_system_segments
+
+    def counting_get_system_segments(vn_obj, *args):
+        calls.append(vn_obj.system_name)
+        return get_system_segments(vn_obj, *args)
+
+    monkeypatch.setattr(
+        render, "get_system_segments", counting_get_system_segments
+    )
+    first = renderer.render(*vnstat_objects, fmt="html")
+    assert renderer.render(*vnstat_objects, fmt="html") == first
+    assert calls == ["local", "edge1"]
+
+    # Only the section of the changed system is rendered.
+    changed = vnstat_objects[1].replace(error=None, day_traffic=GB)
+    renderer.render(vnstat_objects[0], changed, fmt="html")
+    assert calls == ["local", "edge1", "edge1"]
+
+
+def test_cache_is_bounded(vnstat_objects):
+    renderer = render.Renderer(cache_size=2)
+    for day_label in ("Today", "Yesterday", "Day"):
+        renderer.render_system(vnstat_objects[0], day_label=day_label)
+    assert len(renderer._cache) == 2
+
+
+def test_markup():
+    assert render.render_markup("<b>EDGE1</b>: 1.5", "markdown") == (
+        "*EDGE1*: 1\\.5"
+    )
+    assert render.render_markup("<b>EDGE1</b>: a &lt; b", "text") == (
+        "EDGE1: a < b"
+    )
+
+
+def test_unknown_format():
+    with pytest.raises(exc.ReportFormatError):
+        render.get_format("pdf")
+
+
+def test_groups(monkeypatch, renderer, vnstat_objects):
+    monkeypatch.setattr(settings, "SYSTEM_TAGS", "local=region:eu")
+    monkeypatch.setattr(settings, "AGGREGATION_LEVELS", ["region"])
+    message = renderer.render(*vnstat_objects, fmt="text")
+    assert message.endswith(
+        "TOTAL BY REGION:\n"
+        "eu (1): yesterday 1.5 GB, cumulative 20 GB\n"
+        "untagged (1): yesterday No data, cumulative No data, "
+        "failed: edge1\n\n"
+        "TOTAL FOR ALL SERVICES:\n"
+        "Yesterday: 1.5 GB\nCumulative: 20 GB\n\n"
+    )
+    summary = json.loads(renderer.render(*vnstat_objects, fmt="json"))
+    assert [group["group"] for group in summary["groups"]] == [
+        ["eu"],
+        ["untagged"],
+    ]
@@ -0,0 +1,92 @@
+import pickle
+from datetime import date
+
+import pytest
+
+from src import serialization
+from src.vnstat import VnStatData
+
+
+@pytest.fixture
+def vn_obj():
+    return VnStatData(
+        system_name="edge-1",
+        service_status="vnstat.service is <b>loaded</b>",
+        stat_date=date(2024, 9, 11),
+        day_traffic=8246207397,
+        month_traffic=422179043688,
+        interfaces={
+            "eth0": {"day_traffic": 8246207397, "month_traffic": None},
+            "vlan10": {"day_traffic": 0, "month_traffic": 422179043688},
+        },
+        daily_traffic=[None, *range(9), 8246207397],
+    )
+
+
+def test_vnstat_data_is_immutable(vn_obj):
+    with pytest.raises(AttributeError):
+        vn_obj.day_traffic = 1
+    with pytest.raises(TypeError):
+        vn_obj.interfaces["eth0"] = {}
+    assert not hasattr(vn_obj, "__dict__")
+
+
+def test_replace(vn_obj):
+    renamed = vn_obj.replace(system_name="edge-2")
+    assert renamed.system_name == "edge-2"
+    assert vn_obj.system_name == "edge-1"
+    assert renamed.interfaces == vn_obj.interfaces
+
+
+@pytest.mark.parametrize("error", [None, "Simulated error"])
+def test_json_round_trip(vn_obj, error):
+    vn_obj = vn_obj.replace(error=error)
+    assert VnStatData.from_json(vn_obj.to_json()) == vn_obj
+
+
+def test_bytes_round_trip(vn_obj):
+    data = vn_obj.to_bytes()
+    assert len(data) < len(vn_obj.to_json())
+    assert VnStatData.from_bytes(data) == vn_obj
+
+
+def test_bytes_round_trip_without_optional_fields():
+    vn_obj = VnStatData(system_name="remote", stat_date=date(2024, 1, 1))
+    restored = VnStatData.from_bytes(vn_obj.to_bytes())
+    assert restored == vn_obj
+    assert restored.interfaces is None
+
+
+def test_pickle_round_trip(vn_obj):
+    assert pickle.loads(pickle.dumps(vn_obj)) == vn_obj
+
+
+def test_from_dict_accepts_legacy_format():
+    vn_obj = VnStatData.from_dict(
+        {
+            "system_name": "local",
+            "service_status": None,
+            "stat_date": "2024-09-11",
+            "day_traffic": 1,
+            "month_traffic": 2,
+            "error": None,
+        }
+    )
+    assert vn_obj.month_traffic == 2
+
+
+def test_newer_versions_are_rejected(vn_obj):
+    data = vn_obj.to_dict()
+    data["version"] = serialization.VERSION + 1
+    with pytest.raises(ValueError):
+        VnStatData.from_dict(data)
+
+
+def test_unknown_binary_fields_are_skipped(vn_obj):
+    data = vn_obj.to_bytes() + serialization.FIELD.pack(200, 3) + b"new"
+    assert VnStatData.from_bytes(data) == vn_obj
+
+
+def test_truncated_binary_data_is_rejected(vn_obj):
+    with pytest.raises(ValueError):
+        VnStatData.from_bytes(vn_obj.to_bytes()[:-3])
@@ -0,0 +1,192 @@
+import time
+from datetime import date
+
+import paramiko
+import pytest
+
+from src import ssh
+from src.ssh import Remote
+
+
+def test_get_remotes_parses_spec():
+    remotes = ssh.get_remotes("edge1=user@10.0.0.1:2222, edge2=10.0.0.2")
+    assert remotes[0] == Remote("edge1", "10.0.0.1", 2222, "user")
+    assert remotes[1].system_name == "edge2"
+    assert remotes[1].host == "10.0.0.2"
+    assert remotes[1].port == ssh.settings.REMOTE_PORT
+
+
+def test_get_all_remote_vnstat_data_keeps_going_on_failure(mocker):
+    def fake_fetch(*, system_name, remote_host, **kwargs):
+        if remote_host == "bad":
+            raise RuntimeError("boom")
+        return ssh._get_error_vnstat_obj(system_name, "")
+
+    mocker.patch.object(ssh, "get_remote_vnstat_data", side_effect=fake_fetch)
+    remotes = [Remote("a", "good"), Remote("b", "bad"), Remote("c", "good")]
+    result = ssh.get_all_remote_vnstat_data(remotes, max_workers=2)
+    assert [vn.system_name for vn in result] == ["a", "b", "c"]
+    assert "boom" in result[1].error
+    assert not result[0].error
+
+
+def test_get_all_remote_vnstat_data_times_out(mocker):
+    def slow_fetch(*, system_name, remote_host, **kwargs):
+        if remote_host == "slow":
+            time.sleep(1)
+        return ssh._get_error_vnstat_obj(system_name, "")
+
+    mocker.patch.object(ssh, "get_remote_vnstat_data", side_effect=slow_fetch)
+    remotes = [Remote("fast", "fast"), Remote("slow", "slow")]
+    result = ssh.get_all_remote_vnstat_data(
+        remotes, max_workers=2, timeout=0.2
+    )
+    assert not result[0].error
+    assert "Timed out" in result[1].error
+
+
+def test_get_sftp_path_strips_home_prefix():
+    assert ssh._get_sftp_path("$HOME/vnstat.json") == "vnstat.json"
+    assert ssh._get_sftp_path("~/data/vnstat.json") == "data/vnstat.json"
+    assert ssh._get_sftp_path("/tmp/vnstat.json") == "/tmp/vnstat.json"
+
+
+def test_get_remote_vnstat_data_falls_back_to_scp(mocker, tmp_path):
+    local_file = tmp_path / "vnstat.json"
+    local_file.write_text(
+        '{"system_name": "local", "stat_date": "2024-09-11", '
+        '"day_traffic": 1, "month_traffic": 2}'
+    )
+    mocker.patch.object(ssh, "_connect_to_ssh")
+    mocker.patch.object(
+        ssh, "_read_remote_file", side_effect=ssh.exc.SFTPError("no sftp")
+    )
+    mocker.patch.object(ssh, "_stat_remote_file", return_value=None)
+    scp = mocker.patch.object(ssh, "_scp_remote_file")
+    result = ssh.get_remote_vnstat_data(
+        system_name="edge",
+        imported_json_file_path=local_file,
+        cache=ssh.RemoteSyncCache(tmp_path / "sync_state.json"),
+    )
+    scp.assert_called_once()
+    assert result.system_name == "edge"
+    assert result.month_traffic == 2
+
+
+@pytest.mark.parametrize(
+    "key_class", [paramiko.RSAKey, paramiko.ECDSAKey], ids=["rsa", "ecdsa"]
+)
+def test_load_private_key_supports_key_types(tmp_path, key_class):
+    key_path = tmp_path / "id_key"
+    if key_class is paramiko.RSAKey:
+        key = key_class.generate(2048)
+    else:
+        key = key_class.generate()
+    key.write_private_key_file(str(key_path))
+    loaded = ssh._load_private_key(key_path)
+    assert isinstance(loaded, key_class)
+    assert loaded.get_fingerprint() == key.get_fingerprint()
+
+
+def test_connection_pool_reuses_and_reconnects(mocker):
+    clients = []
+
+    def fake_connect(*args, **kwargs):
+        client = mocker.Mock()
+        client.get_transport.return_value.is_active.return_value = True
+        clients.append(client)
+        return client
+
+    mocker.patch.object(ssh, "_connect_to_ssh", side_effect=fake_connect)
+    with ssh.SSHConnectionPool(keepalive_interval=10) as pool:
+        first = pool.get("host", 22, "user", "key")
+        assert pool.get("host", 22, "user", "key") is first
+        first.get_transport.return_value.set_keepalive.assert_called_with(10)
+
+        first.get_transport.return_value.is_active.return_value = False
+        second = pool.get("host", 22, "user", "key")
+        assert second is not first
+        first.close.assert_called_once()
+    second.close.assert_called_once()
+
+
+def test_unchanged_remote_file_is_not_transferred(mocker, tmp_path):
+    mocker.patch.object(ssh, "_connect_to_ssh")
+    stat = mocker.patch.object(
+        ssh, "_stat_remote_file", return_value=(1726000000, 120)
+    )
+    read = mocker.patch.object(
+        ssh,
+        "_read_remote_file",
+        return_value=(
+            '{"system_name": "local", "stat_date": "2024-09-11", '
+            '"day_traffic": 1, "month_traffic": 2}'
+        ),
+    )
+    state_file = tmp_path / "sync_state.json"
+
+    def fetch():
+        return ssh.get_remote_vnstat_data(
+            system_name="edge",
+            remote_host="edge-host",
+            cache=ssh.RemoteSyncCache(state_file),
+        )
+
+    first = fetch()
+    second = fetch()
+    assert read.call_count == 1
+    assert second == first
+    assert second.system_name == "edge"
+
+    stat.return_value = (1726000100, 130)
+    fetch()
+    assert read.call_count == 2
+
+
+def test_queued_remote_gets_its_own_timeout(mocker):
+    def fetch(*, system_name, remote_host, **kwargs):
+        if remote_host == "hung":
+            time.sleep(0.6)
+        return ssh._get_error_vnstat_obj(system_name, "")
+
+    mocker.patch.object(ssh, "get_remote_vnstat_data", side_effect=fetch)
+    # The queued remote only starts once the hung one gives up its worker.
+    remotes = [Remote("hung", "hung"), Remote("queued", "queued")]
+    result = ssh.get_all_remote_vnstat_data(
+        remotes, max_workers=1, timeout=0.5
+    )
+    assert "Timed out" in result[0].error
+    assert not result[1].error
+
+
+def test_queued_remote_gets_its_own_timeout_for_range(mocker):
+    def fetch(remote, start_date, end_date, **kwargs):
+        if remote.host == "hung":
+            time.sleep(0.6)
+        return [ssh._get_error_vnstat_obj(remote.system_name, "")]
+
+    mocker.patch.object(ssh, "get_remote_vnstat_data_range", side_effect=fetch)
+    remotes = [Remote("hung", "hung"), Remote("queued", "queued")]
+    day = date(2024, 9, 11)
+    result = ssh.get_all_remote_vnstat_data_range(
+        day, day, remotes, max_workers=1, timeout=0.5
+    )
+    assert "Timed out" in result[0][0].error
+    assert not result[1][0].error
+
+
+def test_fetches_are_bounded_by_an_overall_deadline(mocker):
+    def fetch(*, system_name, remote_host, **kwargs):
+        time.sleep(1)
+        return ssh._get_error_vnstat_obj(system_name, "")
+
+    mocker.patch.object(ssh, "get_remote_vnstat_data", side_effect=fetch)
+    # The workers stay busy past their timeouts, so the last remote never
+    # starts and is timed out at the deadline of two rounds.
+    remotes = [Remote(name, name) for name in ("first", "second", "third")]
+    started = time.monotonic()
+    result = ssh.get_all_remote_vnstat_data(
+        remotes, max_workers=2, timeout=0.2
+    )
+    assert time.monotonic() - started < 0.8
+    assert all("Timed out" in vnstat_obj.error for vnstat_obj in result)
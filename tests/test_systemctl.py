@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src import systemctl
+
+BLOCK = (
+    "Id={unit}.service\n"
+    "LoadState=loaded\n"
+    "ActiveState=active\n"
+    "SubState=running\n"
+    "UnitFileState=enabled\n"
+    "ActiveEnterTimestamp=Wed 2024-09-11 10:00:00 UTC\n"
+    "InactiveEnterTimestamp=\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_status_cache():
+    systemctl._status_cache.clear()
+    yield
+    systemctl._status_cache.clear()
+
+
+@pytest.fixture
+def systemctl_run(mocker):
+    stdout = "\n".join(BLOCK.format(unit=unit) for unit in ("vnstat", "ssh"))
+    return mocker.patch.object(
+        systemctl.subprocess,
+        "run",
+        return_value=SimpleNamespace(stdout=stdout, stderr=""),
+    )
+
+
+def test_attribute_names():
+    assert systemctl._get_attribute_name("ActiveEnterTimestamp") == (
+        "active_enter_timestamp"
+    )
+    assert systemctl._get_attribute_name("Id") == "id_"
+
+
+def test_get_services_status_single_call(systemctl_run):
+    statuses = systemctl.get_services_status(("vnstat", "ssh"), ttl=60)
+    systemctl_run.assert_called_once()
+    assert systemctl_run.call_args.args[0][2:4] == ["vnstat", "ssh"]
+    assert statuses["vnstat"].startswith("vnstat.service is <b>loaded</b>")
+    assert statuses["ssh"].startswith("ssh.service is <b>loaded</b>")
+    assert "since 2024-09-11 10:00:00" in statuses["ssh"]
+
+
+def test_get_services_status_cached(systemctl_run):
+    systemctl.get_services_status(("vnstat", "ssh"), ttl=60)
+    systemctl.get_services_status(("vnstat", "ssh"), ttl=60)
+    assert systemctl_run.call_count == 1
+    systemctl.get_services_status(("vnstat", "ssh"), ttl=0)
+    assert systemctl_run.call_count == 2
+
+
+def test_get_services_status_stderr(mocker):
+    mocker.patch.object(
+        systemctl.subprocess,
+        "run",
+        return_value=SimpleNamespace(stdout="", stderr="Failed to connect"),
+    )
+    statuses = systemctl.get_services_status(("vnstat",), ttl=60)
+    assert statuses["vnstat"] == (
+        "vnstat.service: status <b>unknown</b>: Failed to connect"
+    )
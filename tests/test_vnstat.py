@@ -0,0 +1,153 @@
+import io
+import json
+import sys
+import time
+from datetime import date
+
+import pytest
+
+from src import exceptions as exc
+from src import vnstat
+from src.vnstat import Modifiers
+
+
+def test_index_traffic(combined_vnstat_data):
+    index = vnstat._index_traffic(combined_vnstat_data)
+    assert list(index) == ["eth0"]
+    assert index["eth0"][Modifiers.DAY][(2024, 9, 11)] == (
+        5094408961 + 3151798436
+    )
+    assert index["eth0"][Modifiers.MONTH][(2024, 9, None)] == (
+        235356172410 + 186823871278
+    )
+
+
+def test_get_interfaces_traffic(combined_vnstat_data):
+    index = vnstat._index_traffic(combined_vnstat_data)
+    result = vnstat._get_interfaces_traffic(
+        index, ["eth0", "missing"], date(2024, 9, 11)
+    )
+    assert result["eth0"] == {
+        "day_traffic": 5094408961 + 3151798436,
+        "month_traffic": 235356172410 + 186823871278,
+    }
+    assert result["missing"] == {"day_traffic": None, "month_traffic": None}
+
+
+def test_get_interfaces_traffic_missing_date(combined_vnstat_data):
+    index = vnstat._index_traffic(combined_vnstat_data)
+    with pytest.raises(exc.MissingTargetDateError) as excinfo:
+        vnstat._get_interfaces_traffic(index, ["eth0"], date(2024, 9, 1))
+    assert "Latest available day is 2024-09-12" in str(excinfo.value)
+
+
+def test_get_command_covers_range():
+    command = vnstat._get_command(date(2024, 9, 1), today=date(2024, 9, 12))
+    assert command[-1] == "12"
+    command = vnstat._get_command(date(2024, 9, 11), today=date(2024, 9, 12))
+    assert command[-1] == str(vnstat.settings.COMMAND_LIMIT)
+
+
+def test_get_traffic_data_range(mocker, combined_vnstat_data):
+    second = dict(combined_vnstat_data["interfaces"][0], name="eth1")
+    combined_vnstat_data["interfaces"].append(second)
+    mocker.patch.object(vnstat, "_get_service_status", return_value="ok")
+    command_result = mocker.patch.object(
+        vnstat, "_get_command_result", return_value=combined_vnstat_data
+    )
+    results = vnstat.get_traffic_data_range(
+        "test",
+        date(2024, 9, 11),
+        date(2024, 9, 12),
+        interfaces=["eth0", "eth1"],
+    )
+    command_result.assert_called_once()
+    assert [vn.stat_date for vn in results] == [
+        date(2024, 9, 11),
+        date(2024, 9, 12),
+    ]
+    assert results[0].day_traffic == 2 * (5094408961 + 3151798436)
+    assert set(results[1].interfaces) == {"eth0", "eth1"}
+    assert len(results[0].daily_traffic) == 11
+    assert results[0].daily_traffic[-1] == results[0].day_traffic
+
+
+def test_service_status_is_fetched_concurrently(mocker, combined_vnstat_data):
+    def slow_status():
+        time.sleep(0.3)
+        return "ok"
+
+    def slow_command(command):
+        time.sleep(0.3)
+        return combined_vnstat_data
+
+    mocker.patch.object(vnstat, "_get_service_status", side_effect=slow_status)
+    mocker.patch.object(
+        vnstat, "_get_command_result", side_effect=slow_command
+    )
+    start = time.perf_counter()
+    result = vnstat.get_traffic_data("test", date(2024, 9, 11))
+    assert time.perf_counter() - start < 0.5
+    assert result.service_status == "ok"
+    assert not result.error
+
+
+def get_large_vnstat_data(combined_vnstat_data):
+    interface = combined_vnstat_data["interfaces"][0]
+    interface["traffic"]["hour"] = [
+        {"date": {"year": 2024, "month": 9, "day": 12}, "rx": n, "tx": n}
+        for n in range(5000)
+    ]
+    other = dict(interface, name="docker0")
+    combined_vnstat_data["interfaces"] = [other, interface, other]
+    return combined_vnstat_data
+
+
+def test_iter_interfaces_small_chunks(combined_vnstat_data):
+    data = get_large_vnstat_data(combined_vnstat_data)
+    stream = io.StringIO(json.dumps(data, indent=1))
+    names = [i["name"] for i in vnstat._iter_interfaces(stream, 1000)]
+    assert names == ["docker0", "eth0", "docker0"]
+
+
+def test_iter_interfaces_truncated(combined_vnstat_data):
+    stream = io.StringIO(json.dumps(combined_vnstat_data)[:-40])
+    with pytest.raises(exc.JSONDecodeError):
+        list(vnstat._iter_interfaces(stream, 100))
+
+
+def test_streamed_command_result(tmp_path, combined_vnstat_data):
+    data = get_large_vnstat_data(combined_vnstat_data)
+    dump = tmp_path / "vnstat.json"
+    dump.write_text(json.dumps(data))
+    command = (sys.executable, "-c", f"print(open({str(dump)!r}).read())")
+
+    result = vnstat._get_streamed_command_result(
+        command, ["eth0"], date(2024, 9, 11)
+    )
+    assert [i["name"] for i in result["interfaces"]] == ["eth0"]
+    traffic = result["interfaces"][0]["traffic"]
+    assert set(traffic) == {"day", "month"}
+    assert [d["date"]["day"] for d in traffic["day"]] == [11, 12]
+
+    streamed = vnstat._index_traffic(result)["eth0"]
+    full = vnstat._index_traffic(data)["eth0"]
+    assert streamed[Modifiers.DAY] == {
+        key: value
+        for key, value in full[Modifiers.DAY].items()
+        if key >= (2024, 9, 11)
+    }
+    assert streamed[Modifiers.MONTH] == {
+        (2024, 9, None): full[Modifiers.MONTH][(2024, 9, None)]
+    }
+
+
+def test_streamed_command_failure():
+    command = (
+        sys.executable,
+        "-c",
+        "import sys; sys.stderr.write('Error: Unable to open database'); "
+        "sys.exit(1)",
+    )
+    with pytest.raises(exc.CommandError, match="Unable to open database"):
+        vnstat._get_streamed_command_result(command, ["eth0"], date.today())
@@ -0,0 +1,35 @@
+from datetime import date
+
+import pytest
+
+from src import exceptions as exc
+from src import vnstat_db
+from src.vnstat import Modifiers
+
+
+def test_get_traffic_index(vnstat_db_path):
+    index = vnstat_db.get_traffic_index(
+        date(2024, 9, 11), ["eth0", "eth1"], vnstat_db_path
+    )
+    assert index["eth0"][Modifiers.DAY] == {
+        (2024, 9, 11): 5094408961 + 3151798436,
+        (2024, 9, 12): 1743913561 + 862805062,
+    }
+    assert index["eth0"][Modifiers.MONTH] == {
+        (2024, 9, None): 235356172410 + 186823871278
+    }
+    assert index["eth1"][Modifiers.DAY] == {(2024, 9, 11): 300}
+
+
+def test_get_traffic_index_skips_other_interfaces(vnstat_db_path):
+    index = vnstat_db.get_traffic_index(
+        date(2024, 8, 1), ["eth1"], vnstat_db_path
+    )
+    assert list(index) == ["eth1"]
+
+
+def test_get_traffic_index_missing_db(tmp_path):
+    with pytest.raises(exc.DatabaseError):
+        vnstat_db.get_traffic_index(
+            date(2024, 9, 11), ["eth0"], tmp_path / "missing.db"
+        )